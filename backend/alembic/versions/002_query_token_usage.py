@@ -0,0 +1,23 @@
+"""Add LLM token usage to queries
+
+Revision ID: 002
+Revises: 001
+Create Date: 2026-10-17 00:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '002'
+down_revision = '001'
+branch_labels = None
+depends_on = None
+
+def upgrade() -> None:
+    op.add_column('queries', sa.Column('prompt_tokens', sa.Integer(), nullable=True))
+    op.add_column('queries', sa.Column('completion_tokens', sa.Integer(), nullable=True))
+
+def downgrade() -> None:
+    op.drop_column('queries', 'completion_tokens')
+    op.drop_column('queries', 'prompt_tokens')
@@ -0,0 +1,21 @@
+"""Add per-stage pipeline metrics to queries
+
+Revision ID: 003
+Revises: 002
+Create Date: 2026-10-17 00:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '003'
+down_revision = '002'
+branch_labels = None
+depends_on = None
+
+def upgrade() -> None:
+    op.add_column('queries', sa.Column('pipeline_metrics', sa.JSON(), nullable=True))
+
+def downgrade() -> None:
+    op.drop_column('queries', 'pipeline_metrics')
@@ -0,0 +1,38 @@
+"""Move large query results to a content-addressed store
+
+Revision ID: 004
+Revises: 003
+Create Date: 2026-10-17 00:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '004'
+down_revision = '003'
+branch_labels = None
+depends_on = None
+
+def upgrade() -> None:
+    op.create_table('query_results',
+        sa.Column('digest', sa.String(length=64), nullable=False),
+        sa.Column('codec', sa.String(length=16), nullable=False),
+        sa.Column('payload', sa.LargeBinary(), nullable=False),
+        sa.Column('raw_bytes', sa.Integer(), nullable=False),
+        sa.Column('stored_bytes', sa.Integer(), nullable=False),
+        sa.Column('row_count', sa.Integer(), nullable=True),
+        sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=True),
+        sa.PrimaryKeyConstraint('digest')
+    )
+    op.add_column('queries', sa.Column('result_ref', sa.String(length=64), nullable=True))
+    op.create_index(op.f('ix_queries_result_ref'), 'queries', ['result_ref'], unique=False)
+    op.create_foreign_key(
+        'fk_queries_result_ref', 'queries', 'query_results', ['result_ref'], ['digest']
+    )
+
+def downgrade() -> None:
+    op.drop_constraint('fk_queries_result_ref', 'queries', type_='foreignkey')
+    op.drop_index(op.f('ix_queries_result_ref'), table_name='queries')
+    op.drop_column('queries', 'result_ref')
+    op.drop_table('query_results')
@@ -0,0 +1,44 @@
+"""Index query history and store row counts for summary listings
+
+Revision ID: 005
+Revises: 004
+Create Date: 2026-10-17 00:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '005'
+down_revision = '004'
+branch_labels = None
+depends_on = None
+
+def upgrade() -> None:
+    op.add_column('queries', sa.Column('row_count', sa.Integer(), nullable=True))
+    
+    # Inline results are either the columnar wire format or the legacy list of rows
+    op.execute("""
+        UPDATE queries SET row_count = CASE
+            WHEN json_typeof(execution_result) = 'array' THEN json_array_length(execution_result)
+            WHEN json_typeof(execution_result -> 'data') = 'array' THEN json_array_length(execution_result -> 'data')
+        END
+        WHERE execution_result IS NOT NULL
+    """)
+    op.execute("""
+        UPDATE queries SET row_count = query_results.row_count
+        FROM query_results
+        WHERE queries.result_ref = query_results.digest
+    """)
+    
+    op.create_index(
+        'ix_queries_user_id_created_at_id', 'queries', ['user_id', 'created_at', 'id'], unique=False
+    )
+    op.create_index(
+        'ix_queries_connection_id_created_at', 'queries', ['connection_id', 'created_at'], unique=False
+    )
+
+def downgrade() -> None:
+    op.drop_index('ix_queries_connection_id_created_at', table_name='queries')
+    op.drop_index('ix_queries_user_id_created_at_id', table_name='queries')
+    op.drop_column('queries', 'row_count')
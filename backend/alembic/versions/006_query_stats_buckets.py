@@ -0,0 +1,111 @@
+"""Per-user query stats rollups by hour, day and all time
+
+Revision ID: 006
+Revises: 005
+Create Date: 2026-10-17 00:00:00.000000
+
+Existing history is counted in here; scripts/rebuild_query_stats.py
+recounts from scratch if the rollups ever drift.
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '006'
+down_revision = '005'
+branch_labels = None
+depends_on = None
+
+# query_stats.LATENCY_BOUNDS_MS as of this revision; histograms are counts per
+# bound (bisect_left, so a sample equal to a bound lands in that bound's bucket)
+LATENCY_BOUNDS_MS = (5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000, 30000, 60000, 120000)
+
+def _slot(value: str) -> str:
+    bounds = ", ".join(str(bound) for bound in LATENCY_BOUNDS_MS)
+    return f"(SELECT count(*) FROM unnest(ARRAY[{bounds}]::float8[]) AS bound WHERE bound < {value})"
+
+def _histogram(slot: str) -> str:
+    counts = ", ".join(
+        f"count(*) FILTER (WHERE {slot} = {i})" for i in range(len(LATENCY_BOUNDS_MS) + 1)
+    )
+    return f"to_json(ARRAY[{counts}])"
+
+def upgrade() -> None:
+    op.create_table('query_stats_buckets',
+        sa.Column('user_id', sa.Integer(), nullable=False),
+        sa.Column('granularity', sa.String(length=8), nullable=False),
+        sa.Column('bucket_start', sa.DateTime(timezone=True), nullable=False),
+        sa.Column('total_queries', sa.Integer(), nullable=False),
+        sa.Column('successful_queries', sa.Integer(), nullable=False),
+        sa.Column('execution_time_sum_ms', sa.Float(), nullable=False),
+        sa.Column('execution_time_count', sa.Integer(), nullable=False),
+        sa.Column('latency_histogram', sa.JSON(), nullable=False),
+        sa.Column('stage_histograms', sa.JSON(), nullable=False),
+        sa.Column('updated_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=True),
+        sa.ForeignKeyConstraint(['user_id'], ['users.id'], ),
+        sa.PrimaryKeyConstraint('user_id', 'granularity', 'bucket_start')
+    )
+    
+    # Backfill the hour, day and all-time buckets from existing history
+    op.execute(f"""
+        INSERT INTO query_stats_buckets (
+            user_id, granularity, bucket_start, total_queries, successful_queries,
+            execution_time_sum_ms, execution_time_count, latency_histogram, stage_histograms
+        )
+        WITH history AS (
+            SELECT
+                id, user_id, is_successful, execution_time_ms, pipeline_metrics,
+                created_at AT TIME ZONE 'UTC' AS created_utc,
+                CASE WHEN execution_time_ms IS NOT NULL THEN {_slot('execution_time_ms')} END AS latency_slot
+            FROM queries
+            WHERE created_at IS NOT NULL
+        ),
+        keyed AS (
+            SELECT history.*, g.granularity,
+                CASE g.granularity
+                    WHEN 'hour' THEN date_trunc('hour', created_utc) AT TIME ZONE 'UTC'
+                    WHEN 'day' THEN date_trunc('day', created_utc) AT TIME ZONE 'UTC'
+                    ELSE timestamptz '1970-01-01+00'
+                END AS bucket_start
+            FROM history CROSS JOIN (VALUES ('hour'), ('day'), ('all')) AS g(granularity)
+        ),
+        totals AS (
+            SELECT
+                user_id, granularity, bucket_start,
+                count(*) AS total_queries,
+                count(*) FILTER (WHERE is_successful) AS successful_queries,
+                coalesce(sum(execution_time_ms), 0) AS execution_time_sum_ms,
+                count(execution_time_ms) AS execution_time_count,
+                {_histogram('latency_slot')} AS latency_histogram
+            FROM keyed
+            GROUP BY user_id, granularity, bucket_start
+        ),
+        stage_samples AS (
+            SELECT
+                keyed.user_id, keyed.granularity, keyed.bucket_start, timing.key AS stage,
+                {_slot('timing.value::float8')} AS slot
+            FROM keyed
+            CROSS JOIN LATERAL json_each_text(
+                CASE WHEN json_typeof(keyed.pipeline_metrics -> 'timings_ms') = 'object'
+                    THEN keyed.pipeline_metrics -> 'timings_ms' END
+            ) AS timing
+        ),
+        stages AS (
+            SELECT user_id, granularity, bucket_start, json_object_agg(stage, counts) AS stage_histograms
+            FROM (
+                SELECT user_id, granularity, bucket_start, stage, {_histogram('slot')} AS counts
+                FROM stage_samples
+                GROUP BY user_id, granularity, bucket_start, stage
+            ) AS per_stage
+            GROUP BY user_id, granularity, bucket_start
+        )
+        SELECT
+            totals.user_id, totals.granularity, totals.bucket_start, totals.total_queries,
+            totals.successful_queries, totals.execution_time_sum_ms, totals.execution_time_count,
+            totals.latency_histogram, coalesce(stages.stage_histograms, '{{}}'::json)
+        FROM totals
+        LEFT JOIN stages USING (user_id, granularity, bucket_start)
+    """)
+
+def downgrade() -> None:
+    op.drop_table('query_stats_buckets')
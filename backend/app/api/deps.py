@@ -1,31 +1,66 @@
+from typing import Optional
 from fastapi import Depends, HTTPException, status
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select
+from app.core.config import settings
 from app.core.database import get_database
-from app.core.security import verify_token
+from app.core.security import decode_token
 from app.models.user import User
+from app.services.principal_cache import principal_cache
 
 security = HTTPBearer()
 
-async def get_current_user(
-    credentials: HTTPAuthorizationCredentials = Depends(security),
-    db: AsyncSession = Depends(get_database)
-) -> User:
-    credentials_exception = HTTPException(
+def _credentials_exception() -> HTTPException:
+    return HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Could not validate credentials",
         headers={"WWW-Authenticate": "Bearer"},
     )
-    
-    username = verify_token(credentials.credentials)
-    if username is None:
-        raise credentials_exception
-    
+
+async def _load_user(db: AsyncSession, username: str, issued_at: Optional[int]) -> User:
     result = await db.execute(select(User).where(User.username == username))
     user = result.scalar_one_or_none()
     
-    if user is None:
-        raise credentials_exception
+    if user is None or not user.is_active:
+        raise _credentials_exception()
+    
+    principal_cache.set((username, issued_at), user)
+    return user
+
+async def get_current_user(
+    credentials: HTTPAuthorizationCredentials = Depends(security),
+    db: AsyncSession = Depends(get_database)
+) -> User:
+    payload = decode_token(credentials.credentials)
+    if payload is None:
+        raise _credentials_exception()
+    
+    username = payload["sub"]
+    issued_at = payload.get("iat")
+    
+    # Claims-only: the signed token is the principal, no lookup at all
+    if (
+        settings.AUTH_CLAIMS_ONLY
+        and payload.get("uid") is not None
+        and principal_cache.claims_trusted(username, issued_at)
+    ):
+        return User(id=payload["uid"], username=username, is_active=True)
+    
+    # Cached users are detached snapshots, the session is only checked out on a miss
+    user = principal_cache.get((username, issued_at))
+    if user is not None:
+        return user
+    
+    return await _load_user(db, username, issued_at)
+
+async def get_current_user_from_db(
+    credentials: HTTPAuthorizationCredentials = Depends(security),
+    db: AsyncSession = Depends(get_database)
+) -> User:
+    """Like get_current_user but always reads the row, for endpoints returning the profile"""
+    payload = decode_token(credentials.credentials)
+    if payload is None:
+        raise _credentials_exception()
     
-    return user
\ No newline at end of file
+    return await _load_user(db, payload["sub"], payload.get("iat"))
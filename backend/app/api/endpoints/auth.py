@@ -5,14 +5,23 @@ from sqlalchemy import select
 from datetime import timedelta
 
 from app.core.database import get_database
-from app.api.deps import get_current_user
-from app.core.security import verify_password, get_password_hash, create_access_token
+from app.api.deps import get_current_user_from_db
+from app.core.security import create_access_token
 from app.core.config import settings
 from app.models.user import User
 from app.schemas.user import UserCreate, User as UserSchema, Token
+from app.services.password_hasher import password_hasher, PasswordHasherOverloaded
+from app.services.principal_cache import apply_rehash
 
 router = APIRouter()
 
+def _hasher_busy(e: PasswordHasherOverloaded) -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+        detail=str(e),
+        headers={"Retry-After": "1"},
+    )
+
 @router.post("/register", response_model=UserSchema)
 async def register(
     user_data: UserCreate,
@@ -27,7 +36,10 @@ async def register(
         )
     
     # Create user
-    hashed_password = get_password_hash(user_data.password)
+    try:
+        hashed_password = await password_hasher.hash(user_data.password)
+    except PasswordHasherOverloaded as e:
+        raise _hasher_busy(e)
     db_user = User(
         username=user_data.username,
         email=user_data.email,
@@ -49,20 +61,36 @@ async def login(
     result = await db.execute(select(User).where(User.username == form_data.username))
     user = result.scalar_one_or_none()
     
-    if not user or not verify_password(form_data.password, user.hashed_password):
+    try:
+        valid, new_hash = await password_hasher.verify_and_update(
+            form_data.password, user.hashed_password if user else None
+        )
+    except PasswordHasherOverloaded as e:
+        raise _hasher_busy(e)
+    
+    if not valid:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Incorrect username or password",
             headers={"WWW-Authenticate": "Bearer"},
         )
     
+    # Stored with an outdated cost, replace it now that we have the password
+    if new_hash is not None:
+        try:
+            apply_rehash(user, new_hash)
+            await db.commit()
+        except Exception as e:
+            await db.rollback()
+            print(f"Failed to rehash password for user {user.id}: {str(e)}")
+    
     access_token_expires = timedelta(minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES)
     access_token = create_access_token(
-        data={"sub": user.username}, expires_delta=access_token_expires
+        data={"sub": user.username, "uid": user.id}, expires_delta=access_token_expires
     )
     
     return {"access_token": access_token, "token_type": "bearer"}
 
 @router.get("/me", response_model=UserSchema)
-async def read_users_me(current_user: User = Depends(get_current_user)):
+async def read_users_me(current_user: User = Depends(get_current_user_from_db)):
     return current_user
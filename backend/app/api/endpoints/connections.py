@@ -1,7 +1,8 @@
 from fastapi import APIRouter, Depends, HTTPException, status
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select
-from typing import List
+from sqlalchemy import select, delete
+from typing import List, Optional
+from pydantic import BaseModel
 
 from app.core.database import get_database
 from app.api.deps import get_current_user
@@ -16,9 +17,17 @@ from app.schemas.connection import (
     SelectedTable as SelectedTableSchema
 )
 from app.services.database_service import DatabaseService
+from app.services.connection_pool import pool_registry
+from app.services.schema_cache import schema_cache
+from app.services.schema_retrieval import schema_retriever
+from app.services.result_cache import result_cache
+from app.services.text_to_sql import TextToSQLService
 
 router = APIRouter()
 
+class ResultCachePolicy(BaseModel):
+    ttl_seconds: Optional[float] = None  # None resets to RESULT_CACHE_TTL_SECONDS, 0 disables
+
 @router.post("/", response_model=DatabaseConnectionSchema)
 async def create_connection(
     connection_data: DatabaseConnectionCreate,
@@ -124,7 +133,12 @@ async def update_connection(
         setattr(connection, field, value)
     
     # Test updated connection
-    if any(field in update_data for field in ['host', 'port', 'username', 'password', 'database_name']):
+    if any(field in update_data for field in ['host', 'port', 'username', 'password', 'database_name', 'ssl_enabled']):
+        # Drop the pool built with the old credentials
+        await pool_registry.invalidate(connection.id)
+        schema_cache.invalidate(connection.id)
+        schema_retriever.invalidate(connection.id)
+        result_cache.purge(connection.id)
         db_service = DatabaseService()
         connection_status = await db_service.test_connection(connection)
         connection.connection_status = connection_status
@@ -154,6 +168,11 @@ async def delete_connection(
     connection.is_active = False
     await db.commit()
     
+    await pool_registry.invalidate(connection_id)
+    schema_cache.invalidate(connection_id)
+    schema_retriever.invalidate(connection_id, delete_files=True)
+    result_cache.purge(connection_id)
+    
     return {"message": "Connection deleted successfully"}
 
 @router.get("/{connection_id}/tables", response_model=List[TableInfo])
@@ -198,18 +217,23 @@ async def select_tables(
     
     # Clear existing selected tables
     await db.execute(
-        select(SelectedTable).where(SelectedTable.connection_id == connection_id)
+        delete(SelectedTable).where(SelectedTable.connection_id == connection_id)
     )
     
-    # Get table schemas
+    # Get table schemas (only the requested ones)
     db_service = DatabaseService()
-    available_tables = await db_service.get_tables(connection)
+    available_tables = await db_service.get_tables(
+        connection,
+        table_names=[t.table_name for t in tables]
+    )
     
     selected_tables = []
     for table_data in tables:
         # Find table info
         table_info = next(
-            (t for t in available_tables if t.table_name == table_data.table_name),
+            (t for t in available_tables
+             if t.table_name == table_data.table_name
+             and (table_data.schema_name is None or t.schema_name == table_data.schema_name)),
             None
         )
         
@@ -217,7 +241,7 @@ async def select_tables(
             selected_table = SelectedTable(
                 connection_id=connection_id,
                 table_name=table_data.table_name,
-                schema_name=table_data.schema_name,
+                schema_name=table_info.schema_name,
                 columns_info=table_info.columns
             )
             db.add(selected_table)
@@ -236,4 +260,90 @@ async def get_selected_tables(
     result = await db.execute(
         select(SelectedTable).where(SelectedTable.connection_id == connection_id)
     )
-    return result.scalars().all()
\ No newline at end of file
+    return result.scalars().all()
+
+@router.post("/{connection_id}/schema/refresh")
+async def refresh_schema(
+    connection_id: int,
+    current_user: User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_database)
+):
+    result = await db.execute(
+        select(DatabaseConnection).where(
+            DatabaseConnection.id == connection_id,
+            DatabaseConnection.user_id == current_user.id
+        )
+    )
+    connection = result.scalar_one_or_none()
+    
+    if not connection:
+        raise HTTPException(status_code=404, detail="Connection not found")
+    
+    # Re-introspect now instead of waiting for the TTL
+    snapshot = await schema_cache.get(
+        connection,
+        DatabaseService(),
+        TextToSQLService.render_schema_context,
+        force_refresh=True
+    )
+    
+    # Prompts for selected tables use their saved columns, re-read those too
+    result = await db.execute(
+        select(SelectedTable).where(
+            SelectedTable.connection_id == connection_id,
+            SelectedTable.is_selected == True
+        )
+    )
+    selected_tables = result.scalars().all()
+    updated = TextToSQLService.apply_live_columns(selected_tables, snapshot.tables)
+    await db.commit()
+    if snapshot.tables:
+        schema_cache.mark_selected_synced(connection_id, snapshot.version)
+    
+    return {
+        "message": "Schema refreshed successfully",
+        "schema_version": snapshot.version,
+        "table_count": len(snapshot.tables),
+        "selected_tables_updated": updated
+    }
+
+@router.delete("/{connection_id}/result-cache")
+async def purge_result_cache(
+    connection_id: int,
+    current_user: User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_database)
+):
+    result = await db.execute(
+        select(DatabaseConnection).where(
+            DatabaseConnection.id == connection_id,
+            DatabaseConnection.user_id == current_user.id
+        )
+    )
+    if not result.scalar_one_or_none():
+        raise HTTPException(status_code=404, detail="Connection not found")
+    
+    purged = result_cache.purge(connection_id)
+    
+    return {"message": "Result cache purged successfully", "purged_entries": purged}
+
+@router.put("/{connection_id}/result-cache/policy")
+async def set_result_cache_policy(
+    connection_id: int,
+    policy: ResultCachePolicy,
+    current_user: User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_database)
+):
+    result = await db.execute(
+        select(DatabaseConnection).where(
+            DatabaseConnection.id == connection_id,
+            DatabaseConnection.user_id == current_user.id
+        )
+    )
+    if not result.scalar_one_or_none():
+        raise HTTPException(status_code=404, detail="Connection not found")
+    
+    result_cache.set_ttl(connection_id, policy.ttl_seconds)
+    if policy.ttl_seconds is not None and policy.ttl_seconds <= 0:
+        result_cache.purge(connection_id)
+    
+    return {"connection_id": connection_id, "ttl_seconds": result_cache.ttl_for(connection_id)}
@@ -1,33 +1,81 @@
-from fastapi import APIRouter, Depends, HTTPException
+import base64
+import json
+import time
+from datetime import datetime
+from fastapi import APIRouter, Depends, HTTPException, Query as QueryParam
+from fastapi.responses import StreamingResponse
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select, desc
-from typing import List, Dict, Any
-from pydantic import BaseModel
+from sqlalchemy import select, desc, tuple_
+from sqlalchemy.orm import undefer
+from typing import List, Dict, Any, Optional, Tuple, Union, Literal
+from pydantic import BaseModel, Field
 
-from app.core.database import get_database
+from app.core.database import get_database, AsyncSessionLocal
 from app.api.deps import get_current_user
 from app.models.user import User
 from app.models.connection import DatabaseConnection
 from app.models.query import Query
-from app.services.text_to_sql import TextToSQLService
+from app.services.text_to_sql import TextToSQLService, SQLResult
 from app.services.openai_service import OpenAIService
+from app.services.sql_cache import sql_cache
+from app.services.result_cache import result_cache
+from app.services.result_store import result_store
+from app.services.result_cursor import cursor_registry, CursorNotFoundError
+from app.services.pipeline_context import PIPELINE_STAGES
+from app.services import query_stats
+from app.core.config import settings
 from app.utils.helpers import serialize_for_json
+from app.utils.columnar import ColumnarResult, format_result
 
 router = APIRouter()
 
 class QueryRequest(BaseModel):
     natural_language_query: str
     connection_id: int
+    page_size: Optional[int] = Field(None, ge=1)  # Read through a server-side cursor, first page only
+    result_format: Literal["rows", "columnar"] = "rows"
+    include_metrics: bool = False  # Return per-stage timings in pipeline_metrics
 
 class QueryResponse(BaseModel):
     id: int
     natural_language_query: str
     generated_sql: str
-    execution_result: List[Dict[str, Any]]
+    execution_result: Union[List[Dict[str, Any]], Dict[str, Any]]  # rows or {"columns", "types", "data"}
     ai_insights: str
     chart_config: Dict[str, Any]
     execution_time_ms: float
     is_successful: bool
+    result_cached: bool = False
+    result_age_seconds: Optional[float] = None
+    truncated: bool = False
+    total_count: Optional[int] = None
+    next_token: Optional[str] = None
+    prompt_tokens: Optional[int] = None
+    completion_tokens: Optional[int] = None
+    pipeline_metrics: Optional[Dict[str, Any]] = None
+    row_count: Optional[int] = None
+    created_at: Optional[datetime] = None
+
+class QuerySummary(BaseModel):
+    id: int
+    connection_id: Optional[int]
+    natural_language_query: str
+    is_successful: bool
+    execution_time_ms: float
+    row_count: Optional[int]
+    created_at: datetime
+
+class QueryHistoryPage(BaseModel):
+    queries: List[QuerySummary]
+    next_cursor: Optional[str]  # None on the last page
+
+class QueryRowsPage(BaseModel):
+    query_id: int
+    rows: Union[List[Dict[str, Any]], Dict[str, Any]]
+    fetched: int
+    truncated: bool
+    total_count: Optional[int]
+    next_token: Optional[str]
 
 class QueryStats(BaseModel):
     total_queries: int
@@ -35,6 +83,84 @@ class QueryStats(BaseModel):
     success_rate: float
     avg_response_time: float
     data_sources_connected: int
+    p50_response_time: Optional[float] = None  # Estimated from latency histograms
+    p95_response_time: Optional[float] = None
+    stage_latency_ms: Dict[str, Dict[str, float]] = {}  # stage -> {"p50", "p95"}
+
+class QueryStatsPoint(BaseModel):
+    bucket_start: datetime
+    total_queries: int
+    successful_queries: int
+    avg_ms: float
+    p50_ms: Optional[float]
+    p95_ms: Optional[float]
+
+async def _save_query_record(
+    db: AsyncSession,
+    user_id: int,
+    connection_id: int,
+    natural_language_query: str,
+    sql_result: SQLResult
+) -> Query:
+    pipeline = sql_result.pipeline
+    
+    # Stored in the compact columnar format, column names once instead of per row
+    serialization_started = time.perf_counter()
+    serialized_execution_result = sql_result.data.to_wire()
+    serialized_chart_config = serialize_for_json(sql_result.chart_config)
+    if pipeline is not None:
+        pipeline.record("serialization", (time.perf_counter() - serialization_started) * 1000)
+    
+    # Create query record; large results go to the result store, by reference
+    query_record = Query(
+        user_id=user_id,
+        connection_id=connection_id,
+        natural_language_query=natural_language_query,
+        generated_sql=sql_result.sql,
+        row_count=sql_result.data.row_count,
+        ai_insights=sql_result.insights,
+        chart_config=serialized_chart_config,
+        execution_time_ms=sql_result.execution_time_ms,
+        is_successful=sql_result.is_successful,
+        error_message=sql_result.error_message,
+        prompt_tokens=sql_result.prompt_tokens,
+        completion_tokens=sql_result.completion_tokens,
+        pipeline_metrics=pipeline.to_dict() if pipeline is not None else None
+    )
+    
+    # The insert can't time itself into its own row, it is only in the response
+    insert_started = time.perf_counter()
+    query_record.execution_result, query_record.result_ref = await result_store.put(
+        db, serialized_execution_result
+    )
+    db.add(query_record)
+    # Dashboard rollups commit or roll back with the row
+    await query_stats.record_query(
+        db,
+        user_id,
+        sql_result.is_successful,
+        sql_result.execution_time_ms,
+        pipeline.timings_ms if pipeline is not None else None
+    )
+    await db.commit()
+    await db.refresh(query_record)
+    if pipeline is not None:
+        pipeline.record("db_insert", (time.perf_counter() - insert_started) * 1000)
+    
+    return query_record
+
+def _sse_event(event: str, payload: Any) -> str:
+    return f"event: {event}\ndata: {json.dumps(payload, default=str)}\n\n"
+
+def _encode_history_cursor(created_at: datetime, query_id: int) -> str:
+    return base64.urlsafe_b64encode(f"{created_at.isoformat()}|{query_id}".encode()).decode()
+
+def _decode_history_cursor(cursor: str) -> Tuple[datetime, int]:
+    try:
+        created_at, query_id = base64.urlsafe_b64decode(cursor.encode()).decode().split("|")
+        return datetime.fromisoformat(created_at), int(query_id)
+    except (ValueError, UnicodeDecodeError):
+        raise HTTPException(status_code=400, detail="Invalid history cursor")
 
 @router.post("/", response_model=QueryResponse)
 async def execute_query(
@@ -58,30 +184,23 @@ async def execute_query(
     text_to_sql_service = TextToSQLService()
     sql_result = await text_to_sql_service.generate_sql(
         query_request.natural_language_query,
-        connection
+        connection,
+        db,
+        page_size=query_request.page_size,
+        user_id=current_user.id
     )
     
-    # Serialize data for JSON storage
-    serialized_execution_result = serialize_for_json(sql_result.data)
-    serialized_chart_config = serialize_for_json(sql_result.chart_config)
-    
-    # Create query record
-    query_record = Query(
-        user_id=current_user.id,
-        connection_id=connection.id,
-        natural_language_query=query_request.natural_language_query,
-        generated_sql=sql_result.sql,
-        execution_result=serialized_execution_result,
-        ai_insights=sql_result.insights,
-        chart_config=serialized_chart_config,
-        execution_time_ms=sql_result.execution_time_ms,
-        is_successful=sql_result.is_successful,
-        error_message=sql_result.error_message
+    query_record = await _save_query_record(
+        db,
+        current_user.id,
+        connection.id,
+        query_request.natural_language_query,
+        sql_result
     )
     
-    db.add(query_record)
-    await db.commit()
-    await db.refresh(query_record)
+    # Further pages are only served under /{query_id}/rows for this query
+    if sql_result.next_token:
+        cursor_registry.attach_query(sql_result.next_token, current_user.id, query_record.id)
     
     if not sql_result.is_successful:
         raise HTTPException(
@@ -93,56 +212,174 @@ async def execute_query(
         id=query_record.id,
         natural_language_query=query_record.natural_language_query,
         generated_sql=query_record.generated_sql,
-        execution_result=query_record.execution_result,
+        execution_result=format_result(sql_result.data, query_request.result_format),
         ai_insights=query_record.ai_insights,
         chart_config=query_record.chart_config,
         execution_time_ms=query_record.execution_time_ms,
-        is_successful=query_record.is_successful
+        is_successful=query_record.is_successful,
+        result_cached=sql_result.result_cached,
+        result_age_seconds=sql_result.result_age_seconds,
+        truncated=sql_result.truncated,
+        total_count=sql_result.total_count,
+        next_token=sql_result.next_token,
+        prompt_tokens=query_record.prompt_tokens,
+        completion_tokens=query_record.completion_tokens,
+        pipeline_metrics=(
+            sql_result.pipeline.to_dict()
+            if query_request.include_metrics and sql_result.pipeline is not None else None
+        ),
+        row_count=query_record.row_count,
+        created_at=query_record.created_at
     )
 
-@router.get("/", response_model=List[QueryResponse])
+@router.post("/stream")
+async def stream_query(
+    query_request: QueryRequest,
+    current_user: User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_database)
+):
+    """Server-sent events variant of POST /: sql_delta, sql, rows, chart, insights, done"""
+    result = await db.execute(
+        select(DatabaseConnection).where(
+            DatabaseConnection.id == query_request.connection_id,
+            DatabaseConnection.user_id == current_user.id
+        )
+    )
+    connection = result.scalar_one_or_none()
+    
+    if not connection:
+        raise HTTPException(status_code=404, detail="Connection not found")
+    
+    user_id = current_user.id
+    
+    async def event_stream():
+        # The request-scoped session may be closed before the body finishes streaming
+        async with AsyncSessionLocal() as stream_db:
+            text_to_sql_service = TextToSQLService()
+            async for event, payload in text_to_sql_service.stream_sql(
+                query_request.natural_language_query,
+                connection,
+                stream_db,
+                result_format=query_request.result_format
+            ):
+                if event != "result":
+                    yield _sse_event(event, payload)
+                    continue
+                
+                query_record = await _save_query_record(
+                    stream_db,
+                    user_id,
+                    connection.id,
+                    query_request.natural_language_query,
+                    payload
+                )
+                
+                if payload.is_successful:
+                    yield _sse_event("done", {
+                        "id": query_record.id,
+                        "execution_time_ms": query_record.execution_time_ms,
+                        "result_cached": payload.result_cached,
+                        "result_age_seconds": payload.result_age_seconds,
+                        "truncated": payload.truncated,
+                        "total_count": payload.total_count,
+                        "prompt_tokens": payload.prompt_tokens,
+                        "completion_tokens": payload.completion_tokens,
+                        "pipeline_metrics": (
+                            payload.pipeline.to_dict()
+                            if query_request.include_metrics and payload.pipeline is not None else None
+                        )
+                    })
+                else:
+                    yield _sse_event("error", {
+                        "id": query_record.id,
+                        "detail": f"Query execution failed: {payload.error_message}"
+                    })
+    
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+@router.get("/", response_model=QueryHistoryPage)
 async def get_user_queries(
     limit: int = 50,
+    cursor: Optional[str] = None,
     current_user: User = Depends(get_current_user),
     db: AsyncSession = Depends(get_database)
 ):
-    result = await db.execute(
-        select(Query)
+    """Query history, newest first, summary columns only.
+
+    Pages by keyset on (created_at, id): pass next_cursor back as cursor for
+    the next page. Results, charts and insights come from GET /{query_id}.
+    """
+    limit = max(1, min(limit, settings.QUERY_HISTORY_MAX_PAGE_SIZE))
+    
+    statement = (
+        select(
+            Query.id,
+            Query.connection_id,
+            Query.natural_language_query,
+            Query.is_successful,
+            Query.execution_time_ms,
+            Query.row_count,
+            Query.created_at
+        )
         .where(Query.user_id == current_user.id)
-        .order_by(desc(Query.created_at))
-        .limit(limit)
-    )
-    queries = result.scalars().all()
-    
-    return [
-        QueryResponse(
-            id=q.id,
-            natural_language_query=q.natural_language_query,
-            generated_sql=q.generated_sql,
-            execution_result=q.execution_result or [],
-            ai_insights=q.ai_insights or "",
-            chart_config=q.chart_config or {},
-            execution_time_ms=q.execution_time_ms or 0,
-            is_successful=q.is_successful
-        ) for q in queries
-    ]
+        .order_by(desc(Query.created_at), desc(Query.id))
+        .limit(limit + 1)
+    )
+    if cursor:
+        created_at, query_id = _decode_history_cursor(cursor)
+        statement = statement.where(tuple_(Query.created_at, Query.id) < tuple_(created_at, query_id))
+    
+    rows = (await db.execute(statement)).all()
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+    
+    return QueryHistoryPage(
+        queries=[
+            QuerySummary(
+                id=row.id,
+                connection_id=row.connection_id,
+                natural_language_query=row.natural_language_query,
+                is_successful=row.is_successful,
+                execution_time_ms=row.execution_time_ms or 0,
+                row_count=row.row_count,
+                created_at=row.created_at
+            ) for row in rows
+        ],
+        next_cursor=_encode_history_cursor(rows[-1].created_at, rows[-1].id) if has_more else None
+    )
+
+@router.get("/sql-cache/stats")
+async def get_sql_cache_stats(
+    current_user: User = Depends(get_current_user)
+):
+    return sql_cache.stats()
+
+@router.get("/result-cache/stats")
+async def get_result_cache_stats(
+    current_user: User = Depends(get_current_user)
+):
+    return result_cache.stats()
+
+@router.get("/result-store/stats")
+async def get_result_store_stats(
+    current_user: User = Depends(get_current_user)
+):
+    return result_store.stats()
 
 @router.get("/stats", response_model=QueryStats)
 async def get_query_stats(
     current_user: User = Depends(get_current_user),
     db: AsyncSession = Depends(get_database)
 ):
-    from sqlalchemy import func, case
+    from sqlalchemy import func
     
-    # Get query statistics
-    stats_result = await db.execute(
-        select(
-            func.count(Query.id).label('total_queries'),
-            func.count(case((Query.is_successful == True, 1))).label('successful_queries'),
-            func.avg(Query.execution_time_ms).label('avg_response_time')
-        ).where(Query.user_id == current_user.id)
-    )
-    stats = stats_result.first()
+    # Served from the user's all-time rollup row, not from query history
+    bucket = await query_stats.get_all_time(db, current_user.id)
+    summary = query_stats.summarize(bucket)
     
     # Get connections count
     connections_result = await db.execute(
@@ -154,14 +391,108 @@ async def get_query_stats(
     )
     connections_count = connections_result.scalar()
     
-    total_queries = stats.total_queries or 0
-    successful_queries = stats.successful_queries or 0
+    total_queries = summary["total_queries"]
+    successful_queries = summary["successful_queries"]
     success_rate = (successful_queries / total_queries * 100) if total_queries > 0 else 0
     
     return QueryStats(
         total_queries=total_queries,
         successful_queries=successful_queries,
         success_rate=round(success_rate, 1),
-        avg_response_time=round(stats.avg_response_time or 0, 1),
-        data_sources_connected=connections_count or 0
-    )
\ No newline at end of file
+        avg_response_time=summary["avg_ms"],
+        data_sources_connected=connections_count or 0,
+        p50_response_time=summary["p50_ms"],
+        p95_response_time=summary["p95_ms"],
+        stage_latency_ms=query_stats.stage_latency(bucket, PIPELINE_STAGES)
+    )
+
+@router.get("/stats/timeseries", response_model=List[QueryStatsPoint])
+async def get_query_stats_timeseries(
+    granularity: Literal["hour", "day"] = "day",
+    points: int = 30,
+    current_user: User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_database)
+):
+    """Per-hour or per-day counts and latency, oldest first, up to the current bucket"""
+    points = max(1, min(points, settings.QUERY_STATS_MAX_POINTS))
+    series = await query_stats.get_series(db, current_user.id, granularity, points)
+    return [QueryStatsPoint(**point) for point in series]
+
+@router.get("/{query_id}", response_model=QueryResponse)
+async def get_query(
+    query_id: int,
+    result_format: Literal["rows", "columnar"] = "rows",
+    current_user: User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_database)
+):
+    """One past query with its result, chart and insights"""
+    result = await db.execute(
+        select(Query)
+        .options(undefer(Query.execution_result))
+        .where(
+            Query.id == query_id,
+            Query.user_id == current_user.id
+        )
+    )
+    query = result.scalar_one_or_none()
+    if query is None:
+        raise HTTPException(status_code=404, detail="Query not found")
+    
+    stored = query.execution_result
+    if query.result_ref:
+        stored = await result_store.get(db, query.result_ref)
+        if stored is None:
+            raise HTTPException(status_code=404, detail="Stored result not found")
+    
+    return QueryResponse(
+        id=query.id,
+        natural_language_query=query.natural_language_query,
+        generated_sql=query.generated_sql or "",
+        execution_result=format_result(ColumnarResult.from_stored(stored), result_format),
+        ai_insights=query.ai_insights or "",
+        chart_config=query.chart_config or {},
+        execution_time_ms=query.execution_time_ms or 0,
+        is_successful=query.is_successful,
+        prompt_tokens=query.prompt_tokens,
+        completion_tokens=query.completion_tokens,
+        pipeline_metrics=query.pipeline_metrics,
+        row_count=query.row_count,
+        created_at=query.created_at
+    )
+
+@router.get("/{query_id}/rows", response_model=QueryRowsPage)
+async def get_query_rows(
+    query_id: int,
+    token: str,
+    page_size: int = QueryParam(1000, ge=1),
+    result_format: Literal["rows", "columnar"] = "rows",
+    current_user: User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_database)
+):
+    result = await db.execute(
+        select(Query.id).where(
+            Query.id == query_id,
+            Query.user_id == current_user.id
+        )
+    )
+    if result.scalar_one_or_none() is None:
+        raise HTTPException(status_code=404, detail="Query not found")
+    
+    try:
+        page = await cursor_registry.fetch_next(
+            token,
+            current_user.id,
+            query_id,
+            min(page_size, settings.QUERY_MAX_PAGE_SIZE)
+        )
+    except CursorNotFoundError as e:
+        raise HTTPException(status_code=410, detail=str(e))
+    
+    return QueryRowsPage(
+        query_id=query_id,
+        rows=format_result(page.data, result_format),
+        fetched=page.fetched,
+        truncated=page.truncated,
+        total_count=page.total_count,
+        next_token=page.next_token
+    )
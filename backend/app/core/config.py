@@ -1,5 +1,5 @@
 from pydantic_settings import BaseSettings
-from typing import Optional
+from typing import Optional, Dict
 
 class Settings(BaseSettings):
     # Database
@@ -9,10 +9,95 @@ class Settings(BaseSettings):
     SECRET_KEY: str = "openai-api-key"
     ALGORITHM: str = "HS256"
     ACCESS_TOKEN_EXPIRE_MINUTES: int = 30
+    AUTH_PRINCIPAL_CACHE_TTL_SECONDS: float = 30.0  # 0 looks the user up on every request
+    AUTH_PRINCIPAL_CACHE_MAX_ENTRIES: int = 10000
+    AUTH_CLAIMS_ONLY: bool = False  # Trust uid/sub in the token and skip the user lookup
+    
+    # Password hashing, in its own thread pool
+    BCRYPT_ROUNDS: int = 12  # Changing it rehashes passwords as users log in
+    PASSWORD_HASH_WORKERS: int = 2
+    PASSWORD_HASH_MAX_PENDING: int = 16  # Running plus queued; beyond this logins get 503
     
     # OpenAI
     OPENAI_API_KEY: str = ""
     OPENAI_MODEL: str = "gpt-4"
+    OPENAI_TIMEOUT_SECONDS: float = 60.0
+    OPENAI_MAX_RETRIES: int = 3
+    OPENAI_MAX_CONCURRENCY: int = 100
+    OPENAI_MAX_CONNECTIONS: int = 100
+    OPENAI_MAX_KEEPALIVE_CONNECTIONS: int = 20
+    OPENAI_SQL_MAX_TOKENS: int = 1000  # Completion cap for SQL generation
+    INSIGHTS_TIMEOUT_SECONDS: float = 20.0
+    CHART_TIMEOUT_SECONDS: float = 10.0
+    STREAM_ROW_BATCH_SIZE: int = 500
+    
+    # Chart data reduction
+    CHART_POINT_BUDGET: int = 2000  # Max points in a line chart (LTTB above this)
+    CHART_MAX_CATEGORIES: int = 30  # Max bars before top-N + "Other" or histogram binning
+    CHART_MAX_PIE_SLICES: int = 8
+    CHART_HISTOGRAM_BINS: int = 30
+    
+    # Chart building runs off the event loop
+    CHART_EXECUTOR: str = "process"  # "process", "thread" or "inline"
+    CHART_EXECUTOR_WORKERS: int = 2
+    CHART_EXECUTOR_MAX_PENDING: int = 32  # Further requests wait for a free slot
+    LOOP_LAG_INTERVAL_SECONDS: float = 0.5
+    
+    # Warehouse connection pools
+    WAREHOUSE_POOL_MIN_SIZE: int = 1
+    WAREHOUSE_POOL_MAX_SIZE: int = 5
+    WAREHOUSE_POOL_MAX_INACTIVE_SECONDS: float = 300.0
+    WAREHOUSE_POOL_IDLE_TIMEOUT_SECONDS: float = 900.0
+    WAREHOUSE_POOL_MAX_LIFETIME_SECONDS: float = 3600.0
+    WAREHOUSE_POOL_ACQUIRE_TIMEOUT_SECONDS: float = 10.0
+    WAREHOUSE_POOL_CLOSE_TIMEOUT_SECONDS: float = 5.0  # On shutdown
+    WAREHOUSE_POOL_DRAIN_TIMEOUT_SECONDS: float = 600.0  # Retired pools wait this long for running work
+    
+    # Schema cache
+    SCHEMA_CACHE_TTL_SECONDS: float = 300.0
+    SCHEMA_SOURCE: str = "selected"  # selected (persisted SelectedTable rows) or live
+    
+    # SQL prompt token budget
+    SQL_PROMPT_MAX_TOKENS: int = 4000
+    SQL_PROMPT_EXAMPLE_RESERVE_TOKENS: int = 600  # Kept free of schema for relationships and examples
+    SQL_PROMPT_MAX_TABLES: int = 5
+    SQL_PROMPT_MAX_EXAMPLES: int = 3
+    SQL_PROMPT_EXAMPLE_CANDIDATES: int = 50  # Recent successful queries considered as few-shot examples
+    TOKENIZER_ENCODING: str = "cl100k_base"  # tiktoken encoding, estimated locally when unavailable
+    
+    # Embedding-based table retrieval for wide schemas
+    SCHEMA_RETRIEVAL_ENABLED: bool = True
+    SCHEMA_RETRIEVAL_MIN_TABLES: int = 20  # Smaller schemas go to the prompt whole
+    SCHEMA_RETRIEVAL_TOP_K: int = 10
+    SCHEMA_EMBEDDING_BACKEND: str = "hashing"  # hashing or sentence-transformers (needs the package and a local model)
+    SCHEMA_EMBEDDING_MODEL: str = "paraphrase-multilingual-MiniLM-L12-v2"
+    SCHEMA_EMBEDDING_DIR: str = "data/schema_embeddings"
+    
+    # Generated SQL cache
+    SQL_CACHE_BACKEND: str = "memory"  # memory, redis (needs the redis package) or local-redis
+    SQL_CACHE_REDIS_URL: str = "redis://localhost:6379/0"
+    SQL_CACHE_TTL_SECONDS: float = 86400.0
+    SQL_CACHE_MAX_ENTRIES: int = 10000
+    
+    # Executed result cache
+    RESULT_CACHE_TTL_SECONDS: float = 60.0  # 0 disables caching
+    RESULT_CACHE_TTL_OVERRIDES: Dict[int, float] = {}  # {connection_id: ttl_seconds}, JSON in env
+    RESULT_CACHE_MAX_BYTES: int = 256 * 1024 * 1024
+    
+    # Stored query results
+    RESULT_STORE_INLINE_MAX_BYTES: int = 16 * 1024  # Larger results go to the compressed query_results store
+    RESULT_STORE_CODEC: str = "zstd"  # zstd (needs the zstandard package) or zlib
+    RESULT_STORE_ZSTD_LEVEL: int = 3
+    
+    # Result size limits and paging
+    QUERY_MAX_ROWS: int = 10000  # Hard cap enforced with LIMIT at the database
+    QUERY_MAX_PAGE_SIZE: int = 5000
+    QUERY_MAX_OPEN_CURSORS: int = 50
+    QUERY_MAX_OPEN_CURSORS_PER_CONNECTION: int = 2  # Kept below WAREHOUSE_POOL_MAX_SIZE
+    QUERY_CURSOR_TTL_SECONDS: float = 300.0
+    QUERY_CURSOR_REAP_INTERVAL_SECONDS: float = 30.0
+    QUERY_HISTORY_MAX_PAGE_SIZE: int = 100
+    QUERY_STATS_MAX_POINTS: int = 24 * 31  # Longest /stats/timeseries answer, a month of hours
     
     # App
     PROJECT_NAME: str = "GenBI Platform"
@@ -21,6 +21,10 @@ class SQLGenerationError(GenBIException):
     """Exception raised when SQL generation fails"""
     pass
 
+class InsightsGenerationError(GenBIException):
+    """Exception raised when insights generation fails; the message is shown to the user"""
+    pass
+
 class QueryExecutionError(GenBIException):
     """Exception raised when query execution fails"""
     pass
@@ -0,0 +1,62 @@
+import asyncio
+from collections import deque
+from typing import Any, Deque, Dict, Optional
+from app.core.config import settings
+
+
+class LoopLagMonitor:
+    """Measures how late the event loop wakes up a sleeping task.
+
+    A healthy loop resumes the sampler within a millisecond or so of the
+    requested interval; anything more is time the loop spent blocked by
+    synchronous work.
+    """
+
+    def __init__(self, interval_seconds: float, window: int = 600):
+        self.interval_seconds = interval_seconds
+        self._samples: Deque[float] = deque(maxlen=window)
+        self._task: Optional[asyncio.Task] = None
+        self.last_ms = 0.0
+        self.max_ms = 0.0
+
+    def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _run(self) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            started = loop.time()
+            await asyncio.sleep(self.interval_seconds)
+            lag_ms = max(0.0, (loop.time() - started - self.interval_seconds) * 1000)
+            self._samples.append(lag_ms)
+            self.last_ms = lag_ms
+            self.max_ms = max(self.max_ms, lag_ms)
+
+    def _percentile(self, ordered: list, fraction: float) -> float:
+        if not ordered:
+            return 0.0
+        return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+    def stats(self) -> Dict[str, Any]:
+        ordered = sorted(self._samples)
+        return {
+            "samples": len(ordered),
+            "last_ms": round(self.last_ms, 2),
+            "p50_ms": round(self._percentile(ordered, 0.50), 2),
+            "p95_ms": round(self._percentile(ordered, 0.95), 2),
+            "p99_ms": round(self._percentile(ordered, 0.99), 2),
+            "max_ms": round(self.max_ms, 2)
+        }
+
+
+loop_monitor = LoopLagMonitor(settings.LOOP_LAG_INTERVAL_SECONDS)
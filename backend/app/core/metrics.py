@@ -0,0 +1,210 @@
+import math
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+# Latency buckets in seconds, from sub-millisecond cache hits to slow LLM calls
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+LabelValues = Tuple[str, ...]
+# (labels, value) pairs a collector reports for one metric at scrape time
+Sample = Tuple[Dict[str, str], float]
+
+
+def _escape(value: str) -> str:
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _format_labels(labels: Dict[str, str]) -> str:
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in labels.items()) + "}"
+
+
+def _format_value(value: float) -> str:
+    if math.isinf(value):
+        return "+Inf" if value > 0 else "-Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+class _Metric:
+    type_name = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+
+    def _key(self, labels: Dict[str, str]) -> LabelValues:
+        return tuple(str(labels.get(name, "")) for name in self.labelnames)
+
+    def _labels(self, key: LabelValues, **extra: str) -> Dict[str, str]:
+        labels = dict(zip(self.labelnames, key))
+        labels.update(extra)
+        return labels
+
+    def header(self) -> List[str]:
+        return [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.type_name}"]
+
+    def render(self) -> List[str]:
+        raise NotImplementedError
+
+
+class Counter(_Metric):
+    type_name = "counter"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        super().__init__(name, documentation, labelnames)
+        self._values: Dict[LabelValues, float] = {}
+
+    def inc(self, amount: float = 1.0, **labels: str) -> None:
+        key = self._key(labels)
+        self._values[key] = self._values.get(key, 0.0) + amount
+
+    def render(self) -> List[str]:
+        return [
+            f"{self.name}{_format_labels(self._labels(key))} {_format_value(value)}"
+            for key, value in self._values.items()
+        ]
+
+
+class Histogram(_Metric):
+    type_name = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Sequence[str] = (),
+        buckets: Sequence[float] = DEFAULT_BUCKETS
+    ):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets)) + (math.inf,)
+        self._counts: Dict[LabelValues, List[int]] = {}
+        self._sums: Dict[LabelValues, float] = {}
+
+    def observe(self, value: float, **labels: str) -> None:
+        key = self._key(labels)
+        counts = self._counts.get(key)
+        if counts is None:
+            counts = self._counts[key] = [0] * len(self.buckets)
+            self._sums[key] = 0.0
+        # Stored per bucket, made cumulative when rendered
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                counts[i] += 1
+                break
+        self._sums[key] += value
+
+    def render(self) -> List[str]:
+        lines = []
+        for key, counts in self._counts.items():
+            cumulative = 0
+            for bound, count in zip(self.buckets, counts):
+                cumulative += count
+                labels = self._labels(key, le=_format_value(bound))
+                lines.append(f"{self.name}_bucket{_format_labels(labels)} {cumulative}")
+            labels = _format_labels(self._labels(key))
+            lines.append(f"{self.name}_sum{labels} {_format_value(self._sums[key])}")
+            lines.append(f"{self.name}_count{labels} {cumulative}")
+        return lines
+
+
+class GaugeCollector(_Metric):
+    """Gauge whose samples are read from application state at scrape time"""
+    type_name = "gauge"
+
+    def __init__(self, name: str, documentation: str, collect: Callable[[], Iterable[Sample]]):
+        super().__init__(name, documentation)
+        self.collect = collect
+
+    def render(self) -> List[str]:
+        try:
+            samples = list(self.collect())
+        except Exception as e:
+            print(f"Metrics collector {self.name} failed: {str(e)}")
+            return []
+        return [f"{self.name}{_format_labels(labels)} {_format_value(value)}" for labels, value in samples]
+
+
+class CounterCollector(GaugeCollector):
+    """Counter whose cumulative samples are read from application state at scrape time"""
+    type_name = "counter"
+
+
+class MetricsRegistry:
+    """In-process metrics rendered in the Prometheus text exposition format.
+
+    Updates happen on the event loop thread, so no locking is needed.
+    """
+
+    def __init__(self):
+        self._metrics: Dict[str, _Metric] = {}
+
+    def _register(self, metric: _Metric) -> _Metric:
+        existing = self._metrics.get(metric.name)
+        if existing is not None:
+            return existing
+        self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Counter:
+        return self._register(Counter(name, documentation, labelnames))
+
+    def histogram(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Sequence[str] = (),
+        buckets: Optional[Sequence[float]] = None
+    ) -> Histogram:
+        return self._register(Histogram(name, documentation, labelnames, buckets or DEFAULT_BUCKETS))
+
+    def gauge_collector(self, name: str, documentation: str, collect: Callable[[], Iterable[Sample]]) -> GaugeCollector:
+        return self._register(GaugeCollector(name, documentation, collect))
+
+    def counter_collector(self, name: str, documentation: str, collect: Callable[[], Iterable[Sample]]) -> CounterCollector:
+        return self._register(CounterCollector(name, documentation, collect))
+
+    def render(self) -> str:
+        lines = []
+        for metric in self._metrics.values():
+            samples = metric.render()
+            if samples:
+                lines.extend(metric.header())
+                lines.extend(samples)
+        return "\n".join(lines) + "\n"
+
+
+metrics_registry = MetricsRegistry()
+
+# Instruments shared across the app
+http_requests_total = metrics_registry.counter(
+    "genbi_http_requests_total", "HTTP requests by route template and status", ("method", "route", "status")
+)
+http_request_duration = metrics_registry.histogram(
+    "genbi_http_request_duration_seconds", "HTTP request latency until the last body chunk", ("method", "route")
+)
+llm_request_duration = metrics_registry.histogram(
+    "genbi_llm_request_duration_seconds", "OpenAI chat completion latency", ("operation", "outcome")
+)
+llm_tokens_total = metrics_registry.counter(
+    "genbi_llm_tokens_total", "OpenAI tokens used", ("operation", "kind")
+)
+warehouse_query_duration = metrics_registry.histogram(
+    "genbi_warehouse_query_duration_seconds", "Warehouse SQL execution latency", ("connection_id", "outcome")
+)
+password_hash_duration = metrics_registry.histogram(
+    "genbi_password_hash_duration_seconds", "bcrypt hash/verify latency, queueing included", ("operation",),
+    buckets=(0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+)
+password_hash_rejected_total = metrics_registry.counter(
+    "genbi_password_hash_rejected_total", "Password operations rejected because the hashing queue was full", ("operation",)
+)
+warehouse_pool_wait_duration = metrics_registry.histogram(
+    "genbi_warehouse_pool_wait_seconds", "Time spent waiting for a pooled warehouse connection", ("connection_id",),
+    buckets=(0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0, 10.0)
+)
+prompt_tables_dropped_total = metrics_registry.counter(
+    "genbi_prompt_tables_dropped_total", "Tables left out of SQL prompts to fit the token budget"
+)
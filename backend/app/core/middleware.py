@@ -1,7 +1,10 @@
 import time
 import logging
+from typing import Sequence
 from fastapi import Request, Response
 from starlette.middleware.base import BaseHTTPMiddleware
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+from app.core.metrics import http_requests_total, http_request_duration
 
 logger = logging.getLogger(__name__)
 
@@ -34,4 +37,41 @@ class CORSMiddleware(BaseHTTPMiddleware):
         response.headers["Access-Control-Allow-Methods"] = "GET, POST, PUT, DELETE, OPTIONS"
         response.headers["Access-Control-Allow-Headers"] = "Content-Type, Authorization"
         
-        return response
\ No newline at end of file
+        return response
+
+class MetricsMiddleware:
+    """Pure ASGI middleware recording request count and latency per route template.
+    
+    Unlike BaseHTTPMiddleware it doesn't run the endpoint in a separate task or
+    re-stream the body, so it costs almost nothing per request and leaves
+    StreamingResponse (SSE) untouched. Latency runs until the last body chunk.
+    """
+    
+    def __init__(self, app: ASGIApp, skip_paths: Sequence[str] = ("/metrics",)):
+        self.app = app
+        self.skip_paths = set(skip_paths)
+    
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or scope["path"] in self.skip_paths:
+            await self.app(scope, receive, send)
+            return
+        
+        started = time.perf_counter()
+        status_code = 500
+        
+        async def send_with_status(message: Message) -> None:
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+        
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            # The router stores the matched route in the scope; label by its template,
+            # not the raw path, to keep label cardinality bounded
+            route = scope.get("route")
+            route_path = getattr(route, "path", None) or "unmatched"
+            method = scope["method"]
+            http_requests_total.inc(method=method, route=route_path, status=str(status_code))
+            http_request_duration.observe(time.perf_counter() - started, method=method, route=route_path)
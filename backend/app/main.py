@@ -1,7 +1,17 @@
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import PlainTextResponse
 from app.core.config import settings
+from app.core.loop_monitor import loop_monitor
+from app.core.metrics import metrics_registry
+from app.core.middleware import MetricsMiddleware
 from app.api.endpoints import auth, connections, queries, tables
+from app.services.connection_pool import pool_registry
+from app.services.openai_service import shared_openai_client
+from app.services.result_cursor import cursor_registry
+from app.services.chart_executor import chart_executor
+from app.services.password_hasher import password_hasher
+from app.services.metrics_collectors import register_collectors
 
 app = FastAPI(
     title=settings.PROJECT_NAME,
@@ -18,19 +28,62 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Request metrics - pure ASGI, so streaming responses pass straight through
+app.add_middleware(MetricsMiddleware)
+register_collectors()
+
 # Include routers
 app.include_router(auth.router, prefix="/api/auth", tags=["auth"])
 app.include_router(connections.router, prefix="/api/connections", tags=["connections"])
 app.include_router(queries.router, prefix="/api/queries", tags=["queries"])
 app.include_router(tables.router, prefix="/api/tables", tags=["tables"])
 
+@app.on_event("startup")
+async def start_loop_monitor():
+    loop_monitor.start()
+
+@app.on_event("startup")
+async def start_cursor_reaper():
+    cursor_registry.start()
+
+@app.on_event("shutdown")
+async def stop_loop_monitor():
+    await loop_monitor.stop()
+
+@app.on_event("shutdown")
+async def close_chart_executor():
+    chart_executor.shutdown()
+
+@app.on_event("shutdown")
+async def close_password_hasher():
+    password_hasher.shutdown()
+
+@app.on_event("shutdown")
+async def close_warehouse_pools():
+    # Cursors hold pooled connections, release them before closing the pools
+    await cursor_registry.close_all()
+    await pool_registry.close_all()
+
+@app.on_event("shutdown")
+async def close_openai_client():
+    await shared_openai_client.close()
+
 @app.get("/")
 async def root():
     return {"message": f"Welcome to {settings.PROJECT_NAME} API"}
 
+@app.get("/metrics", include_in_schema=False)
+async def metrics():
+    return PlainTextResponse(metrics_registry.render(), media_type="text/plain; version=0.0.4; charset=utf-8")
+
 @app.get("/health")
 async def health_check():
-    return {"status": "healthy"}
+    return {
+        "status": "healthy",
+        "event_loop_lag": loop_monitor.stats(),
+        "chart_executor": chart_executor.stats(),
+        "password_hasher": password_hasher.stats()
+    }
 
 if __name__ == "__main__":
     import uvicorn
@@ -1,7 +1,7 @@
 from .user import User
 from .connection import DatabaseConnection, SelectedTable
 from .table_model import TableModel, TableRelationship, CalculatedField
-from .query import Query
+from .query import Query, QueryResult, QueryStatsBucket
 
 __all__ = [
     "User",
@@ -10,5 +10,7 @@ __all__ = [
     "TableModel", 
     "TableRelationship", 
     "CalculatedField",
-    "Query"
+    "Query",
+    "QueryResult",
+    "QueryStatsBucket"
 ]
@@ -1,10 +1,16 @@
-from sqlalchemy import Column, Integer, String, ForeignKey, DateTime, Text, JSON, Float, Boolean
+from sqlalchemy import Column, Integer, String, ForeignKey, DateTime, Text, JSON, Float, Boolean, LargeBinary, Index
 from sqlalchemy.sql import func
-from sqlalchemy.orm import relationship
+from sqlalchemy.orm import relationship, deferred
 from ..core.database import Base
 
 class Query(Base):
     __tablename__ = "queries"
+    __table_args__ = (
+        # History pages: WHERE user_id = ? ORDER BY created_at DESC, id DESC
+        Index("ix_queries_user_id_created_at_id", "user_id", "created_at", "id"),
+        # Few-shot examples: recent queries on a connection
+        Index("ix_queries_connection_id_created_at", "connection_id", "created_at"),
+    )
     
     id = Column(Integer, primary_key=True, index=True)
     user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
@@ -13,7 +19,11 @@ class Query(Base):
     # Query details
     natural_language_query = Column(Text, nullable=False)
     generated_sql = Column(Text, nullable=True)
-    execution_result = Column(JSON, nullable=True)  # Query results
+    # Small results are kept inline; larger ones live in query_results and
+    # only their digest is stored here. Deferred so history loads skip it.
+    execution_result = deferred(Column(JSON, nullable=True))
+    result_ref = Column(String(64), ForeignKey("query_results.digest"), nullable=True, index=True)
+    row_count = Column(Integer, nullable=True)  # For history listings, without loading the result
     
     # AI Generated insights
     ai_insights = Column(Text, nullable=True)
@@ -24,7 +34,50 @@ class Query(Base):
     is_successful = Column(Boolean, default=False)
     error_message = Column(Text, nullable=True)
     
+    # LLM token usage (SQL generation and insights)
+    prompt_tokens = Column(Integer, nullable=True)
+    completion_tokens = Column(Integer, nullable=True)
+    
+    # Per-stage timings, cache flags and token counts (PipelineContext.to_dict)
+    pipeline_metrics = Column(JSON, nullable=True)
+    
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     
     # Relationships
     user = relationship("User", back_populates="queries")
+
+class QueryResult(Base):
+    """Compressed result payload, addressed by the SHA-256 of its JSON"""
+    __tablename__ = "query_results"
+    
+    digest = Column(String(64), primary_key=True)
+    codec = Column(String(16), nullable=False)  # zstd or zlib
+    payload = Column(LargeBinary, nullable=False)
+    raw_bytes = Column(Integer, nullable=False)
+    stored_bytes = Column(Integer, nullable=False)
+    row_count = Column(Integer, nullable=True)
+    
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+
+class QueryStatsBucket(Base):
+    """Per-user query counters and latency histograms for one hour, day or all time.
+
+    Maintained in the transaction that inserts each Query (see
+    app.services.query_stats), so /stats never scans query history.
+    """
+    __tablename__ = "query_stats_buckets"
+    
+    user_id = Column(Integer, ForeignKey("users.id"), primary_key=True)
+    granularity = Column(String(8), primary_key=True)  # hour, day or all
+    bucket_start = Column(DateTime(timezone=True), primary_key=True)
+    
+    total_queries = Column(Integer, nullable=False, default=0)
+    successful_queries = Column(Integer, nullable=False, default=0)
+    execution_time_sum_ms = Column(Float, nullable=False, default=0.0)
+    execution_time_count = Column(Integer, nullable=False, default=0)
+    
+    # Counts per query_stats.LATENCY_BOUNDS_MS bucket, overall and per pipeline stage
+    latency_histogram = Column(JSON, nullable=False)
+    stage_histograms = Column(JSON, nullable=False)
+    
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
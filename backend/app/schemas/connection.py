@@ -38,6 +38,9 @@ class TableInfo(BaseModel):
     schema_name: Optional[str]
     table_name: str
     columns: Dict[str, Any]
+    primary_key: List[str] = []
+    foreign_keys: List[Dict[str, Any]] = []  # [{columns, ref_schema, ref_table, ref_columns}]
+    row_count: Optional[int] = None  # Planner estimate (reltuples), not an exact count
 
 class SelectedTableCreate(BaseModel):
     table_name: str
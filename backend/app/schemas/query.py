@@ -1,20 +1,32 @@
-from pydantic import BaseModel
-from typing import List, Dict, Any, Optional
+from pydantic import BaseModel, Field
+from typing import List, Dict, Any, Optional, Union, Literal
 from datetime import datetime
 
 class QueryRequest(BaseModel):
     natural_language_query: str
     connection_id: int
+    page_size: Optional[int] = Field(None, ge=1)  # Read through a server-side cursor, first page only
+    result_format: Literal["rows", "columnar"] = "rows"
+    include_metrics: bool = False  # Return per-stage timings in pipeline_metrics
 
 class QueryResponse(BaseModel):
     id: int
     natural_language_query: str
     generated_sql: str
-    execution_result: List[Dict[str, Any]]
+    execution_result: Union[List[Dict[str, Any]], Dict[str, Any]]  # rows or {"columns", "types", "data"}
     ai_insights: str
     chart_config: Dict[str, Any]
     execution_time_ms: float
     is_successful: bool
+    result_cached: bool = False
+    result_age_seconds: Optional[float] = None
+    truncated: bool = False
+    total_count: Optional[int] = None
+    next_token: Optional[str] = None
+    prompt_tokens: Optional[int] = None
+    completion_tokens: Optional[int] = None
+    pipeline_metrics: Optional[Dict[str, Any]] = None
+    row_count: Optional[int] = None
     created_at: datetime
     
     class Config:
@@ -26,9 +38,27 @@ class QueryStats(BaseModel):
     success_rate: float
     avg_response_time: float
     data_sources_connected: int
+    p50_response_time: Optional[float] = None
+    p95_response_time: Optional[float] = None
+    stage_latency_ms: Dict[str, Dict[str, float]] = {}
 
-class QueryHistory(BaseModel):
-    queries: List[QueryResponse]
-    total_count: int
-    page: int
-    page_size: int
\ No newline at end of file
+class QueryStatsPoint(BaseModel):
+    bucket_start: datetime
+    total_queries: int
+    successful_queries: int
+    avg_ms: float
+    p50_ms: Optional[float]
+    p95_ms: Optional[float]
+
+class QuerySummary(BaseModel):
+    id: int
+    connection_id: Optional[int]
+    natural_language_query: str
+    is_successful: bool
+    execution_time_ms: float
+    row_count: Optional[int]
+    created_at: datetime
+
+class QueryHistoryPage(BaseModel):
+    queries: List[QuerySummary]
+    next_cursor: Optional[str]  # None on the last page
\ No newline at end of file
@@ -1,7 +1,8 @@
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select
 from app.models.user import User
-from app.core.security import verify_password, get_password_hash
+from app.services.password_hasher import password_hasher
+from app.services.principal_cache import apply_rehash
 
 class AuthService:
     @staticmethod
@@ -10,18 +11,20 @@ class AuthService:
         result = await db.execute(select(User).where(User.username == username))
         user = result.scalar_one_or_none()
         
-        if not user:
+        valid, new_hash = await password_hasher.verify_and_update(password, user.hashed_password if user else None)
+        if not valid:
             return None
         
-        if not verify_password(password, user.hashed_password):
-            return None
+        if new_hash is not None:
+            apply_rehash(user, new_hash)
+            await db.commit()
         
         return user
     
     @staticmethod
     async def create_user(db: AsyncSession, username: str, password: str, email: str = None) -> User:
         """Create new user"""
-        hashed_password = get_password_hash(password)
+        hashed_password = await password_hasher.hash(password)
         
         user = User(
             username=username,
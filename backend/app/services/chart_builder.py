@@ -0,0 +1,523 @@
+import numpy as np
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Tuple
+from app.core.config import settings
+from app.utils.columnar import ColumnarResult
+
+# Column-name keywords that mark a time axis
+DATE_KEYWORDS = ['date', 'time', 'month', 'year', 'day', 'сана', 'вақт', 'ой', 'йил', 'кун', 'дата', 'время', 'месяц', 'год', 'день']
+
+_TIME_TYPES = {'timestamp', 'timestamptz', 'date', 'time', 'timetz'}
+
+
+@dataclass
+class ColumnProfile:
+    """Everything chart inference needs to know about one column, computed in one pass"""
+    name: str
+    type_name: str
+    row_count: int
+    null_count: int  # None or empty string
+    cardinality: int  # Distinct non-empty values, compared as strings
+    is_numeric: bool  # Every value is a number or a numeric string
+    is_non_negative: bool
+    is_time_like: bool
+    is_monotonic: bool
+    numeric: np.ndarray  # float64, NaN where a value is missing or not numeric
+    first_value: Any
+    min: Optional[float] = None
+    max: Optional[float] = None
+
+
+def _is_numeric_string(value: str) -> bool:
+    return value.replace('.', '').replace('-', '').isdigit()
+
+
+def profile_column(name: str, type_name: str, array: Any) -> ColumnProfile:
+    """Profile a ColumnarResult column, vectorized for NumPy columns, one Python pass otherwise"""
+    name_is_time = any(keyword in name.lower() for keyword in DATE_KEYWORDS)
+    is_time_like = name_is_time or type_name in _TIME_TYPES
+
+    if isinstance(array, np.ndarray):
+        row_count = len(array)
+        numeric = array.astype(np.float64)
+        null_count = 0
+        cardinality = len(np.unique(array))
+        is_numeric = True
+        first_value = array[0].item() if row_count else None
+        is_monotonic = bool(row_count < 2 or np.all(numeric[1:] >= numeric[:-1]))
+    else:
+        row_count = len(array)
+        numeric = np.full(row_count, np.nan)
+        null_count = 0
+        distinct = set()
+        is_numeric = True
+        first_value = array[0] if row_count else None
+
+        for i, value in enumerate(array):
+            if value is None or value == '':
+                null_count += 1
+                if value is None:
+                    is_numeric = False
+                continue
+
+            distinct.add(str(value))
+            if isinstance(value, (int, float)):
+                numeric[i] = value
+            elif isinstance(value, str) and _is_numeric_string(value):
+                try:
+                    numeric[i] = float(value)
+                except ValueError:
+                    is_numeric = False
+            else:
+                is_numeric = False
+
+        cardinality = len(distinct)
+        if is_numeric:
+            is_monotonic = bool(row_count < 2 or np.all(numeric[1:] >= numeric[:-1]))
+        else:
+            # ISO dates and timestamps sort correctly as strings
+            is_monotonic = all(
+                a is not None and b is not None and str(a) <= str(b)
+                for a, b in zip(array, array[1:])
+            )
+
+    finite = numeric[~np.isnan(numeric)]
+    return ColumnProfile(
+        name=name,
+        type_name=type_name,
+        row_count=row_count,
+        null_count=null_count,
+        cardinality=cardinality,
+        is_numeric=is_numeric,
+        is_non_negative=bool(finite.size == 0 or finite.min() >= 0),
+        is_time_like=is_time_like,
+        is_monotonic=is_monotonic,
+        numeric=numeric,
+        first_value=first_value,
+        min=float(finite.min()) if finite.size else None,
+        max=float(finite.max()) if finite.size else None
+    )
+
+
+def _labels(array: Any) -> List[str]:
+    values = array.tolist() if isinstance(array, np.ndarray) else array
+    return [str(value) for value in values]
+
+
+def _values(profile: ColumnProfile) -> List[float]:
+    # Non-numeric or missing values plot as 0
+    return np.nan_to_num(profile.numeric, nan=0.0).tolist()
+
+
+def lttb_indices(x: np.ndarray, y: np.ndarray, threshold: int) -> np.ndarray:
+    """Largest-Triangle-Three-Buckets: indices of the points that best keep the line's shape"""
+    n = len(x)
+    if threshold >= n or threshold < 3:
+        return np.arange(n)
+
+    indices = np.empty(threshold, dtype=np.int64)
+    indices[0] = 0
+    indices[-1] = n - 1
+    every = (n - 2) / (threshold - 2)
+    a = 0
+
+    for i in range(threshold - 2):
+        # Average of the next bucket is the third triangle vertex
+        next_start = int((i + 1) * every) + 1
+        next_end = min(int((i + 2) * every) + 1, n)
+        avg_x = x[next_start:next_end].mean()
+        avg_y = y[next_start:next_end].mean()
+
+        start = int(i * every) + 1
+        end = int((i + 1) * every) + 1
+        areas = np.abs(
+            (x[a] - avg_x) * (y[start:end] - y[a]) -
+            (x[a] - x[start:end]) * (avg_y - y[a])
+        )
+        a = start + int(np.argmax(areas))
+        indices[i + 1] = a
+
+    return indices
+
+
+def _time_axis(labels: List[str], profile: ColumnProfile) -> np.ndarray:
+    """Numeric x positions for LTTB: real timestamps when parseable, else row order"""
+    if profile.is_time_like and profile.is_monotonic:
+        try:
+            return np.array(labels, dtype='datetime64[ms]').astype(np.int64).astype(np.float64)
+        except (ValueError, TypeError):
+            pass
+    return np.arange(len(labels), dtype=np.float64)
+
+
+def _other_label(detected_lang: str) -> str:
+    if detected_lang == 'uzbek':
+        return "Boshqa"
+    elif detected_lang == 'russian':
+        return "Другое"
+    return "Other"
+
+
+def top_n_with_other(labels: List[str], values: List[float], n: int, other_label: str) -> Tuple[List[str], List[float]]:
+    """Sum values per label, keep the n-1 largest and fold the rest into one bucket"""
+    unique_labels, inverse = np.unique(np.asarray(labels, dtype=object).astype(str), return_inverse=True)
+    sums = np.bincount(inverse, weights=np.asarray(values, dtype=np.float64))
+
+    if len(unique_labels) <= n:
+        order = np.argsort(-sums, kind='stable')
+        return unique_labels[order].tolist(), sums[order].tolist()
+
+    order = np.argsort(-sums, kind='stable')
+    keep = order[:n - 1]
+    rest = order[n - 1:]
+    return (
+        unique_labels[keep].tolist() + [other_label],
+        sums[keep].tolist() + [float(sums[rest].sum())]
+    )
+
+
+def histogram_bins(x: np.ndarray, values: List[float], bins: int) -> Tuple[List[str], List[float]]:
+    """Bin a numeric x axis and sum the y values per bin"""
+    y = np.asarray(values, dtype=np.float64)
+    mask = ~np.isnan(x)
+    sums, edges = np.histogram(x[mask], bins=bins, weights=y[mask])
+    labels = [f"{lo:g}–{hi:g}" for lo, hi in zip(edges[:-1], edges[1:])]
+    return labels, sums.tolist()
+
+
+def reduce_chart_data(
+    chart_type: str,
+    labels: List[str],
+    values: List[float],
+    x_profile: ColumnProfile,
+    detected_lang: str
+) -> Tuple[List[str], List[float], Optional[Dict[str, Any]]]:
+    """Bound the number of plotted points regardless of result size"""
+    point_count = len(labels)
+
+    if chart_type == "line":
+        if point_count <= settings.CHART_POINT_BUDGET:
+            return labels, values, None
+        x = _time_axis(labels, x_profile)
+        indices = lttb_indices(x, np.asarray(values, dtype=np.float64), settings.CHART_POINT_BUDGET)
+        return (
+            [labels[i] for i in indices.tolist()],
+            [values[i] for i in indices.tolist()],
+            {"method": "lttb", "original_points": point_count}
+        )
+
+    max_categories = settings.CHART_MAX_PIE_SLICES if chart_type == "pie" else settings.CHART_MAX_CATEGORIES
+    if x_profile.cardinality <= max_categories and point_count <= max_categories:
+        return labels, values, None
+
+    if x_profile.is_numeric and not x_profile.is_time_like:
+        labels, values = histogram_bins(x_profile.numeric, values, settings.CHART_HISTOGRAM_BINS)
+        return labels, values, {"method": "histogram", "original_points": point_count}
+
+    labels, values = top_n_with_other(labels, values, max_categories, _other_label(detected_lang))
+    return labels, values, {"method": "top_n", "original_points": point_count}
+
+
+def create_summary_view(data: List[Dict[str, Any]], query: str, detected_lang: str) -> Dict[str, Any]:
+    """Create a summary view for single results or non-chartable data"""
+    if not data:
+        return {}
+
+    # For single result, create a formatted summary
+    if len(data) == 1:
+        result = data[0]
+
+        if detected_lang == 'uzbek':
+            summary = {
+                "type": "single_result",
+                "title": "Natija",
+                "data": result,
+                "message": "Bitta natija topildi"
+            }
+        elif detected_lang == 'russian':
+            summary = {
+                "type": "single_result",
+                "title": "Результат",
+                "data": result,
+                "message": "Найден один результат"
+            }
+        else:
+            summary = {
+                "type": "single_result",
+                "title": "Result",
+                "data": result,
+                "message": "Single result found"
+            }
+
+        # If it's a query about "maximum", "minimum", "best", etc., format it specially
+        query_lower = query.lower()
+        superlative_keywords = {
+            'uzbek': ['eng ko\'p', 'eng kam', 'eng yaxshi', 'eng yomon', 'maksimal', 'minimal', 'birinchi'],
+            'russian': ['самый большой', 'самый маленький', 'максимальный', 'минимальный', 'наибольший', 'наименьший', 'первый'],
+            'english': ['maximum', 'minimum', 'highest', 'lowest', 'best', 'worst', 'top', 'first', 'most', 'least']
+        }
+
+        is_superlative = any(keyword in query_lower for keyword in superlative_keywords.get(detected_lang, []))
+
+        if is_superlative:
+            if detected_lang == 'uzbek':
+                summary["title"] = "Eng yaxshi natija"
+                summary["message"] = "So'rov bo'yicha eng mos natija"
+            elif detected_lang == 'russian':
+                summary["title"] = "Лучший результат"
+                summary["message"] = "Наиболее подходящий результат по запросу"
+            else:
+                summary["title"] = "Best Result"
+                summary["message"] = "Most relevant result for your query"
+
+        return summary
+
+    # For multiple identical values, show table format
+    else:
+        if detected_lang == 'uzbek':
+            return {
+                "type": "table_view",
+                "title": "Jadval ko'rinishi",
+                "data": data,
+                "message": "Ma'lumotlar jadval ko'rinishida"
+            }
+        elif detected_lang == 'russian':
+            return {
+                "type": "table_view",
+                "title": "Табличный вид",
+                "data": data,
+                "message": "Данные в табличном виде"
+            }
+        else:
+            return {
+                "type": "table_view",
+                "title": "Table View",
+                "data": data,
+                "message": "Data in table format"
+            }
+
+
+def build_chart_config(data: ColumnarResult, query: str, detected_lang: str) -> Dict[str, Any]:
+    """Pick a chart type from a one-pass profile of the first two columns and build the Plotly config"""
+    # Check if data is empty
+    if not data:
+        if detected_lang == 'uzbek':
+            return {"no_chart": True, "message": "Ma'lumot topilmadi", "reason": "empty_data"}
+        elif detected_lang == 'russian':
+            return {"no_chart": True, "message": "Данные не найдены", "reason": "empty_data"}
+        else:
+            return {"no_chart": True, "message": "No data found", "reason": "empty_data"}
+
+    row_count = len(data)
+
+    # Check if data is too small for meaningful chart
+    if row_count < 2:
+        # Create summary view instead of chart
+        summary = create_summary_view(data.to_rows(), query, detected_lang)
+        summary.update({
+            "no_chart": True,
+            "reason": "insufficient_data",
+            "data_count": row_count
+        })
+        if detected_lang == 'uzbek':
+            summary["message"] = "Grafik uchun ma'lumot yetarli emas"
+        elif detected_lang == 'russian':
+            summary["message"] = "Недостаточно данных для графика"
+        else:
+            summary["message"] = "Insufficient data for chart"
+        return summary
+
+    columns = data.columns
+
+    # Check if we have enough columns for a meaningful chart
+    if len(columns) < 2:
+        if detected_lang == 'uzbek':
+            return {"no_chart": True, "message": "Ustunlar yetarli emas", "reason": "insufficient_columns"}
+        elif detected_lang == 'russian':
+            return {"no_chart": True, "message": "Недостаточно столбцов", "reason": "insufficient_columns"}
+        else:
+            return {"no_chart": True, "message": "Insufficient columns", "reason": "insufficient_columns"}
+
+    # Profile once, every branch below reads from these
+    x_profile = profile_column(columns[0], data.types[0], data.arrays[0])
+    y_profile = profile_column(columns[1], data.types[1], data.arrays[1])
+
+    # Check if second column has meaningful data for charting
+    if y_profile.null_count == row_count:
+        if detected_lang == 'uzbek':
+            return {"no_chart": True, "message": "Ma'lumot bo'sh", "reason": "empty_values"}
+        elif detected_lang == 'russian':
+            return {"no_chart": True, "message": "Пустые данные", "reason": "empty_values"}
+        else:
+            return {"no_chart": True, "message": "Empty data", "reason": "empty_values"}
+
+    # Check if we have only one unique value (not meaningful for chart)
+    if y_profile.cardinality == 1:
+        value = next(str(v) for v in (
+            data.arrays[1].tolist() if isinstance(data.arrays[1], np.ndarray) else data.arrays[1]
+        ) if v is not None and v != '')
+        if detected_lang == 'uzbek':
+            return {"no_chart": True, "message": "Bir xil qiymatlar", "reason": "uniform_values", "value": value}
+        elif detected_lang == 'russian':
+            return {"no_chart": True, "message": "Одинаковые значения", "reason": "uniform_values", "value": value}
+        else:
+            return {"no_chart": True, "message": "Identical values", "reason": "uniform_values", "value": value}
+
+    # Determine chart type based on data characteristics
+    if (row_count <= 8 and
+            y_profile.is_numeric and
+            y_profile.is_non_negative and
+            not x_profile.is_time_like):
+        chart_type = "pie"
+    elif x_profile.is_time_like:
+        chart_type = "line"
+    else:
+        chart_type = "bar"
+
+    # Generate language-appropriate titles and labels
+    if detected_lang == 'uzbek':
+        title_template = f"{columns[1]} bo'yicha {columns[0]}"
+        over_word = "ustida"
+    elif detected_lang == 'russian':
+        title_template = f"{columns[1]} по {columns[0]}"
+        over_word = "по времени"
+    else:
+        title_template = f"{columns[1]} by {columns[0]}"
+        over_word = "over"
+
+    labels = _labels(data.arrays[0])
+    values = _values(y_profile)
+
+    # Keep stored and shipped chart payloads bounded
+    labels, values, reduction = reduce_chart_data(chart_type, labels, values, x_profile, detected_lang)
+    point_count = len(labels)
+
+    # Generate configuration based on chart type
+    if chart_type == "pie":
+        config = {
+            "data": [{
+                "labels": labels,
+                "values": values,
+                "type": "pie",
+                "hole": 0.3,
+                "textinfo": "label+percent",
+                "textposition": "outside"
+            }],
+            "layout": {
+                "title": {
+                    "text": title_template,
+                    "font": {"size": 16}
+                },
+                "margin": {"l": 60, "r": 60, "t": 80, "b": 60},
+                "showlegend": True
+            }
+        }
+
+    elif chart_type == "line":
+        config = {
+            "data": [{
+                "x": labels,
+                "y": values,
+                "type": "scatter",
+                "mode": "lines+markers",
+                "name": columns[1],
+                "line": {"color": "rgb(54, 162, 235)", "width": 3},
+                "marker": {"color": "rgb(54, 162, 235)", "size": 6}
+            }],
+            "layout": {
+                "title": {
+                    "text": f"{columns[1]} {over_word} {columns[0]}",
+                    "font": {"size": 16}
+                },
+                "xaxis": {
+                    "title": columns[0],
+                    "showgrid": True,
+                    "gridcolor": "rgba(128, 128, 128, 0.2)"
+                },
+                "yaxis": {
+                    "title": columns[1],
+                    "showgrid": True,
+                    "gridcolor": "rgba(128, 128, 128, 0.2)"
+                },
+                "plot_bgcolor": "white",
+                "paper_bgcolor": "white",
+                "margin": {"l": 60, "r": 40, "t": 80, "b": 60}
+            }
+        }
+
+    else:  # bar chart
+        # Check if we need horizontal bars (long labels or many items)
+        use_horizontal = (any(len(label) > 12 for label in labels) or
+                          point_count > 15)
+
+        if use_horizontal:
+            config = {
+                "data": [{
+                    "x": values,
+                    "y": labels,
+                    "type": "bar",
+                    "orientation": "h",
+                    "name": columns[1],
+                    "marker": {
+                        "color": "rgba(54, 162, 235, 0.8)",
+                        "line": {"color": "rgba(54, 162, 235, 1)", "width": 1}
+                    }
+                }],
+                "layout": {
+                    "title": {
+                        "text": title_template,
+                        "font": {"size": 16}
+                    },
+                    "xaxis": {
+                        "title": columns[1],
+                        "showgrid": True,
+                        "gridcolor": "rgba(128, 128, 128, 0.2)"
+                    },
+                    "yaxis": {
+                        "title": columns[0],
+                        "showgrid": True,
+                        "gridcolor": "rgba(128, 128, 128, 0.2)"
+                    },
+                    "plot_bgcolor": "white",
+                    "paper_bgcolor": "white",
+                    "margin": {"l": 120, "r": 40, "t": 80, "b": 60},
+                    "height": max(400, point_count * 30)
+                }
+            }
+        else:
+            config = {
+                "data": [{
+                    "x": labels,
+                    "y": values,
+                    "type": "bar",
+                    "name": columns[1],
+                    "marker": {
+                        "color": "rgba(54, 162, 235, 0.8)",
+                        "line": {"color": "rgba(54, 162, 235, 1)", "width": 1}
+                    }
+                }],
+                "layout": {
+                    "title": {
+                        "text": title_template,
+                        "font": {"size": 16}
+                    },
+                    "xaxis": {
+                        "title": columns[0],
+                        "showgrid": True,
+                        "gridcolor": "rgba(128, 128, 128, 0.2)"
+                    },
+                    "yaxis": {
+                        "title": columns[1],
+                        "showgrid": True,
+                        "gridcolor": "rgba(128, 128, 128, 0.2)"
+                    },
+                    "plot_bgcolor": "white",
+                    "paper_bgcolor": "white",
+                    "margin": {"l": 60, "r": 40, "t": 80, "b": 60}
+                }
+            }
+
+    if reduction:
+        config["reduction"] = reduction
+
+    return config
@@ -0,0 +1,134 @@
+import asyncio
+import multiprocessing
+import time
+from functools import partial
+from concurrent.futures import Executor, Future, ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, Dict, Optional
+from app.core.config import settings
+from app.services.chart_builder import build_chart_config
+from app.utils.columnar import ColumnarResult
+from app.utils.executor_jobs import submit_tracked
+
+
+class ChartExecutor:
+    """Bounded worker pool that builds chart configs away from the event loop.
+
+    ColumnarResult pickles its NumPy columns as raw buffers, so handing a
+    result to a worker process costs one memcpy per numeric column instead of
+    one object per cell.
+    """
+
+    def __init__(self, mode: str, max_workers: int, max_pending: int):
+        self.mode = mode
+        self.max_workers = max_workers
+        self.max_pending = max_pending
+        self._executor: Optional[Executor] = None
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self.submitted = 0
+        self.completed = 0
+        self.failed = 0
+        self.cancelled = 0  # Queued jobs dropped because their request went away
+        self.total_seconds = 0.0
+
+    @property
+    def semaphore(self) -> asyncio.Semaphore:
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.max_pending)
+        return self._semaphore
+
+    def _get_executor(self) -> Optional[Executor]:
+        if self.mode == "inline":
+            return None
+        if self._executor is None:
+            if self.mode == "process":
+                # spawn: forking a process that already runs threads and an event loop is unsafe
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.max_workers,
+                    mp_context=multiprocessing.get_context("spawn")
+                )
+            else:
+                self._executor = ThreadPoolExecutor(
+                    max_workers=self.max_workers,
+                    thread_name_prefix="chart"
+                )
+        return self._executor
+
+    async def build(self, data: ColumnarResult, query: str, detected_lang: str) -> Dict[str, Any]:
+        """build_chart_config in a worker; waits for a free slot when max_pending are in flight"""
+        if self._get_executor() is None:
+            return await self._run_inline(data, query, detected_lang)
+        try:
+            return await self._run_in_pool(data, query, detected_lang)
+        except BrokenProcessPool:
+            # A worker died (e.g. OOM killed) - start a fresh pool and retry once
+            self._reset()
+            return await self._run_in_pool(data, query, detected_lang)
+
+    async def _run_inline(self, data: ColumnarResult, query: str, detected_lang: str) -> Dict[str, Any]:
+        async with self.semaphore:
+            self.submitted += 1
+            started = time.perf_counter()
+            try:
+                result = build_chart_config(data, query, detected_lang)
+            except BaseException:
+                self.failed += 1
+                raise
+            finally:
+                self.total_seconds += time.perf_counter() - started
+            self.completed += 1
+            return result
+
+    async def _run_in_pool(self, data: ColumnarResult, query: str, detected_lang: str) -> Dict[str, Any]:
+        await self.semaphore.acquire()
+        started = time.perf_counter()
+        try:
+            # The slot and the counters follow the worker job, not the awaiting request
+            job = submit_tracked(
+                self._get_executor(),
+                partial(self._job_done, started=started),
+                build_chart_config, data, query, detected_lang
+            )
+        except BaseException:
+            self.semaphore.release()
+            raise
+        self.submitted += 1
+        return await job
+
+    def _job_done(self, future: Future, *, started: float) -> None:
+        self.total_seconds += time.perf_counter() - started
+        if future.cancelled():
+            self.cancelled += 1
+        elif future.exception() is not None:
+            self.failed += 1
+        else:
+            self.completed += 1
+        self.semaphore.release()
+
+    def _reset(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+    def shutdown(self) -> None:
+        self._reset()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "mode": self.mode,
+            "max_workers": self.max_workers,
+            "max_pending": self.max_pending,
+            "submitted": self.submitted,
+            "completed": self.completed,
+            "failed": self.failed,
+            "cancelled": self.cancelled,
+            "in_flight": self.submitted - self.completed - self.failed - self.cancelled,
+            "avg_ms": round(self.total_seconds / self.submitted * 1000, 2) if self.submitted else 0.0
+        }
+
+
+chart_executor = ChartExecutor(
+    mode=settings.CHART_EXECUTOR,
+    max_workers=settings.CHART_EXECUTOR_WORKERS,
+    max_pending=settings.CHART_EXECUTOR_MAX_PENDING
+)
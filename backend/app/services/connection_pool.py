@@ -0,0 +1,193 @@
+import asyncio
+import hashlib
+import time
+import asyncpg
+from dataclasses import dataclass, field
+from typing import Any, Dict, Optional, Set
+from app.core.config import settings
+from app.core.metrics import warehouse_pool_wait_duration
+
+
+@dataclass
+class PoolEntry:
+    pool: asyncpg.Pool
+    fingerprint: str
+    created_at: float = field(default_factory=time.monotonic)
+    last_used: float = field(default_factory=time.monotonic)
+
+
+class ConnectionPoolRegistry:
+    """Process-wide registry of asyncpg pools keyed by DatabaseConnection.id"""
+
+    def __init__(self):
+        self._pools: Dict[int, PoolEntry] = {}
+        self._lock = asyncio.Lock()
+        self._creation_locks: Dict[int, asyncio.Lock] = {}
+        self._draining: Set[asyncio.Task] = set()
+
+    @staticmethod
+    def _fingerprint(connection) -> str:
+        """Hash of the credentials, so a changed connection never reuses a stale pool"""
+        raw = "|".join(str(part) for part in (
+            connection.host,
+            connection.port,
+            connection.username,
+            connection.password,
+            connection.database_name,
+            connection.ssl_enabled
+        ))
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+    async def _create_pool(self, connection) -> asyncpg.Pool:
+        return await asyncpg.create_pool(
+            host=connection.host,
+            port=connection.port,
+            user=connection.username,
+            password=connection.password,
+            database=connection.database_name,
+            ssl='require' if connection.ssl_enabled else 'prefer',
+            min_size=settings.WAREHOUSE_POOL_MIN_SIZE,
+            max_size=settings.WAREHOUSE_POOL_MAX_SIZE,
+            max_inactive_connection_lifetime=settings.WAREHOUSE_POOL_MAX_INACTIVE_SECONDS
+        )
+
+    def _is_expired(self, entry: PoolEntry, now: float) -> bool:
+        if now - entry.created_at > settings.WAREHOUSE_POOL_MAX_LIFETIME_SECONDS:
+            return True
+        return now - entry.last_used > settings.WAREHOUSE_POOL_IDLE_TIMEOUT_SECONDS
+
+    @staticmethod
+    def _is_idle(entry: PoolEntry) -> bool:
+        """No connection checked out, so no query or result cursor is using the pool"""
+        return entry.pool.get_idle_size() == entry.pool.get_size()
+
+    async def get_pool(self, connection) -> asyncpg.Pool:
+        """Return the pool for a connection, creating or recycling it as needed.
+
+        Only dictionary bookkeeping happens under the registry lock. Pools are
+        created under a per-connection lock, so a slow or unreachable
+        warehouse only holds up requests for that same connection.
+        """
+        fingerprint = self._fingerprint(connection)
+
+        async with self._lock:
+            entry = self._take_current(connection.id, fingerprint)
+            if entry is None:
+                creation_lock = self._creation_locks.setdefault(connection.id, asyncio.Lock())
+
+        if entry is not None:
+            return entry.pool
+
+        async with creation_lock:
+            # Someone else may have created it while we waited for the lock
+            async with self._lock:
+                entry = self._take_current(connection.id, fingerprint)
+            if entry is not None:
+                return entry.pool
+
+            pool = await self._create_pool(connection)
+            entry = PoolEntry(pool=pool, fingerprint=fingerprint)
+            async with self._lock:
+                self._pools[connection.id] = entry
+
+        return entry.pool
+
+    def _take_current(self, connection_id: int, fingerprint: str) -> Optional[PoolEntry]:
+        """The usable pool for a connection, retiring expired and outdated pools. Call under _lock."""
+        now = time.monotonic()
+
+        # Evict idle pools that have been unused too long or outlived their lifetime;
+        # busy ones are left alone until a later pass finds them idle
+        for other_id, other in list(self._pools.items()):
+            if other_id != connection_id and self._is_expired(other, now) and self._is_idle(other):
+                self._retire(self._pools.pop(other_id))
+
+        entry = self._pools.get(connection_id)
+        if entry is None:
+            return None
+        if entry.fingerprint != fingerprint or self._is_expired(entry, now):
+            # Replaced now, but the old pool drains instead of cutting off running work
+            self._retire(self._pools.pop(connection_id))
+            return None
+
+        entry.last_used = now
+        return entry
+
+    def _retire(self, entry: PoolEntry) -> None:
+        task = asyncio.get_running_loop().create_task(self._drain_entry(entry))
+        self._draining.add(task)
+        task.add_done_callback(self._draining.discard)
+
+    def acquire(self, connection) -> "_PooledConnection":
+        """Async context manager yielding a pooled connection"""
+        return _PooledConnection(self, connection)
+
+    async def invalidate(self, connection_id: int) -> None:
+        """Drop the pool for a connection that was changed or deactivated, letting it drain"""
+        async with self._lock:
+            entry = self._pools.pop(connection_id, None)
+            if entry is not None:
+                self._retire(entry)
+
+    async def acquire_from(self, pool: asyncpg.Pool, connection_id: int) -> asyncpg.Connection:
+        """pool.acquire, recording how long the caller waited for a free connection"""
+        started = time.perf_counter()
+        try:
+            return await pool.acquire(timeout=settings.WAREHOUSE_POOL_ACQUIRE_TIMEOUT_SECONDS)
+        finally:
+            warehouse_pool_wait_duration.observe(time.perf_counter() - started, connection_id=str(connection_id))
+
+    def stats(self) -> Dict[int, Dict[str, Any]]:
+        """Per-connection pool occupancy"""
+        return {
+            connection_id: {
+                "size": entry.pool.get_size(),
+                "idle": entry.pool.get_idle_size(),
+                "min_size": entry.pool.get_min_size(),
+                "max_size": entry.pool.get_max_size()
+            }
+            for connection_id, entry in self._pools.items()
+        }
+
+    async def close_all(self) -> None:
+        """Close every pool, used on application shutdown"""
+        async with self._lock:
+            entries = list(self._pools.values())
+            self._pools.clear()
+            draining = list(self._draining)
+
+        for task in draining:
+            task.cancel()
+        for entry in entries:
+            await self._close_entry(entry, settings.WAREHOUSE_POOL_CLOSE_TIMEOUT_SECONDS)
+
+    async def _drain_entry(self, entry: PoolEntry) -> None:
+        # pool.close() waits for checked-out connections to come back; only a pool
+        # still busy after the drain timeout has its remaining queries cut off
+        await self._close_entry(entry, settings.WAREHOUSE_POOL_DRAIN_TIMEOUT_SECONDS)
+
+    async def _close_entry(self, entry: PoolEntry, timeout: float) -> None:
+        try:
+            await asyncio.wait_for(entry.pool.close(), timeout=timeout)
+        except (Exception, asyncio.CancelledError) as e:
+            print(f"Failed to close pool gracefully: {str(e) or type(e).__name__}")
+            entry.pool.terminate()
+
+
+class _PooledConnection:
+    def __init__(self, registry: ConnectionPoolRegistry, connection):
+        self._registry = registry
+        self._connection = connection
+        self._pool: Optional[asyncpg.Pool] = None
+        self._conn: Optional[asyncpg.Connection] = None
+
+    async def __aenter__(self) -> asyncpg.Connection:
+        self._pool = await self._registry.get_pool(self._connection)
+        self._conn = await self._registry.acquire_from(self._pool, self._connection.id)
+        return self._conn
+
+    async def __aexit__(self, exc_type, exc, tb) -> None:
+        await self._pool.release(self._conn)
+
+
+pool_registry = ConnectionPoolRegistry()
@@ -1,10 +1,17 @@
 import asyncio
+import time
 import asyncpg
 from typing import List, Dict, Any, Optional
 from sqlalchemy import create_engine, text
 from sqlalchemy.engine import Engine
 from app.models.connection import DatabaseConnection
 from app.schemas.connection import TableInfo, DatabaseConnectionCreate
+from app.services.connection_pool import pool_registry
+from app.services.result_cache import result_cache
+from app.services.result_cursor import cursor_registry
+from app.core.config import settings
+from app.core.metrics import warehouse_query_duration
+from app.utils.columnar import ColumnarResult
 
 class DatabaseService:
     def __init__(self):
@@ -56,8 +63,14 @@ class DatabaseService:
                 database_name = connection.database_name
                 ssl_enabled = connection.ssl_enabled
             
-            if db_type == 'postgresql':
-                # Test PostgreSQL connection using asyncpg
+            if db_type == 'postgresql' and getattr(connection, 'id', None) is not None:
+                # Saved connection - reuse (or warm up) its pool
+                async with pool_registry.acquire(connection) as conn:
+                    await conn.execute('SELECT 1')
+                return "connected"
+            
+            elif db_type == 'postgresql':
+                # Unsaved connection - one-off check, no pool to keep
                 conn = await asyncpg.connect(
                     host=host,
                     port=port,
@@ -81,11 +94,11 @@ class DatabaseService:
             print(f"Connection test failed: {str(e)}")
             return "failed"
     
-    async def get_tables(self, connection: DatabaseConnection) -> List[TableInfo]:
-        """Get list of tables and their schemas from database"""
+    async def get_tables(self, connection: DatabaseConnection, table_names: Optional[List[str]] = None) -> List[TableInfo]:
+        """Get list of tables and their schemas from database, optionally only the named ones"""
         try:
             if connection.db_type == 'postgresql':
-                return await self._get_postgresql_tables(connection)
+                return await self._get_postgresql_tables(connection, table_names)
             else:
                 # Implement for other databases
                 return []
@@ -93,74 +106,204 @@ class DatabaseService:
             print(f"Failed to get tables: {str(e)}")
             return []
     
-    async def _get_postgresql_tables(self, connection: DatabaseConnection) -> List[TableInfo]:
+    async def get_schema_version(self, connection: DatabaseConnection) -> Optional[str]:
+        """Cheap fingerprint of the catalog, changes whenever DDL touches a user table"""
+        try:
+            if connection.db_type == 'postgresql':
+                return await self._get_postgresql_schema_version(connection)
+            else:
+                return None
+        except Exception as e:
+            print(f"Failed to get schema version: {str(e)}")
+            return None
+    
+    async def _get_postgresql_schema_version(self, connection: DatabaseConnection) -> str:
+        """Hash pg_class/pg_attribute xmin values - any DDL rewrites these rows"""
+        version_query = """
+        SELECT md5(
+            coalesce((
+                SELECT string_agg(c.oid::text || ':' || c.xmin::text, ',' ORDER BY c.oid)
+                FROM pg_catalog.pg_class c
+                JOIN pg_catalog.pg_namespace n ON n.oid = c.relnamespace
+                WHERE c.relkind IN ('r', 'p')
+                    AND n.nspname NOT IN ('information_schema', 'pg_catalog')
+                    AND n.nspname NOT LIKE 'pg_toast%'
+            ), '')
+            || '|' ||
+            coalesce((
+                SELECT string_agg(a.attrelid::text || ':' || a.attnum::text || ':' || a.xmin::text, ','
+                                  ORDER BY a.attrelid, a.attnum)
+                FROM pg_catalog.pg_attribute a
+                JOIN pg_catalog.pg_class c ON c.oid = a.attrelid
+                JOIN pg_catalog.pg_namespace n ON n.oid = c.relnamespace
+                WHERE a.attnum > 0
+                    AND c.relkind IN ('r', 'p')
+                    AND n.nspname NOT IN ('information_schema', 'pg_catalog')
+                    AND n.nspname NOT LIKE 'pg_toast%'
+            ), '')
+        ) AS schema_version
+        """
+        async with pool_registry.acquire(connection) as conn:
+            return await conn.fetchval(version_query)
+    
+    async def _get_postgresql_tables(self, connection: DatabaseConnection, table_names: Optional[List[str]] = None) -> List[TableInfo]:
         """Get PostgreSQL tables and columns"""
-        conn = await asyncpg.connect(
-            host=connection.host,
-            port=connection.port,
-            user=connection.username,
-            password=connection.password,
-            database=connection.database_name,
-            ssl='require' if connection.ssl_enabled else 'prefer'
-        )
+        async with pool_registry.acquire(connection) as conn:
+            return await self._introspect_postgresql(conn, table_names)
+    
+    async def _introspect_postgresql(self, conn: asyncpg.Connection, table_names: Optional[List[str]] = None) -> List[TableInfo]:
+        """Read tables, columns and keys over an already acquired connection.
         
-        # Get tables
-        tables_query = """
-        SELECT schemaname, tablename
-        FROM pg_tables
-        WHERE schemaname NOT IN ('information_schema', 'pg_catalog')
-        ORDER BY schemaname, tablename
+        Uses two bulk pg_catalog queries instead of one query per table.
+        """
+        # All columns of all user tables in one pass
+        columns_query = """
+        SELECT
+            n.nspname AS schema_name,
+            c.relname AS table_name,
+            c.reltuples::bigint AS row_estimate,
+            a.attname AS column_name,
+            format_type(a.atttypid, a.atttypmod) AS data_type,
+            NOT a.attnotnull AS is_nullable,
+            pg_get_expr(d.adbin, d.adrelid) AS column_default,
+            information_schema._pg_char_max_length(a.atttypid, a.atttypmod) AS character_maximum_length,
+            information_schema._pg_numeric_precision(a.atttypid, a.atttypmod) AS numeric_precision,
+            information_schema._pg_numeric_scale(a.atttypid, a.atttypmod) AS numeric_scale
+        FROM pg_catalog.pg_class c
+        JOIN pg_catalog.pg_namespace n ON n.oid = c.relnamespace
+        JOIN pg_catalog.pg_attribute a
+            ON a.attrelid = c.oid AND a.attnum > 0 AND NOT a.attisdropped
+        LEFT JOIN pg_catalog.pg_attrdef d
+            ON d.adrelid = c.oid AND d.adnum = a.attnum
+        WHERE c.relkind IN ('r', 'p')
+            AND n.nspname NOT IN ('information_schema', 'pg_catalog')
+            AND n.nspname NOT LIKE 'pg_toast%'
+            AND ($1::text[] IS NULL OR c.relname = ANY($1::text[]))
+        ORDER BY n.nspname, c.relname, a.attnum
         """
         
-        tables = await conn.fetch(tables_query)
-        table_infos = []
+        # Primary and foreign keys of all user tables in one pass
+        constraints_query = """
+        SELECT
+            n.nspname AS schema_name,
+            c.relname AS table_name,
+            con.contype AS constraint_type,
+            ARRAY(
+                SELECT a.attname
+                FROM unnest(con.conkey) WITH ORDINALITY AS k(attnum, ord)
+                JOIN pg_catalog.pg_attribute a
+                    ON a.attrelid = con.conrelid AND a.attnum = k.attnum
+                ORDER BY k.ord
+            ) AS columns,
+            fn.nspname AS ref_schema,
+            fc.relname AS ref_table,
+            ARRAY(
+                SELECT a.attname
+                FROM unnest(con.confkey) WITH ORDINALITY AS k(attnum, ord)
+                JOIN pg_catalog.pg_attribute a
+                    ON a.attrelid = con.confrelid AND a.attnum = k.attnum
+                ORDER BY k.ord
+            ) AS ref_columns
+        FROM pg_catalog.pg_constraint con
+        JOIN pg_catalog.pg_class c ON c.oid = con.conrelid
+        JOIN pg_catalog.pg_namespace n ON n.oid = c.relnamespace
+        LEFT JOIN pg_catalog.pg_class fc ON fc.oid = con.confrelid
+        LEFT JOIN pg_catalog.pg_namespace fn ON fn.oid = fc.relnamespace
+        WHERE con.contype IN ('p', 'f')
+            AND n.nspname NOT IN ('information_schema', 'pg_catalog')
+            AND n.nspname NOT LIKE 'pg_toast%'
+            AND ($1::text[] IS NULL OR c.relname = ANY($1::text[]))
+        ORDER BY n.nspname, c.relname, con.conname
+        """
         
-        for table in tables:
-            schema_name = table['schemaname']
-            table_name = table['tablename']
-            
-            # Get columns for this table
-            columns_query = """
-            SELECT 
-                column_name,
-                data_type,
-                is_nullable,
-                column_default,
-                character_maximum_length,
-                numeric_precision,
-                numeric_scale
-            FROM information_schema.columns
-            WHERE table_schema = $1 AND table_name = $2
-            ORDER BY ordinal_position
-            """
-            
-            columns = await conn.fetch(columns_query, schema_name, table_name)
+        column_rows = await conn.fetch(columns_query, table_names)
+        constraint_rows = await conn.fetch(constraints_query, table_names)
+        
+        # Group rows client-side, preserving catalog order
+        tables: Dict[tuple, TableInfo] = {}
+        for row in column_rows:
+            key = (row['schema_name'], row['table_name'])
+            table_info = tables.get(key)
+            if table_info is None:
+                row_estimate = row['row_estimate']
+                table_info = TableInfo(
+                    schema_name=row['schema_name'],
+                    table_name=row['table_name'],
+                    columns={},
+                    # reltuples is -1 (or 0 on old servers) for never-analyzed tables
+                    row_count=row_estimate if row_estimate is not None and row_estimate >= 0 else None
+                )
+                tables[key] = table_info
             
-            columns_info = {}
-            for col in columns:
-                columns_info[col['column_name']] = {
-                    'type': col['data_type'],
-                    'nullable': col['is_nullable'] == 'YES',
-                    'default': col['column_default'],
-                    'max_length': col['character_maximum_length'],
-                    'precision': col['numeric_precision'],
-                    'scale': col['numeric_scale']
-                }
+            table_info.columns[row['column_name']] = {
+                'type': row['data_type'],
+                'nullable': row['is_nullable'],
+                'default': row['column_default'],
+                'max_length': row['character_maximum_length'],
+                'precision': row['numeric_precision'],
+                'scale': row['numeric_scale']
+            }
+        
+        for row in constraint_rows:
+            table_info = tables.get((row['schema_name'], row['table_name']))
+            if table_info is None:
+                continue
             
-            table_infos.append(TableInfo(
-                schema_name=schema_name,
-                table_name=table_name,
-                columns=columns_info
-            ))
+            if row['constraint_type'] == 'p':
+                table_info.primary_key = list(row['columns'])
+            else:
+                table_info.foreign_keys.append({
+                    'columns': list(row['columns']),
+                    'ref_schema': row['ref_schema'],
+                    'ref_table': row['ref_table'],
+                    'ref_columns': list(row['ref_columns'])
+                })
         
-        await conn.close()
-        return table_infos
+        return list(tables.values())
     
-    async def execute_sql(self, connection: DatabaseConnection, sql: str) -> Dict[str, Any]:
-        """Execute SQL query and return results"""
+    async def execute_sql(
+        self,
+        connection: DatabaseConnection,
+        sql: str,
+        use_cache: bool = True,
+        page_size: Optional[int] = None,
+        user_id: Optional[int] = None
+    ) -> Dict[str, Any]:
+        """Execute SQL query and return results.
+        
+        With page_size set, rows are read through a server-side cursor and only
+        the first page is returned along with a continuation token.
+        """
         try:
+            if page_size is not None and connection.db_type == 'postgresql':
+                return await self._execute_postgresql_paged(connection, sql, page_size, user_id)
+            
+            if use_cache:
+                cached = result_cache.get(connection.id, sql)
+                if cached is not None:
+                    return {
+                        "data": cached.data,  # ColumnarResult
+                        "execution_time_ms": cached.execution_time_ms,
+                        "row_count": len(cached.data),
+                        "success": True,
+                        "truncated": cached.truncated,
+                        "total_count": None if cached.truncated else len(cached.data),
+                        "next_token": None,
+                        "cached": True,
+                        "cache_age_seconds": time.monotonic() - cached.stored_at
+                    }
+            
             if connection.db_type == 'postgresql':
-                return await self._execute_postgresql_sql(connection, sql)
+                result = await self._execute_postgresql_sql(connection, sql)
+                if use_cache and result.get("success"):
+                    result_cache.set(
+                        connection.id,
+                        sql,
+                        result["data"],
+                        result["execution_time_ms"],
+                        truncated=result["truncated"]
+                    )
+                return result
             else:
                 # Implement for other databases
                 return {"error": "Database type not supported"}
@@ -169,37 +312,89 @@ class DatabaseService:
     
     async def _execute_postgresql_sql(self, connection: DatabaseConnection, sql: str) -> Dict[str, Any]:
         """Execute PostgreSQL query"""
-        import time
         start_time = time.time()
         
-        conn = await asyncpg.connect(
-            host=connection.host,
-            port=connection.port,
-            user=connection.username,
-            password=connection.password,
-            database=connection.database_name,
-            ssl='require' if connection.ssl_enabled else 'prefer'
-        )
+        max_rows = settings.QUERY_MAX_ROWS
         
         try:
-            rows = await conn.fetch(sql)
+            # One extra row tells us whether the cap cut anything off
+            async with pool_registry.acquire(connection) as conn:
+                statement = await conn.prepare(self._apply_row_limit(sql, max_rows + 1))
+                records = await statement.fetch()
+                attributes = statement.get_attributes()
             execution_time = (time.time() - start_time) * 1000  # Convert to milliseconds
+            warehouse_query_duration.observe(execution_time / 1000, connection_id=str(connection.id), outcome="ok")
             
-            # Convert rows to list of dictionaries
-            data = [dict(row) for row in rows]
+            truncated = len(records) > max_rows
             
-            await conn.close()
+            # Transpose records straight into columns, no per-row dicts
+            conversion_start = time.perf_counter()
+            data = ColumnarResult.from_records(records[:max_rows], attributes)
+            conversion_time = (time.perf_counter() - conversion_start) * 1000
             
             return {
                 "data": data,
                 "execution_time_ms": execution_time,
                 "row_count": len(data),
-                "success": True
+                "success": True,
+                "truncated": truncated,
+                "total_count": None if truncated else len(data),
+                "next_token": None,
+                "cached": False,
+                "cache_age_seconds": None,
+                "conversion_time_ms": conversion_time
+            }
+            
+        except Exception as e:
+            warehouse_query_duration.observe(time.time() - start_time, connection_id=str(connection.id), outcome="error")
+            return {
+                "error": str(e),
+                "success": False
+            }
+    
+    async def _execute_postgresql_paged(
+        self,
+        connection: DatabaseConnection,
+        sql: str,
+        page_size: int,
+        user_id: Optional[int]
+    ) -> Dict[str, Any]:
+        """Execute PostgreSQL query through a server-side cursor, returning the first page"""
+        start_time = time.time()
+        
+        try:
+            page = await cursor_registry.open(
+                connection,
+                self._strip_trailing_semicolon(sql),
+                user_id,
+                max(1, min(page_size, settings.QUERY_MAX_PAGE_SIZE))
+            )
+            execution_time = (time.time() - start_time) * 1000
+            warehouse_query_duration.observe(execution_time / 1000, connection_id=str(connection.id), outcome="ok")
+            
+            return {
+                "data": page.data,
+                "execution_time_ms": execution_time,
+                "row_count": len(page.data),
+                "success": True,
+                "truncated": page.truncated,
+                "total_count": page.total_count,
+                "next_token": page.next_token,
+                "cached": False,
+                "cache_age_seconds": None
             }
             
         except Exception as e:
-            await conn.close()
+            warehouse_query_duration.observe(time.time() - start_time, connection_id=str(connection.id), outcome="error")
             return {
                 "error": str(e),
                 "success": False
             }
+    
+    @staticmethod
+    def _strip_trailing_semicolon(sql: str) -> str:
+        return sql.strip().rstrip(';').strip()
+    
+    def _apply_row_limit(self, sql: str, limit: int) -> str:
+        """Wrap a SELECT so the database itself stops after limit rows"""
+        return f"SELECT * FROM (\n{self._strip_trailing_semicolon(sql)}\n) AS genbi_limited LIMIT {int(limit)}"
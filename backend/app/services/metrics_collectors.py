@@ -0,0 +1,75 @@
+from typing import Iterable
+from app.core.loop_monitor import loop_monitor
+from app.core.metrics import MetricsRegistry, Sample, metrics_registry
+from app.services.chart_executor import chart_executor
+from app.services.connection_pool import pool_registry
+from app.services.password_hasher import password_hasher
+from app.services.principal_cache import principal_cache
+from app.services.result_cache import result_cache
+from app.services.result_cursor import cursor_registry
+from app.services.schema_cache import schema_cache
+from app.services.sql_cache import sql_cache
+
+
+def _pool_connections() -> Iterable[Sample]:
+    for connection_id, stats in pool_registry.stats().items():
+        labels = {"connection_id": str(connection_id)}
+        yield {**labels, "state": "open"}, stats["size"]
+        yield {**labels, "state": "idle"}, stats["idle"]
+        yield {**labels, "state": "in_use"}, stats["size"] - stats["idle"]
+        yield {**labels, "state": "max"}, stats["max_size"]
+
+
+def _cache_stats():
+    return {
+        "sql": sql_cache.stats(),
+        "result": result_cache.stats(),
+        "schema": schema_cache.stats(),
+        "principal": principal_cache.stats()
+    }
+
+
+def _cache_lookups() -> Iterable[Sample]:
+    for cache, stats in _cache_stats().items():
+        yield {"cache": cache, "result": "hit"}, stats["hits"]
+        yield {"cache": cache, "result": "miss"}, stats["misses"]
+
+
+def _cache_hit_ratio() -> Iterable[Sample]:
+    for cache, stats in _cache_stats().items():
+        lookups = stats["hits"] + stats["misses"]
+        yield {"cache": cache}, stats["hits"] / lookups if lookups else 0.0
+
+
+def _loop_lag() -> Iterable[Sample]:
+    stats = loop_monitor.stats()
+    for quantile, key in (("0.5", "p50_ms"), ("0.95", "p95_ms"), ("0.99", "p99_ms"), ("1", "max_ms")):
+        yield {"quantile": quantile}, stats[key] / 1000
+
+
+def register_collectors(registry: MetricsRegistry = metrics_registry) -> None:
+    """Gauges and counters read from service state at scrape time"""
+    registry.gauge_collector(
+        "genbi_warehouse_pool_connections", "Warehouse pool connections by state", _pool_connections
+    )
+    registry.gauge_collector(
+        "genbi_result_cursors_open", "Open server-side result cursors",
+        lambda: [({}, cursor_registry.open_count())]
+    )
+    registry.counter_collector(
+        "genbi_cache_lookups_total", "Cache lookups since start by outcome", _cache_lookups
+    )
+    registry.gauge_collector(
+        "genbi_cache_hit_ratio", "Cache hit ratio since start", _cache_hit_ratio
+    )
+    registry.gauge_collector(
+        "genbi_event_loop_lag_seconds", "Event loop wake-up lag over the recent sample window", _loop_lag
+    )
+    registry.gauge_collector(
+        "genbi_password_hash_pending", "Password hash/verify operations running or queued",
+        lambda: [({}, password_hasher.pending)]
+    )
+    registry.gauge_collector(
+        "genbi_chart_jobs_in_flight", "Chart builds queued or running in the worker pool",
+        lambda: [({}, chart_executor.stats()["in_flight"])]
+    )
@@ -0,0 +1,101 @@
+import time
+from functools import partial
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Callable, Dict, Optional, Tuple
+from app.core.config import settings
+from app.core.metrics import password_hash_duration, password_hash_rejected_total
+from app.core.security import pwd_context
+from app.utils.executor_jobs import submit_tracked
+
+
+class PasswordHasherOverloaded(Exception):
+    """Raised when more password operations are waiting than PASSWORD_HASH_MAX_PENDING"""
+
+
+class PasswordHasher:
+    """Runs bcrypt in its own small thread pool, away from the event loop.
+
+    bcrypt releases the GIL, so a login burst costs worker threads instead of
+    stalling every request on the loop. The pool has its own bounded queue:
+    past max_pending, new operations fail fast instead of piling up behind a
+    credential-stuffing run.
+    """
+
+    def __init__(self, max_workers: int, max_pending: int):
+        self.max_workers = max_workers
+        self.max_pending = max_pending
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self.pending = 0
+        self.completed = 0
+        self.failed = 0
+        self.rejected = 0
+        self.rehashed = 0
+
+    def _get_executor(self) -> ThreadPoolExecutor:
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="bcrypt")
+        return self._executor
+
+    async def _run(self, operation: str, func: Callable[..., Any], *args: Any) -> Any:
+        if self.pending >= self.max_pending:
+            self.rejected += 1
+            password_hash_rejected_total.inc(operation=operation)
+            raise PasswordHasherOverloaded("Too many password operations in progress, try again shortly")
+
+        self.pending += 1
+        started = time.perf_counter()
+        try:
+            # The slot is held until bcrypt actually finishes, not until the request goes away
+            job = submit_tracked(
+                self._get_executor(),
+                partial(self._done, operation=operation, started=started),
+                func, *args
+            )
+        except BaseException:
+            self.pending -= 1
+            raise
+        return await job
+
+    def _done(self, future: Future, *, operation: str, started: float) -> None:
+        self.pending -= 1
+        if future.cancelled() or future.exception() is not None:
+            self.failed += 1
+        else:
+            self.completed += 1
+        password_hash_duration.observe(time.perf_counter() - started, operation=operation)
+
+    async def hash(self, password: str) -> str:
+        return await self._run("hash", pwd_context.hash, password)
+
+    async def verify_and_update(self, password: str, hashed_password: Optional[str]) -> Tuple[bool, Optional[str]]:
+        """(valid, new hash) - the new hash is set when the stored one uses outdated parameters.
+
+        Without a stored hash (unknown user) a dummy verification still runs,
+        so the response time doesn't reveal which usernames exist.
+        """
+        if hashed_password is None:
+            await self._run("verify", pwd_context.dummy_verify)
+            return False, None
+        valid, new_hash = await self._run("verify", pwd_context.verify_and_update, password, hashed_password)
+        if new_hash is not None:
+            self.rehashed += 1
+        return valid, new_hash
+
+    def shutdown(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "max_workers": self.max_workers,
+            "max_pending": self.max_pending,
+            "pending": self.pending,
+            "completed": self.completed,
+            "failed": self.failed,
+            "rejected": self.rejected,
+            "rehashed": self.rehashed
+        }
+
+
+password_hasher = PasswordHasher(settings.PASSWORD_HASH_WORKERS, settings.PASSWORD_HASH_MAX_PENDING)
@@ -0,0 +1,65 @@
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from typing import Any, Awaitable, Dict, Iterator
+from app.utils.language import detect_language
+
+# Stages in pipeline order; /stats reports percentiles for each of them
+PIPELINE_STAGES = [
+    "schema",
+    "prompt",
+    "llm_sql",
+    "sql_execution",
+    "row_conversion",
+    "insights",
+    "chart",
+    "serialization",
+    "db_insert",
+]
+
+
+@dataclass
+class PipelineContext:
+    """Per-request state carried through the text-to-SQL pipeline.
+
+    Holds what is computed once per question (the language) and what the
+    stages report back: monotonic-clock timings, cache hits and token counts.
+    """
+    natural_query: str
+    language: str
+    timings_ms: Dict[str, float] = field(default_factory=dict)
+    flags: Dict[str, Any] = field(default_factory=dict)
+    prompt_tokens: int = 0
+    completion_tokens: int = 0
+    started_at: float = field(default_factory=time.perf_counter)
+
+    @classmethod
+    def for_query(cls, natural_query: str) -> "PipelineContext":
+        return cls(natural_query=natural_query, language=detect_language(natural_query))
+
+    def record(self, stage: str, elapsed_ms: float) -> None:
+        # A stage may run more than once (e.g. two LLM calls), times add up
+        self.timings_ms[stage] = self.timings_ms.get(stage, 0.0) + elapsed_ms
+
+    @contextmanager
+    def stage(self, name: str) -> Iterator[None]:
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(name, (time.perf_counter() - started) * 1000)
+
+    async def timed(self, name: str, awaitable: Awaitable) -> Any:
+        """Await under a stage timer, for stages started as concurrent tasks"""
+        with self.stage(name):
+            return await awaitable
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "timings_ms": {stage: round(ms, 2) for stage, ms in self.timings_ms.items()},
+            "total_ms": round((time.perf_counter() - self.started_at) * 1000, 2),
+            "flags": dict(self.flags),
+            "language": self.language,
+            "prompt_tokens": self.prompt_tokens,
+            "completion_tokens": self.completion_tokens
+        }
@@ -0,0 +1,111 @@
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+from sqlalchemy import event, inspect
+from app.core.config import settings
+from app.models.user import User
+
+# Columns copied into the cache; enough to rebuild a User for any endpoint
+_USER_COLUMNS = ("id", "username", "email", "is_active", "created_at", "updated_at")
+
+PrincipalKey = Tuple[str, Optional[int]]  # (sub, iat)
+
+
+class PrincipalCache:
+    """Short-lived cache of authenticated users, keyed by token subject and issue time.
+
+    Entries are column snapshots, not ORM instances, so nothing cached is tied
+    to a session. Deactivation and password changes drop a user's entries as
+    soon as the change is flushed in this process; other workers see it once
+    their entries expire (AUTH_PRINCIPAL_CACHE_TTL_SECONDS).
+    """
+
+    def __init__(self, ttl_seconds: float, max_entries: int):
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[PrincipalKey, Tuple[float, Dict[str, Any]]]" = OrderedDict()
+        # username -> time of the last deactivation or password change seen here
+        self._invalidated_at: Dict[str, float] = {}
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    def get(self, key: PrincipalKey) -> Optional[User]:
+        entry = self._entries.get(key)
+        if entry is None or entry[0] <= time.monotonic():
+            if entry is not None:
+                del self._entries[key]
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return User(**entry[1])
+
+    def set(self, key: PrincipalKey, user: User) -> None:
+        if self.ttl_seconds <= 0:
+            return
+        snapshot = {column: getattr(user, column) for column in _USER_COLUMNS}
+        self._entries[key] = (time.monotonic() + self.ttl_seconds, snapshot)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def invalidate(self, username: str) -> None:
+        """Forget every cached token of a user and stop trusting older tokens' claims"""
+        for key in [key for key in self._entries if key[0] == username]:
+            del self._entries[key]
+        self._invalidated_at[username] = time.time()
+        self.invalidations += 1
+
+    def claims_trusted(self, username: str, issued_at: Optional[int]) -> bool:
+        """Whether a token may skip the database entirely (AUTH_CLAIMS_ONLY)"""
+        invalidated_at = self._invalidated_at.get(username)
+        if invalidated_at is None:
+            return True
+        return issued_at is not None and issued_at > invalidated_at
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "entries": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "invalidations": self.invalidations,
+            "ttl_seconds": self.ttl_seconds
+        }
+
+
+principal_cache = PrincipalCache(
+    settings.AUTH_PRINCIPAL_CACHE_TTL_SECONDS,
+    settings.AUTH_PRINCIPAL_CACHE_MAX_ENTRIES
+)
+
+
+def apply_rehash(user: User, new_hash: str) -> None:
+    """Store a hash re-derived at login with current parameters.
+
+    The password itself is unchanged, so the user's cached principals and
+    outstanding tokens stay valid; the flush skips the invalidation.
+    """
+    user.hashed_password = new_hash
+    user._rehash_only = True
+
+
+@event.listens_for(User, "after_update")
+def _invalidate_on_credential_change(mapper, connection, target: User) -> None:
+    rehash_only = target.__dict__.pop("_rehash_only", False)
+    state = inspect(target)
+    changed = {
+        column for column in ("is_active", "hashed_password", "username")
+        if state.attrs[column].history.has_changes()
+    }
+    if not changed or (rehash_only and changed == {"hashed_password"}):
+        return
+    principal_cache.invalidate(target.username)
+    # Tokens issued under a previous username must not hit the cache either
+    for username in state.attrs.username.history.deleted or ():
+        principal_cache.invalidate(username)
+
+
+@event.listens_for(User, "after_delete")
+def _invalidate_on_delete(mapper, connection, target: User) -> None:
+    principal_cache.invalidate(target.username)
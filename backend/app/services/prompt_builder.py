@@ -0,0 +1,136 @@
+import math
+import re
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Tuple
+from app.core.config import settings
+from app.services.schema_index import tokenize
+
+_PIECE_RE = re.compile(r'\w+|[^\w\s]')
+
+
+class TokenCounter:
+    """Counts tokens locally: tiktoken when installed, otherwise a word-piece estimate"""
+
+    def __init__(self, encoding_name: str):
+        self.encoding_name = encoding_name
+        self._encoding = None
+        self._loaded = False
+
+    def _get_encoding(self) -> Any:
+        if not self._loaded:
+            self._loaded = True
+            try:
+                import tiktoken
+                self._encoding = tiktoken.get_encoding(self.encoding_name)
+            except Exception:
+                # Not installed, or the BPE file can't be fetched offline
+                self._encoding = None
+        return self._encoding
+
+    def count(self, text: str) -> int:
+        if not text:
+            return 0
+        encoding = self._get_encoding()
+        if encoding is not None:
+            return len(encoding.encode(text))
+        return sum(self._estimate(piece) for piece in _PIECE_RE.findall(text))
+
+    @staticmethod
+    def _estimate(piece: str) -> int:
+        # BPE vocabularies average ~4 characters per token for English words, one per
+        # symbol; Cyrillic and other non-ASCII text splits far finer, so count each
+        # such character as a token rather than underestimate the prompt
+        if piece.isascii():
+            return math.ceil(len(piece) / 4)
+        ascii_chars = sum(1 for char in piece if char.isascii())
+        return math.ceil(ascii_chars / 4) + len(piece) - ascii_chars
+
+    def count_messages(self, messages: List[Dict[str, str]]) -> int:
+        # Chat format adds a few tokens of framing per message and for the reply
+        return sum(4 + self.count(message["content"]) for message in messages) + 2
+
+
+@dataclass
+class FewShotExample:
+    question: str
+    sql: str
+
+    def render(self) -> str:
+        return f"Q: {self.question}\nSQL: {self.sql}"
+
+
+@dataclass
+class PromptPlan:
+    """What made it into the prompt, in the order it should be rendered"""
+    tables: List[Tuple[str, int, str]] = field(default_factory=list)  # (name, score, section text)
+    relationships: List[str] = field(default_factory=list)
+    examples: List[FewShotExample] = field(default_factory=list)
+    tokens: int = 0
+    dropped_tables: int = 0
+
+
+def _table_key(name: str) -> str:
+    return name.split('.')[-1].lower()
+
+
+def rank_examples(question: str, examples: List[FewShotExample], limit: int) -> List[FewShotExample]:
+    """Past question/SQL pairs sharing the most words with the question (Jaccard), best first"""
+    question_tokens = set(tokenize(question))
+    if not question_tokens:
+        return []
+
+    scored = []
+    for position, example in enumerate(examples):
+        example_tokens = set(tokenize(example.question))
+        overlap = len(question_tokens & example_tokens)
+        if overlap:
+            scored.append((overlap / len(question_tokens | example_tokens), -position, example))
+
+    scored.sort(key=lambda item: (item[0], item[1]), reverse=True)
+    return [example for _, _, example in scored[:limit]]
+
+
+def fit_prompt(
+    counter: TokenCounter,
+    budget: int,
+    tables: List[Tuple[str, int, str]],
+    relationships: List[Tuple[str, str, str]],
+    examples: List[FewShotExample]
+) -> PromptPlan:
+    """Greedily fill the budget by priority: tables by relevance, their relationships, then examples.
+
+    The most relevant table always goes in. Schema may use the budget minus
+    SQL_PROMPT_EXAMPLE_RESERVE_TOKENS; whatever schema leaves over goes to
+    relationships and examples.
+    """
+    plan = PromptPlan()
+    schema_budget = budget - settings.SQL_PROMPT_EXAMPLE_RESERVE_TOKENS
+
+    for name, score, text in tables:
+        tokens = counter.count(text) + 1
+        if plan.tables and plan.tokens + tokens > schema_budget:
+            # Keep looking, a smaller table further down may still fit
+            plan.dropped_tables += 1
+            continue
+        plan.tables.append((name, score, text))
+        plan.tokens += tokens
+
+    included = {_table_key(name) for name, _, _ in plan.tables}
+    for from_table, to_table, text in relationships:
+        if _table_key(from_table) not in included or _table_key(to_table) not in included:
+            continue
+        tokens = counter.count(text) + 1
+        if plan.tokens + tokens <= budget:
+            plan.relationships.append(text)
+            plan.tokens += tokens
+
+    for example in examples:
+        tokens = counter.count(example.render()) + 2
+        if plan.tokens + tokens <= budget:
+            plan.examples.append(example)
+            plan.tokens += tokens
+
+    return plan
+
+
+token_counter = TokenCounter(settings.TOKENIZER_ENCODING)
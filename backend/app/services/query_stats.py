@@ -0,0 +1,196 @@
+from bisect import bisect_left
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, Iterable, List, Optional, Sequence
+from sqlalchemy import select, tuple_
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.models.query import QueryStatsBucket
+
+GRANULARITIES = ("hour", "day", "all")
+SERIES_STEPS = {"hour": timedelta(hours=1), "day": timedelta(days=1)}
+# The single bucket_start of the all-time row
+ALL_TIME = datetime(1970, 1, 1, tzinfo=timezone.utc)
+
+# Upper bounds in ms; a last, open-ended bucket catches anything slower
+LATENCY_BOUNDS_MS = (5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000, 30000, 60000, 120000)
+
+
+def bucket_start(granularity: str, at: datetime) -> datetime:
+    at = at.astimezone(timezone.utc)
+    if granularity == "hour":
+        return at.replace(minute=0, second=0, microsecond=0)
+    if granularity == "day":
+        return at.replace(hour=0, minute=0, second=0, microsecond=0)
+    return ALL_TIME
+
+
+def empty_histogram() -> List[int]:
+    return [0] * (len(LATENCY_BOUNDS_MS) + 1)
+
+
+def histogram_quantile(counts: Sequence[int], q: float) -> Optional[float]:
+    """Estimate a quantile by interpolating linearly inside the bucket it falls in"""
+    total = sum(counts)
+    if not total:
+        return None
+
+    rank = q * total
+    seen = 0
+    for i, count in enumerate(counts):
+        if count and seen + count >= rank:
+            if i >= len(LATENCY_BOUNDS_MS):
+                # Open-ended bucket, the best we can say is "at least the last bound"
+                return float(LATENCY_BOUNDS_MS[-1])
+            lower = LATENCY_BOUNDS_MS[i - 1] if i else 0
+            upper = LATENCY_BOUNDS_MS[i]
+            return lower + (upper - lower) * (rank - seen) / count
+        seen += count
+    return float(LATENCY_BOUNDS_MS[-1])
+
+
+def _with_sample(counts: Sequence[int], elapsed_ms: float) -> List[int]:
+    # A new list, so the JSON column sees the change
+    counts = list(counts) if counts else empty_histogram()
+    counts[bisect_left(LATENCY_BOUNDS_MS, elapsed_ms)] += 1
+    return counts
+
+
+def new_bucket(user_id: int, granularity: str, start: datetime) -> QueryStatsBucket:
+    return QueryStatsBucket(
+        user_id=user_id,
+        granularity=granularity,
+        bucket_start=start,
+        total_queries=0,
+        successful_queries=0,
+        execution_time_sum_ms=0.0,
+        execution_time_count=0,
+        latency_histogram=empty_histogram(),
+        stage_histograms={}
+    )
+
+
+def apply_query(
+    bucket: QueryStatsBucket,
+    is_successful: bool,
+    execution_time_ms: Optional[float],
+    timings_ms: Optional[Dict[str, float]] = None
+) -> None:
+    """Count one query into a bucket"""
+    bucket.total_queries += 1
+    if is_successful:
+        bucket.successful_queries += 1
+    if execution_time_ms is not None:
+        bucket.execution_time_sum_ms += execution_time_ms
+        bucket.execution_time_count += 1
+        bucket.latency_histogram = _with_sample(bucket.latency_histogram, execution_time_ms)
+    if timings_ms:
+        stage_histograms = dict(bucket.stage_histograms or {})
+        for stage, elapsed_ms in timings_ms.items():
+            stage_histograms[stage] = _with_sample(stage_histograms.get(stage), elapsed_ms)
+        bucket.stage_histograms = stage_histograms
+
+
+async def record_query(
+    db: AsyncSession,
+    user_id: int,
+    is_successful: bool,
+    execution_time_ms: Optional[float],
+    timings_ms: Optional[Dict[str, float]] = None,
+    at: Optional[datetime] = None
+) -> None:
+    """Add a query to the user's hour, day and all-time buckets.
+
+    Runs in the caller's transaction, so the counters commit or roll back
+    together with the Query row. The bucket rows are locked until then.
+    """
+    at = at or datetime.now(timezone.utc)
+    keys = [(granularity, bucket_start(granularity, at)) for granularity in GRANULARITIES]
+
+    # Make sure the rows exist, then lock them; concurrent inserts for the same user queue here
+    await db.execute(
+        pg_insert(QueryStatsBucket)
+        .values([
+            {
+                "user_id": user_id,
+                "granularity": granularity,
+                "bucket_start": start,
+                "total_queries": 0,
+                "successful_queries": 0,
+                "execution_time_sum_ms": 0.0,
+                "execution_time_count": 0,
+                "latency_histogram": empty_histogram(),
+                "stage_histograms": {}
+            }
+            for granularity, start in keys
+        ])
+        .on_conflict_do_nothing()
+    )
+    result = await db.execute(
+        select(QueryStatsBucket)
+        .where(
+            QueryStatsBucket.user_id == user_id,
+            tuple_(QueryStatsBucket.granularity, QueryStatsBucket.bucket_start).in_(keys)
+        )
+        .order_by(QueryStatsBucket.granularity, QueryStatsBucket.bucket_start)
+        .with_for_update()
+    )
+    for bucket in result.scalars():
+        apply_query(bucket, is_successful, execution_time_ms, timings_ms)
+
+
+def summarize(bucket: Optional[QueryStatsBucket]) -> Dict[str, Any]:
+    if bucket is None:
+        return {"total_queries": 0, "successful_queries": 0, "avg_ms": 0.0, "p50_ms": None, "p95_ms": None}
+    avg_ms = bucket.execution_time_sum_ms / bucket.execution_time_count if bucket.execution_time_count else 0.0
+    p50 = histogram_quantile(bucket.latency_histogram, 0.5)
+    p95 = histogram_quantile(bucket.latency_histogram, 0.95)
+    return {
+        "total_queries": bucket.total_queries,
+        "successful_queries": bucket.successful_queries,
+        "avg_ms": round(avg_ms, 1),
+        "p50_ms": round(p50, 1) if p50 is not None else None,
+        "p95_ms": round(p95, 1) if p95 is not None else None
+    }
+
+
+def stage_latency(bucket: Optional[QueryStatsBucket], stages: Iterable[str]) -> Dict[str, Dict[str, float]]:
+    """Estimated p50/p95 per pipeline stage, stages with no samples left out"""
+    histograms = (bucket.stage_histograms or {}) if bucket is not None else {}
+    latency = {}
+    for stage in stages:
+        counts = histograms.get(stage)
+        p50 = histogram_quantile(counts, 0.5) if counts else None
+        if p50 is not None:
+            latency[stage] = {"p50": round(p50, 1), "p95": round(histogram_quantile(counts, 0.95), 1)}
+    return latency
+
+
+async def get_all_time(db: AsyncSession, user_id: int) -> Optional[QueryStatsBucket]:
+    return await db.get(QueryStatsBucket, (user_id, "all", ALL_TIME))
+
+
+async def get_series(
+    db: AsyncSession,
+    user_id: int,
+    granularity: str,
+    points: int,
+    now: Optional[datetime] = None
+) -> List[Dict[str, Any]]:
+    """The last `points` buckets up to now, oldest first, empty buckets included"""
+    step = SERIES_STEPS[granularity]
+    last = bucket_start(granularity, now or datetime.now(timezone.utc))
+    first = last - step * (points - 1)
+
+    result = await db.execute(
+        select(QueryStatsBucket).where(
+            QueryStatsBucket.user_id == user_id,
+            QueryStatsBucket.granularity == granularity,
+            QueryStatsBucket.bucket_start >= first
+        )
+    )
+    buckets = {bucket.bucket_start.astimezone(timezone.utc): bucket for bucket in result.scalars()}
+
+    return [
+        {"bucket_start": first + step * i, **summarize(buckets.get(first + step * i))}
+        for i in range(points)
+    ]
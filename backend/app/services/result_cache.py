@@ -0,0 +1,191 @@
+import hashlib
+import re
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Any, Dict, Optional, Tuple
+from app.core.config import settings
+from app.utils.columnar import ColumnarResult
+
+
+@dataclass
+class CachedResult:
+    connection_id: int
+    data: ColumnarResult
+    execution_time_ms: float
+    size_bytes: int
+    stored_at: float
+    expires_at: float
+    truncated: bool = False
+    # (question, language) -> insights generated for this result, reused on later hits
+    insights: Dict[Tuple[str, str], str] = field(default_factory=dict)
+
+
+# Quoted literals/identifiers and comments are kept verbatim, everything else is
+# canonicalized. Dollar quotes close only on their own tag, and E'...' strings
+# honour backslash escapes, so a quote inside either doesn't shift the matching.
+_quoted_re = re.compile(r"""
+    (?<![\w$])\$(?P<tag>[A-Za-z_][A-Za-z_0-9]*|)\$(?s:.*?)\$(?P=tag)\$
+  | (?<![\w$])[eE]'(?:[^'\\]|\\.|'')*'
+  | '(?:[^']|'')*'
+  | "(?:[^"]|"")*"
+  | --[^\n]*\n?
+  | /\*(?s:.*?)\*/
+""", re.VERBOSE)
+_whitespace_re = re.compile(r"\s+")
+
+
+def _canonical_text(text: str) -> str:
+    # Unquoted PostgreSQL identifiers and keywords are case-insensitive
+    return _whitespace_re.sub(" ", text).lower()
+
+
+def canonicalize_sql(sql: str) -> str:
+    """Whitespace- and case-insensitive form of a statement, string literals untouched"""
+    sql = sql.strip()
+    parts = []
+    position = 0
+    for match in _quoted_re.finditer(sql):
+        parts.append(_canonical_text(sql[position:match.start()]))
+        parts.append(match.group())
+        position = match.end()
+    parts.append(_canonical_text(sql[position:]))
+    return "".join(parts).strip().rstrip(";").strip()
+
+
+class ResultCache:
+    """LRU cache of executed result sets bounded by an approximate memory budget"""
+
+    def __init__(self, max_bytes: int, default_ttl_seconds: float, ttl_overrides: Dict[int, float] = None):
+        self.max_bytes = max_bytes
+        self.default_ttl_seconds = default_ttl_seconds
+        self.ttl_overrides: Dict[int, float] = dict(ttl_overrides or {})
+        self._entries: "OrderedDict[Tuple[int, str], CachedResult]" = OrderedDict()
+        self.total_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def ttl_for(self, connection_id: int) -> float:
+        return self.ttl_overrides.get(connection_id, self.default_ttl_seconds)
+
+    def set_ttl(self, connection_id: int, ttl_seconds: Optional[float]) -> None:
+        """Set (or with None, reset) the TTL policy of one connection"""
+        if ttl_seconds is None:
+            self.ttl_overrides.pop(connection_id, None)
+        else:
+            self.ttl_overrides[connection_id] = ttl_seconds
+
+    @staticmethod
+    def _key(connection_id: int, sql: str) -> Tuple[int, str]:
+        return connection_id, hashlib.sha256(canonicalize_sql(sql).encode("utf-8")).hexdigest()
+
+    def get(self, connection_id: int, sql: str) -> Optional[CachedResult]:
+        key = self._key(connection_id, sql)
+        entry = self._entries.get(key)
+
+        if entry is not None and entry.expires_at <= time.monotonic():
+            self._remove(key)
+            entry = None
+
+        if entry is None:
+            self.misses += 1
+            return None
+
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return entry
+
+    def get_insights(self, connection_id: int, sql: str, data: ColumnarResult, question: str, language: str) -> Optional[str]:
+        """Insights stored for this exact cached result, without counting a lookup"""
+        entry = self._entries.get(self._key(connection_id, sql))
+        if entry is None or entry.data is not data or entry.expires_at <= time.monotonic():
+            return None
+        return entry.insights.get((question, language))
+
+    def set_insights(
+        self,
+        connection_id: int,
+        sql: str,
+        data: ColumnarResult,
+        question: str,
+        language: str,
+        insights: str
+    ) -> None:
+        """Attach insights to the cached result they were generated from, if it is still cached"""
+        entry = self._entries.get(self._key(connection_id, sql))
+        if entry is None or entry.data is not data:
+            return
+        size_bytes = len(insights.encode("utf-8"))
+        previous = entry.insights.get((question, language))
+        if previous is not None:
+            size_bytes -= len(previous.encode("utf-8"))
+        entry.insights[(question, language)] = insights
+        entry.size_bytes += size_bytes
+        self.total_bytes += size_bytes
+
+    def set(
+        self,
+        connection_id: int,
+        sql: str,
+        data: ColumnarResult,
+        execution_time_ms: float,
+        truncated: bool = False
+    ) -> None:
+        ttl_seconds = self.ttl_for(connection_id)
+        size_bytes = data.estimate_nbytes()
+
+        # Never cache when disabled, or when one result alone would blow the budget
+        if ttl_seconds <= 0 or size_bytes > self.max_bytes:
+            return
+
+        key = self._key(connection_id, sql)
+        self._remove(key)
+
+        now = time.monotonic()
+        self._entries[key] = CachedResult(
+            connection_id=connection_id,
+            data=data,
+            execution_time_ms=execution_time_ms,
+            size_bytes=size_bytes,
+            stored_at=now,
+            expires_at=now + ttl_seconds,
+            truncated=truncated
+        )
+        self.total_bytes += size_bytes
+
+        while self.total_bytes > self.max_bytes and self._entries:
+            oldest_key = next(iter(self._entries))
+            self._remove(oldest_key)
+            self.evictions += 1
+
+    def _remove(self, key: Tuple[int, str]) -> None:
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self.total_bytes -= entry.size_bytes
+
+    def purge(self, connection_id: Optional[int] = None) -> int:
+        """Drop cached results for one connection, or everything; returns the count removed"""
+        keys = [key for key in self._entries if connection_id is None or key[0] == connection_id]
+        for key in keys:
+            self._remove(key)
+        return len(keys)
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "size_bytes": self.total_bytes,
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0
+        }
+
+
+result_cache = ResultCache(
+    max_bytes=settings.RESULT_CACHE_MAX_BYTES,
+    default_ttl_seconds=settings.RESULT_CACHE_TTL_SECONDS,
+    ttl_overrides=settings.RESULT_CACHE_TTL_OVERRIDES
+)
@@ -0,0 +1,246 @@
+import asyncio
+import secrets
+import time
+import asyncpg
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional
+from app.core.config import settings
+from app.services.connection_pool import pool_registry
+from app.utils.columnar import ColumnarResult
+
+
+class CursorNotFoundError(Exception):
+    """Raised when a continuation token is unknown, expired or owned by someone else"""
+    pass
+
+
+class TooManyCursorsError(Exception):
+    """Raised when the open cursor limit is reached"""
+    pass
+
+
+@dataclass
+class OpenCursor:
+    user_id: int
+    connection_id: int
+    pool: asyncpg.Pool
+    conn: asyncpg.Connection
+    transaction: Any
+    cursor: Any
+    attributes: Any
+    fetched: int = 0
+    lookahead: List[Any] = field(default_factory=list)  # Row read past the last page
+    last_used: float = field(default_factory=time.monotonic)
+    lock: asyncio.Lock = field(default_factory=asyncio.Lock)
+    query_id: Optional[int] = None  # Set once the Query row exists, see attach_query
+
+
+@dataclass
+class CursorPage:
+    data: ColumnarResult
+    next_token: Optional[str]
+    fetched: int
+    truncated: bool
+    total_count: Optional[int]
+
+
+class ResultCursorRegistry:
+    """Server-side cursors kept open between requests and addressed by a continuation token.
+
+    Each open cursor pins one pooled connection inside a read-only transaction,
+    so the number of cursors is capped, in total and per connection (always
+    below the pool size, leaving connections for ordinary queries), and idle
+    ones are closed after a TTL by a background reaper.
+    """
+
+    def __init__(self):
+        self._cursors: Dict[str, OpenCursor] = {}
+        self._lock = asyncio.Lock()
+        # Slots reserved by open() calls still declaring their cursor, per connection
+        self._opening: Dict[int, int] = {}
+        self._reaper: Optional[asyncio.Task] = None
+
+    @staticmethod
+    def _per_connection_limit() -> int:
+        return max(1, min(settings.QUERY_MAX_OPEN_CURSORS_PER_CONNECTION, settings.WAREHOUSE_POOL_MAX_SIZE - 1))
+
+    def _reserve(self, connection_id: int) -> None:
+        """Take a cursor slot for a connection or raise TooManyCursorsError. Call under _lock."""
+        if len(self._cursors) + sum(self._opening.values()) >= settings.QUERY_MAX_OPEN_CURSORS:
+            raise TooManyCursorsError("Too many open result cursors, try again later")
+        on_connection = self._opening.get(connection_id, 0) + sum(
+            1 for entry in self._cursors.values() if entry.connection_id == connection_id
+        )
+        if on_connection >= self._per_connection_limit():
+            raise TooManyCursorsError("Too many open result cursors on this connection, try again later")
+        self._opening[connection_id] = self._opening.get(connection_id, 0) + 1
+
+    def _unreserve(self, connection_id: int) -> None:
+        """Give back a slot taken by _reserve. Call under _lock."""
+        remaining = self._opening.get(connection_id, 0) - 1
+        if remaining > 0:
+            self._opening[connection_id] = remaining
+        else:
+            self._opening.pop(connection_id, None)
+
+    async def open(self, connection, sql: str, user_id: int, page_size: int) -> CursorPage:
+        """Declare a cursor for sql and return its first page"""
+        page_size = max(1, page_size)
+        await self._reap_expired()
+
+        # Reserve a slot under the lock, so concurrent opens can't overshoot the cap
+        async with self._lock:
+            self._reserve(connection.id)
+
+        try:
+            pool = await pool_registry.get_pool(connection)
+            conn = await pool_registry.acquire_from(pool, connection.id)
+        except BaseException:
+            async with self._lock:
+                self._unreserve(connection.id)
+            raise
+        transaction = conn.transaction(readonly=True)
+
+        try:
+            await transaction.start()
+            statement = await conn.prepare(sql)
+            cursor = await statement.cursor()
+        except BaseException:
+            async with self._lock:
+                self._unreserve(connection.id)
+            await pool.release(conn)
+            raise
+
+        entry = OpenCursor(
+            user_id=user_id,
+            connection_id=connection.id,
+            pool=pool,
+            conn=conn,
+            transaction=transaction,
+            cursor=cursor,
+            attributes=statement.get_attributes()
+        )
+        token = secrets.token_urlsafe(24)
+        async with self._lock:
+            self._unreserve(connection.id)
+            self._cursors[token] = entry
+
+        return await self._fetch_page(token, entry, page_size)
+
+    def attach_query(self, token: str, user_id: int, query_id: int) -> None:
+        """Tie a cursor to the Query row saved for it; pages are only served under that query"""
+        entry = self._cursors.get(token)
+        if entry is not None and entry.user_id == user_id and entry.query_id is None:
+            entry.query_id = query_id
+
+    async def fetch_next(self, token: str, user_id: int, query_id: int, page_size: int) -> CursorPage:
+        """Fetch the page after the one last returned for this token"""
+        await self._reap_expired()
+
+        entry = self._cursors.get(token)
+        if entry is None or entry.user_id != user_id or entry.query_id != query_id:
+            raise CursorNotFoundError("Continuation token is invalid or has expired")
+
+        return await self._fetch_page(token, entry, max(1, page_size))
+
+    async def _fetch_page(self, token: str, entry: OpenCursor, page_size: int) -> CursorPage:
+        async with entry.lock:
+            # Never hand out more than the hard row limit in total
+            limit = min(page_size, settings.QUERY_MAX_ROWS - entry.fetched)
+
+            # Read one row past the page to know whether another page exists
+            rows = entry.lookahead
+            wanted = limit + 1 - len(rows)
+            try:
+                if wanted > 0:
+                    rows = rows + list(await entry.cursor.fetch(wanted))
+            except Exception:
+                await self.close(token)
+                raise
+
+            has_more = len(rows) > limit
+            entry.lookahead = rows[limit:]
+            rows = rows[:limit]
+            entry.fetched += len(rows)
+            entry.last_used = time.monotonic()
+
+        truncated = has_more and entry.fetched >= settings.QUERY_MAX_ROWS
+        if not has_more or truncated:
+            await self.close(token)
+            return CursorPage(
+                data=ColumnarResult.from_records(rows, entry.attributes),
+                next_token=None,
+                fetched=entry.fetched,
+                truncated=truncated,
+                total_count=None if truncated else entry.fetched
+            )
+
+        return CursorPage(
+            data=ColumnarResult.from_records(rows, entry.attributes),
+            next_token=token,
+            fetched=entry.fetched,
+            truncated=False,
+            total_count=None
+        )
+
+    async def close(self, token: str) -> None:
+        async with self._lock:
+            entry = self._cursors.pop(token, None)
+
+        if entry is not None:
+            await self._release(entry)
+
+    async def close_all(self) -> None:
+        await self.stop()
+        async with self._lock:
+            entries = list(self._cursors.values())
+            self._cursors.clear()
+
+        for entry in entries:
+            await self._release(entry)
+
+    def open_count(self) -> int:
+        return len(self._cursors)
+
+    def start(self) -> None:
+        """Start closing abandoned cursors in the background, so their connections
+        return to the pool even when nobody opens or fetches another page"""
+        if self._reaper is None:
+            self._reaper = asyncio.get_running_loop().create_task(self._reap_forever())
+
+    async def stop(self) -> None:
+        if self._reaper is not None:
+            self._reaper.cancel()
+            try:
+                await self._reaper
+            except asyncio.CancelledError:
+                pass
+            self._reaper = None
+
+    async def _reap_forever(self) -> None:
+        while True:
+            await asyncio.sleep(settings.QUERY_CURSOR_REAP_INTERVAL_SECONDS)
+            try:
+                await self._reap_expired()
+            except Exception as e:
+                print(f"Failed to reap result cursors: {str(e)}")
+
+    async def _reap_expired(self) -> None:
+        now = time.monotonic()
+        expired = [
+            token for token, entry in list(self._cursors.items())
+            if now - entry.last_used > settings.QUERY_CURSOR_TTL_SECONDS and not entry.lock.locked()
+        ]
+        for token in expired:
+            await self.close(token)
+
+    async def _release(self, entry: OpenCursor) -> None:
+        try:
+            await entry.transaction.rollback()
+        except Exception as e:
+            print(f"Failed to close result cursor: {str(e)}")
+        finally:
+            await entry.pool.release(entry.conn)
+
+
+cursor_registry = ResultCursorRegistry()
@@ -0,0 +1,153 @@
+import asyncio
+import hashlib
+import json
+import zlib
+from typing import Any, Dict, Iterable, Optional, Tuple
+from sqlalchemy import select
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.core.config import settings
+from app.models.query import QueryResult
+
+# Below this size (de)compression is cheap enough to keep on the event loop
+_THREAD_THRESHOLD_BYTES = 256 * 1024
+
+
+def _load_zstd() -> Any:
+    try:
+        import zstandard
+        return zstandard
+    except ImportError:
+        return None
+
+
+def encode_payload(payload: Any) -> bytes:
+    """Canonical JSON bytes, identical results hash to the same digest"""
+    return json.dumps(payload, separators=(",", ":"), ensure_ascii=False, default=str).encode("utf-8")
+
+
+def _row_count(payload: Any) -> Optional[int]:
+    if isinstance(payload, dict):
+        return len(payload.get("data") or [])
+    if isinstance(payload, list):
+        return len(payload)
+    return None
+
+
+class ResultStore:
+    """Content-addressed store for large query results.
+
+    Results over RESULT_STORE_INLINE_MAX_BYTES are compressed and written once
+    to query_results under the SHA-256 of their JSON; the Query row keeps only
+    the digest. Identical results (the same report refreshed, or run by
+    several users) share one stored row.
+    """
+
+    def __init__(self, inline_max_bytes: int, codec: str, zstd_level: int):
+        self.inline_max_bytes = inline_max_bytes
+        self.zstd_level = zstd_level
+        self._zstd = _load_zstd() if codec == "zstd" else None
+        if codec == "zstd" and self._zstd is None:
+            print("RESULT_STORE_CODEC=zstd but the 'zstandard' package is missing, falling back to zlib")
+        self.codec = "zstd" if self._zstd is not None else "zlib"
+        self.inline = 0
+        self.stored = 0
+        self.deduplicated = 0
+        self.raw_bytes = 0
+        self.stored_bytes = 0
+
+    def compress(self, raw: bytes) -> bytes:
+        if self.codec == "zstd":
+            return self._zstd.ZstdCompressor(level=self.zstd_level).compress(raw)
+        return zlib.compress(raw, 6)
+
+    def decompress(self, codec: str, blob: bytes) -> bytes:
+        if codec == "zstd":
+            zstd = self._zstd or _load_zstd()
+            if zstd is None:
+                raise RuntimeError("Stored result is zstd-compressed but the 'zstandard' package is missing")
+            return zstd.ZstdDecompressor().decompress(blob)
+        return zlib.decompress(blob)
+
+    async def _run(self, size: int, func, *args) -> Any:
+        if size < _THREAD_THRESHOLD_BYTES:
+            return func(*args)
+        return await asyncio.to_thread(func, *args)
+
+    async def put(self, db: AsyncSession, payload: Any) -> Tuple[Optional[Any], Optional[str]]:
+        """Return (inline payload, None) for small results or (None, digest) once stored.
+
+        The row is added to the caller's session, so it commits together with
+        the Query that references it.
+        """
+        if payload is None:
+            return None, None
+
+        raw = encode_payload(payload)
+        if len(raw) <= self.inline_max_bytes:
+            self.inline += 1
+            return payload, None
+
+        digest = hashlib.sha256(raw).hexdigest()
+        blob = await self._run(len(raw), self.compress, raw)
+        # One round trip either way; an existing digest (stored earlier or by a
+        # concurrent writer) returns no row and keeps the copy already there
+        inserted = await db.execute(
+            pg_insert(QueryResult)
+            .values(
+                digest=digest,
+                codec=self.codec,
+                payload=blob,
+                raw_bytes=len(raw),
+                stored_bytes=len(blob),
+                row_count=_row_count(payload)
+            )
+            .on_conflict_do_nothing(index_elements=["digest"])
+            .returning(QueryResult.digest)
+        )
+        if inserted.scalar_one_or_none() is None:
+            self.deduplicated += 1
+            return None, digest
+
+        self.stored += 1
+        self.raw_bytes += len(raw)
+        self.stored_bytes += len(blob)
+        return None, digest
+
+    async def get_many(self, db: AsyncSession, digests: Iterable[str]) -> Dict[str, Any]:
+        """Decoded payloads by digest, in one round trip; unknown digests are left out"""
+        digests = {digest for digest in digests if digest}
+        if not digests:
+            return {}
+
+        result = await db.execute(
+            select(QueryResult.digest, QueryResult.codec, QueryResult.payload, QueryResult.raw_bytes)
+            .where(QueryResult.digest.in_(digests))
+        )
+        payloads = {}
+        for digest, codec, blob, raw_bytes in result.all():
+            raw = await self._run(raw_bytes, self.decompress, codec, blob)
+            payloads[digest] = json.loads(raw)
+        return payloads
+
+    async def get(self, db: AsyncSession, digest: str) -> Optional[Any]:
+        return (await self.get_many(db, [digest])).get(digest)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "codec": self.codec,
+            "inline_max_bytes": self.inline_max_bytes,
+            "inline": self.inline,
+            "stored": self.stored,
+            "deduplicated": self.deduplicated,
+            "raw_bytes": self.raw_bytes,
+            "stored_bytes": self.stored_bytes,
+            "compression_ratio": round(self.raw_bytes / self.stored_bytes, 2) if self.stored_bytes else None
+        }
+
+
+result_store = ResultStore(
+    settings.RESULT_STORE_INLINE_MAX_BYTES,
+    settings.RESULT_STORE_CODEC,
+    settings.RESULT_STORE_ZSTD_LEVEL
+)
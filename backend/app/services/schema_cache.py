@@ -0,0 +1,134 @@
+import asyncio
+import time
+from dataclasses import dataclass
+from typing import Callable, Dict, List, Optional, Tuple
+from app.core.config import settings
+from app.models.connection import DatabaseConnection
+from app.schemas.connection import TableInfo
+
+
+@dataclass
+class SchemaSnapshot:
+    tables: List[TableInfo]
+    context: str
+    version: Optional[str]
+    loaded_at: float
+    checked_at: float
+
+
+class SchemaCache:
+    """Per-connection cache of introspected tables and the rendered prompt context.
+
+    Entries younger than the TTL are served as-is. Older entries are revalidated
+    with a cheap catalog fingerprint and only re-introspected when it changed.
+    The same fingerprint tells when the columns persisted for selected tables
+    need to be re-read.
+    """
+
+    def __init__(self, ttl_seconds: float = None):
+        self.ttl_seconds = ttl_seconds if ttl_seconds is not None else settings.SCHEMA_CACHE_TTL_SECONDS
+        self._entries: Dict[int, SchemaSnapshot] = {}
+        self._locks: Dict[int, asyncio.Lock] = {}
+        # connection_id -> (catalog version, when it was checked)
+        self._versions: Dict[int, Tuple[Optional[str], float]] = {}
+        # connection_id -> (catalog version, when) selected tables' columns were last re-read
+        self._selected_synced: Dict[int, Tuple[Optional[str], float]] = {}
+        self.hits = 0
+        self.misses = 0
+        self.revalidations = 0
+
+    def _lock_for(self, connection_id: int) -> asyncio.Lock:
+        lock = self._locks.get(connection_id)
+        if lock is None:
+            lock = asyncio.Lock()
+            self._locks[connection_id] = lock
+        return lock
+
+    async def get(
+        self,
+        connection: DatabaseConnection,
+        db_service,
+        render: Callable[[DatabaseConnection, List[TableInfo]], str],
+        force_refresh: bool = False
+    ) -> SchemaSnapshot:
+        """Return the schema snapshot for a connection, loading it when missing or stale"""
+        # One loader per connection, concurrent requests wait for it
+        async with self._lock_for(connection.id):
+            now = time.monotonic()
+            entry = self._entries.get(connection.id)
+            revalidated = False
+
+            if entry is not None and not force_refresh:
+                if now - entry.checked_at < self.ttl_seconds:
+                    self.hits += 1
+                    return entry
+
+                # TTL expired - only re-introspect if the catalog actually changed
+                version = await db_service.get_schema_version(connection)
+                self._versions[connection.id] = (version, now)
+                revalidated = True
+                if version is not None and version == entry.version:
+                    self.revalidations += 1
+                    entry.checked_at = now
+                    return entry
+
+            self.misses += 1
+            if not revalidated:
+                version = await db_service.get_schema_version(connection)
+                self._versions[connection.id] = (version, now)
+            tables = await db_service.get_tables(connection)
+            snapshot = SchemaSnapshot(
+                tables=tables,
+                context=render(connection, tables),
+                version=version,
+                loaded_at=now,
+                checked_at=now
+            )
+
+            # get_tables returns [] on failure, don't pin that in the cache
+            if tables:
+                self._entries[connection.id] = snapshot
+            else:
+                self._entries.pop(connection.id, None)
+
+            return snapshot
+
+    async def current_version(self, connection: DatabaseConnection, db_service) -> Optional[str]:
+        """Catalog fingerprint of a connection, queried at most once per TTL"""
+        now = time.monotonic()
+        checked = self._versions.get(connection.id)
+        if checked is not None and now - checked[1] < self.ttl_seconds:
+            return checked[0]
+        version = await db_service.get_schema_version(connection)
+        self._versions[connection.id] = (version, now)
+        return version
+
+    def selected_synced(self, connection_id: int, version: Optional[str]) -> bool:
+        """Whether selected tables' persisted columns were re-read under this catalog version"""
+        synced = self._selected_synced.get(connection_id)
+        if synced is None:
+            return False
+        if version is None:
+            # No fingerprint available, fall back to the TTL
+            return time.monotonic() - synced[1] < self.ttl_seconds
+        return synced[0] == version
+
+    def mark_selected_synced(self, connection_id: int, version: Optional[str]) -> None:
+        self._selected_synced[connection_id] = (version, time.monotonic())
+
+    def invalidate(self, connection_id: int) -> None:
+        """Forget the cached schema for a connection"""
+        self._entries.pop(connection_id, None)
+        self._versions.pop(connection_id, None)
+        self._selected_synced.pop(connection_id, None)
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "entries": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "revalidations": self.revalidations
+        }
+
+
+schema_cache = SchemaCache()
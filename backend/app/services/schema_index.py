@@ -0,0 +1,209 @@
+import hashlib
+import heapq
+import re
+from collections import OrderedDict, defaultdict
+from dataclasses import dataclass, field
+from typing import Dict, List, Set, Tuple
+
+# Column-name fragments that mark a date column
+_DATE_COLUMN_RE = re.compile(r'date|time|created|updated|modified|birth|start|end|expires|published|registered')
+# Column types, as rendered by render_schema_context
+_DATE_TYPE_RE = re.compile(r'timestamp|date')
+_NUMERIC_TYPE_RE = re.compile(r'integer|numeric|decimal|float|money')
+
+_TOKEN_RE = re.compile(r'[^\W_]+')
+
+# Question word stems that switch on the date / numeric column bonuses. Matched
+# as word prefixes, so inflected forms count too ("по месяцам", "за годы",
+# "сумму", "санаси", "monthly").
+_DATE_QUERY_STEMS = [
+    'date', 'time', 'year', 'month', 'day', 'daily', 'week', 'quarter',
+    'сана', 'вақт', 'йил', 'ой', 'кун', 'sana', 'vaqt', 'yil', 'oy', 'kun', 'hafta',
+    'дат', 'врем', 'год', 'лет', 'месяц', 'день', 'дня', 'дне', 'дни', 'недел', 'квартал'
+]
+_NUMERIC_QUERY_STEMS = [
+    'count', 'sum', 'average', 'avg', 'total',
+    'сони', 'жами', 'ўртача', 'soni', 'jami', 'umumiy',
+    'количеств', 'сумм', 'средн', 'итог'
+]
+
+
+def _prefix_pattern(stems: List[str]) -> re.Pattern:
+    return re.compile(r'\b(?:' + '|'.join(re.escape(stem) for stem in stems) + r')')
+
+
+_DATE_QUERY_RE = _prefix_pattern(_DATE_QUERY_STEMS)
+_NUMERIC_QUERY_RE = _prefix_pattern(_NUMERIC_QUERY_STEMS)
+
+# Shortest schema token a question word may extend ("orders" -> order, "monthly" -> month)
+_MIN_PREFIX = 4
+
+# Longest multi-word column name matched against the question
+_MAX_PHRASE_TOKENS = 4
+
+TABLE_NAME_WEIGHT = 3
+COLUMN_NAME_WEIGHT = 2
+DATE_NAME_WEIGHT = 4
+DATE_TYPE_WEIGHT = 3
+NUMERIC_TYPE_WEIGHT = 2
+
+
+def _normalize(token: str) -> str:
+    # Crude singular form, so "orders" and "order" meet in the index
+    if len(token) > 3 and token.endswith('s') and not token.endswith('ss'):
+        return token[:-1]
+    return token
+
+
+def tokenize(text: str) -> List[str]:
+    return [_normalize(token) for token in _TOKEN_RE.findall(text.lower())]
+
+
+@dataclass
+class IndexedTable:
+    name: str
+    section: List[str]  # Schema text lines of this table, header first
+    date_bonus: int = 0  # Added when the question is about dates
+    numeric_bonus: int = 0  # Added when the question asks for counts/sums
+
+
+@dataclass
+class SchemaIndex:
+    """Structured view of a schema text, built once per schema version.
+
+    Table-name tokens and column names are held in inverted indexes so that
+    ranking a question only touches the tables that share a token with it;
+    type-derived bonuses are precomputed per table and pre-sorted.
+    """
+    tables: List[IndexedTable] = field(default_factory=list)
+    table_tokens: Dict[str, List[int]] = field(default_factory=dict)
+    column_names: Dict[str, Dict[int, int]] = field(default_factory=dict)  # name -> {table: columns}
+    by_bonus: Dict[Tuple[bool, bool], List[int]] = field(default_factory=dict)
+    by_name: Dict[str, IndexedTable] = field(default_factory=dict)
+
+    @classmethod
+    def build(cls, table_schemas: str) -> "SchemaIndex":
+        index = cls()
+        table_tokens: Dict[str, Set[int]] = defaultdict(set)
+        column_names: Dict[str, Dict[int, int]] = defaultdict(lambda: defaultdict(int))
+        current = None
+
+        for line in table_schemas.split('\n'):
+            if line.startswith('Table: '):
+                current = IndexedTable(name=line[len('Table: '):].strip(), section=[line])
+                table_id = len(index.tables)
+                index.tables.append(current)
+                index.by_name[current.name] = current
+                for token in tokenize(current.name.split('.')[-1]):
+                    table_tokens[token].add(table_id)
+            elif current is not None:
+                if not line.startswith('Table: ') and line.strip():
+                    current.section.append(line)
+                if line.startswith('  - '):
+                    col_name, _, col_type = line[4:].strip().partition(':')
+                    col_name = col_name.strip().lower()
+                    col_type = col_type.strip().lower()
+                    column_names['_'.join(tokenize(col_name))][table_id] += 1
+                    if _DATE_COLUMN_RE.search(col_name):
+                        current.date_bonus += DATE_NAME_WEIGHT
+                    if _DATE_TYPE_RE.search(col_type):
+                        current.date_bonus += DATE_TYPE_WEIGHT
+                    if _NUMERIC_TYPE_RE.search(col_type):
+                        current.numeric_bonus += NUMERIC_TYPE_WEIGHT
+
+        index.table_tokens = {token: sorted(ids) for token, ids in table_tokens.items()}
+        index.column_names = {name: dict(tables) for name, tables in column_names.items()}
+
+        # Tables that match nothing in the question are ranked by their bonus alone
+        for date_query in (False, True):
+            for numeric_query in (False, True):
+                index.by_bonus[(date_query, numeric_query)] = sorted(
+                    (i for i in range(len(index.tables))
+                     if index._bonus(i, date_query, numeric_query) > 0),
+                    key=lambda i: -index._bonus(i, date_query, numeric_query)
+                )
+        return index
+
+    def _bonus(self, table_id: int, date_query: bool, numeric_query: bool) -> int:
+        table = self.tables[table_id]
+        return (table.date_bonus if date_query else 0) + (table.numeric_bonus if numeric_query else 0)
+
+    @staticmethod
+    def _prefixes(token: str) -> List[str]:
+        """The token and its prefixes down to _MIN_PREFIX characters, longest first"""
+        return [token] + [token[:n] for n in range(len(token) - 1, _MIN_PREFIX - 1, -1)]
+
+    def rank(self, natural_query: str, limit: int = 5) -> List[Tuple[str, int]]:
+        """Top tables for a question as (name, score), tables scoring 0 left out.
+
+        A schema token matches a question word it equals or starts ("order"
+        matches "ordered"), like the substring test this replaced, so
+        inflected forms still hit.
+        """
+        tokens = tokenize(natural_query)
+        token_text = ' '.join(tokens)
+        date_query = bool(_DATE_QUERY_RE.search(token_text))
+        numeric_query = bool(_NUMERIC_QUERY_RE.search(token_text))
+
+        scores: Dict[int, int] = defaultdict(int)
+        for token in set(tokens):
+            matched: Set[int] = set()
+            for prefix in self._prefixes(token):
+                matched.update(self.table_tokens.get(prefix, ()))
+            for table_id in matched:
+                scores[table_id] += TABLE_NAME_WEIGHT
+
+        # Column names may span several words ("order dates" matches order_date);
+        # all but the last word must match exactly
+        matched_columns: Dict[str, Dict[int, int]] = {}
+        for size in range(1, _MAX_PHRASE_TOKENS + 1):
+            for start in range(len(tokens) - size + 1):
+                head = tokens[start:start + size - 1]
+                for prefix in self._prefixes(tokens[start + size - 1]):
+                    phrase = '_'.join(head + [prefix])
+                    if phrase in self.column_names:
+                        matched_columns[phrase] = self.column_names[phrase]
+        for tables in matched_columns.values():
+            for table_id, count in tables.items():
+                scores[table_id] += COLUMN_NAME_WEIGHT * count
+
+        for table_id in scores:
+            scores[table_id] += self._bonus(table_id, date_query, numeric_query)
+
+        # Best bonus-only tables fill the remaining slots; the list is pre-sorted
+        candidates = dict(scores)
+        for table_id in self.by_bonus[(date_query, numeric_query)]:
+            if len(candidates) >= len(scores) + limit:
+                break
+            if table_id not in candidates:
+                candidates[table_id] = self._bonus(table_id, date_query, numeric_query)
+
+        top = heapq.nsmallest(limit, candidates.items(), key=lambda item: (-item[1], item[0]))
+        return [(self.tables[table_id].name, score) for table_id, score in top if score > 0]
+
+    def section(self, table_name: str) -> List[str]:
+        table = self.by_name.get(table_name)
+        return table.section if table else []
+
+
+class SchemaIndexCache:
+    """Keeps built indexes for the most recently used schema versions"""
+
+    def __init__(self, max_entries: int = 64):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, SchemaIndex]" = OrderedDict()
+
+    def get(self, table_schemas: str) -> SchemaIndex:
+        version = hashlib.md5(table_schemas.encode('utf-8')).hexdigest()
+        index = self._entries.get(version)
+        if index is None:
+            index = SchemaIndex.build(table_schemas)
+            self._entries[version] = index
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        else:
+            self._entries.move_to_end(version)
+        return index
+
+
+schema_index_cache = SchemaIndexCache()
@@ -0,0 +1,227 @@
+import asyncio
+import hashlib
+import os
+import re
+import threading
+import zlib
+import numpy as np
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Tuple
+from app.core.config import settings
+
+_WORD_RE = re.compile(r'[^\W_]+')
+
+# Cyrillic (Russian and Uzbek) to Latin, so "клиент" shares n-grams with "client"
+_TRANSLIT = str.maketrans({
+    'а': 'a', 'б': 'b', 'в': 'v', 'г': 'g', 'д': 'd', 'е': 'e', 'ё': 'yo', 'ж': 'j',
+    'з': 'z', 'и': 'i', 'й': 'y', 'к': 'k', 'л': 'l', 'м': 'm', 'н': 'n', 'о': 'o',
+    'п': 'p', 'р': 'r', 'с': 's', 'т': 't', 'у': 'u', 'ф': 'f', 'х': 'x', 'ц': 'ts',
+    'ч': 'ch', 'ш': 'sh', 'щ': 'sh', 'ъ': '', 'ы': 'i', 'ь': '', 'э': 'e', 'ю': 'yu',
+    'я': 'ya', 'ў': 'o', 'қ': 'q', 'ғ': 'g', 'ҳ': 'h'
+})
+
+
+class HashingEmbedder:
+    """Dependency-free embedder: signed feature hashing of words and character trigrams"""
+
+    def __init__(self, dim: int = 1024):
+        self.dim = dim
+        self.name = f"hashing-{dim}"
+
+    def _features(self, text: str) -> List[str]:
+        features = []
+        for word in _WORD_RE.findall(text.lower().translate(_TRANSLIT)):
+            features.append(f"w:{word}")
+            padded = f" {word} "
+            features.extend(padded[i:i + 3] for i in range(len(padded) - 2))
+        return features
+
+    def embed(self, texts: List[str]) -> np.ndarray:
+        vectors = np.zeros((len(texts), self.dim), dtype=np.float32)
+        for row, text in enumerate(texts):
+            for feature in self._features(text):
+                h = zlib.crc32(feature.encode('utf-8'))
+                vectors[row, h % self.dim] += 1.0 if h & 0x80000000 else -1.0
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        return vectors / np.where(norms == 0, 1.0, norms)
+
+
+class SentenceTransformerEmbedder:
+    """Local sentence-transformers model (optional dependency), loaded on first use"""
+
+    def __init__(self, model_name: str):
+        self.model_name = model_name
+        self.name = f"st-{model_name}"
+        self._model = None
+
+    def embed(self, texts: List[str]) -> np.ndarray:
+        if self._model is None:
+            try:
+                from sentence_transformers import SentenceTransformer
+            except ImportError as e:
+                raise RuntimeError(
+                    "SCHEMA_EMBEDDING_BACKEND=sentence-transformers requires the sentence-transformers package"
+                ) from e
+            self._model = SentenceTransformer(self.model_name)
+        return np.asarray(self._model.encode(texts, normalize_embeddings=True), dtype=np.float32)
+
+
+def build_embedder() -> Any:
+    if settings.SCHEMA_EMBEDDING_BACKEND == "sentence-transformers":
+        return SentenceTransformerEmbedder(settings.SCHEMA_EMBEDDING_MODEL)
+    return HashingEmbedder()
+
+
+@dataclass
+class SchemaVectorIndex:
+    version: str
+    table_names: List[str]
+    matrix: np.ndarray  # One L2-normalized row per table
+
+    def search(self, query_vector: np.ndarray, k: int) -> List[Tuple[str, float]]:
+        if not self.table_names:
+            return []
+        scores = self.matrix @ query_vector
+        k = min(k, len(scores))
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top], kind='stable')]
+        return [(self.table_names[i], float(scores[i])) for i in top]
+
+
+class SchemaRetriever:
+    """Embeds one description document per table and returns the closest tables to a question.
+
+    Indexes are keyed by a hash of the documents and the embedder, built once
+    per schema version, kept in a small LRU and persisted as .npz files so a
+    restart does not re-embed.
+    """
+
+    def __init__(self, storage_dir: str, max_indexes: int = 32):
+        self.storage_dir = storage_dir
+        self.max_indexes = max_indexes
+        self._embedder = None
+        self._indexes: "OrderedDict[int, SchemaVectorIndex]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.builds = 0
+        self.loads = 0
+
+    @property
+    def embedder(self) -> Any:
+        if self._embedder is None:
+            self._embedder = build_embedder()
+        return self._embedder
+
+    def _version(self, documents: Dict[str, str]) -> str:
+        digest = hashlib.md5(self.embedder.name.encode('utf-8'))
+        for table_name in sorted(documents):
+            digest.update(f"\x00{table_name}\x01{documents[table_name]}".encode('utf-8'))
+        return digest.hexdigest()
+
+    def _path(self, connection_id: int, version: str) -> str:
+        return os.path.join(self.storage_dir, f"{connection_id}_{version}.npz")
+
+    def _get_index(self, connection_id: int, documents: Dict[str, str]) -> SchemaVectorIndex:
+        version = self._version(documents)
+        with self._lock:
+            index = self._indexes.get(connection_id)
+            if index is not None and index.version == version:
+                self._indexes.move_to_end(connection_id)
+                return index
+
+            path = self._path(connection_id, version)
+            index = self._load(path, version)
+            if index is None:
+                table_names = sorted(documents)
+                index = SchemaVectorIndex(
+                    version=version,
+                    table_names=table_names,
+                    matrix=self.embedder.embed([documents[name] for name in table_names])
+                )
+                self.builds += 1
+                self._save(path, connection_id, index)
+            else:
+                self.loads += 1
+
+            self._indexes[connection_id] = index
+            self._indexes.move_to_end(connection_id)
+            while len(self._indexes) > self.max_indexes:
+                self._indexes.popitem(last=False)
+            return index
+
+    def _load(self, path: str, version: str) -> Optional[SchemaVectorIndex]:
+        try:
+            with np.load(path, allow_pickle=False) as stored:
+                return SchemaVectorIndex(
+                    version=version,
+                    table_names=stored["table_names"].tolist(),
+                    matrix=stored["matrix"]
+                )
+        except (OSError, KeyError, ValueError):
+            return None
+
+    def _save(self, path: str, connection_id: int, index: SchemaVectorIndex) -> None:
+        try:
+            os.makedirs(self.storage_dir, exist_ok=True)
+            # Older versions of this connection's index are no longer reachable
+            self._delete_files(connection_id)
+            np.savez(path, table_names=np.array(index.table_names, dtype=str), matrix=index.matrix)
+        except OSError as e:
+            print(f"Failed to persist schema embeddings: {str(e)}")
+
+    def _delete_files(self, connection_id: int) -> None:
+        if not os.path.isdir(self.storage_dir):
+            return
+        for file_name in os.listdir(self.storage_dir):
+            if file_name.startswith(f"{connection_id}_") and file_name.endswith(".npz"):
+                os.remove(os.path.join(self.storage_dir, file_name))
+
+    def _search(self, connection_id: int, documents: Dict[str, str], question: str, k: int) -> List[Tuple[str, float]]:
+        index = self._get_index(connection_id, documents)
+        return index.search(self.embedder.embed([question])[0], k)
+
+    async def top_tables(self, connection_id: int, documents: Dict[str, str], question: str, k: int) -> List[Tuple[str, float]]:
+        """(table name, cosine similarity) of the k tables closest to the question"""
+        # Embedding is CPU-bound, and the first call per schema version embeds every table
+        return await asyncio.to_thread(self._search, connection_id, documents, question, k)
+
+    def invalidate(self, connection_id: int, delete_files: bool = False) -> None:
+        with self._lock:
+            self._indexes.pop(connection_id, None)
+            if delete_files:
+                try:
+                    self._delete_files(connection_id)
+                except OSError as e:
+                    print(f"Failed to delete schema embeddings: {str(e)}")
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "backend": settings.SCHEMA_EMBEDDING_BACKEND,
+            "indexes": len(self._indexes),
+            "builds": self.builds,
+            "loads": self.loads
+        }
+
+
+def table_document(
+    table_name: str,
+    columns: Dict[str, Any],
+    model_name: Optional[str] = None,
+    description: Optional[str] = None,
+    calculated_fields: Optional[List[Tuple[str, Optional[str]]]] = None
+) -> str:
+    """Text embedded for one table: names, descriptions and calculated fields"""
+    parts = [table_name.split('.')[-1].replace('_', ' ')]
+    if model_name:
+        parts.append(model_name)
+    if description:
+        parts.append(description)
+    parts.append(' '.join(name.replace('_', ' ') for name in columns))
+    for field_name, field_description in calculated_fields or []:
+        parts.append(field_name.replace('_', ' '))
+        if field_description:
+            parts.append(field_description)
+    return '\n'.join(parts)
+
+
+schema_retriever = SchemaRetriever(settings.SCHEMA_EMBEDDING_DIR)
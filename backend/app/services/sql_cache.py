@@ -0,0 +1,188 @@
+import hashlib
+import re
+import time
+import unicodedata
+from collections import OrderedDict
+from typing import Dict, Optional, Tuple, Any
+from app.core.config import settings
+
+
+class LRUCacheBackend:
+    """In-process LRU with per-entry expiry"""
+
+    def __init__(self, max_entries: int):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, Tuple[str, float]]" = OrderedDict()
+
+    async def get(self, key: str) -> Optional[str]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+
+        value, expires_at = entry
+        if expires_at <= time.monotonic():
+            del self._entries[key]
+            return None
+
+        self._entries.move_to_end(key)
+        return value
+
+    async def set(self, key: str, value: str, ttl_seconds: float) -> None:
+        self._entries[key] = (value, time.monotonic() + ttl_seconds)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    async def delete(self, key: str) -> None:
+        self._entries.pop(key, None)
+
+    def size(self) -> Optional[int]:
+        return len(self._entries)
+
+
+class RedisCacheBackend:
+    """Backend for any client speaking the redis.asyncio get/set/delete API"""
+
+    def __init__(self, client):
+        self.client = client
+
+    @classmethod
+    def from_url(cls, url: str) -> "RedisCacheBackend":
+        try:
+            import redis.asyncio as redis
+        except ImportError as e:
+            raise RuntimeError("SQL_CACHE_BACKEND=redis requires the 'redis' package") from e
+        return cls(redis.from_url(url))
+
+    async def get(self, key: str) -> Optional[str]:
+        value = await self.client.get(key)
+        if isinstance(value, bytes):
+            return value.decode("utf-8")
+        return value
+
+    async def set(self, key: str, value: str, ttl_seconds: float) -> None:
+        await self.client.set(key, value, ex=max(1, int(ttl_seconds)))
+
+    async def delete(self, key: str) -> None:
+        await self.client.delete(key)
+
+    def size(self) -> Optional[int]:
+        return None
+
+
+class LocalRedisClient:
+    """Minimal in-memory stand-in for redis.asyncio.Redis, for tests and local runs"""
+
+    def __init__(self):
+        self._data: Dict[str, Tuple[bytes, Optional[float]]] = {}
+
+    async def get(self, key: str) -> Optional[bytes]:
+        entry = self._data.get(key)
+        if entry is None:
+            return None
+
+        value, expires_at = entry
+        if expires_at is not None and expires_at <= time.monotonic():
+            del self._data[key]
+            return None
+        return value
+
+    async def set(self, key: str, value: Any, ex: Optional[int] = None) -> bool:
+        if isinstance(value, str):
+            value = value.encode("utf-8")
+        self._data[key] = (value, time.monotonic() + ex if ex else None)
+        return True
+
+    async def delete(self, *keys: str) -> int:
+        return sum(1 for key in keys if self._data.pop(key, None) is not None)
+
+
+_whitespace_re = re.compile(r"\s+")
+_trailing_punctuation_re = re.compile(r"[\s?!.;,]+$")
+
+
+class SQLCache:
+    """Cache of generated SQL keyed on (connection, schema version, normalized question)"""
+
+    def __init__(self, backend, ttl_seconds: float, namespace: str = "genbi:sql"):
+        self.backend = backend
+        self.ttl_seconds = ttl_seconds
+        self.namespace = namespace
+        self.hits = 0
+        self.misses = 0
+        self.stores = 0
+        self.errors = 0
+
+    @staticmethod
+    def normalize_question(question: str) -> str:
+        """Case-fold, unify unicode forms and collapse whitespace/trailing punctuation"""
+        normalized = unicodedata.normalize("NFKC", question).casefold()
+        normalized = _whitespace_re.sub(" ", normalized).strip()
+        return _trailing_punctuation_re.sub("", normalized)
+
+    @staticmethod
+    def schema_version(schema_context: str) -> str:
+        """Version of the schema exactly as the model would see it"""
+        return hashlib.md5(schema_context.encode("utf-8")).hexdigest()
+
+    def make_key(self, connection_id: int, schema_version: str, question: str, language: str) -> str:
+        raw = f"{connection_id}|{schema_version}|{language}|{self.normalize_question(question)}"
+        digest = hashlib.sha256(raw.encode("utf-8")).hexdigest()
+        return f"{self.namespace}:{connection_id}:{digest}"
+
+    async def get(self, key: str) -> Optional[str]:
+        try:
+            value = await self.backend.get(key)
+        except Exception as e:
+            # A broken cache must never break query generation
+            print(f"SQL cache get failed: {str(e)}")
+            self.errors += 1
+            value = None
+
+        if value is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return value
+
+    async def set(self, key: str, sql: str) -> None:
+        try:
+            await self.backend.set(key, sql, self.ttl_seconds)
+            self.stores += 1
+        except Exception as e:
+            print(f"SQL cache set failed: {str(e)}")
+            self.errors += 1
+
+    async def delete(self, key: str) -> None:
+        try:
+            await self.backend.delete(key)
+        except Exception as e:
+            print(f"SQL cache delete failed: {str(e)}")
+            self.errors += 1
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "backend": type(self.backend).__name__,
+            "entries": self.backend.size(),
+            "hits": self.hits,
+            "misses": self.misses,
+            "stores": self.stores,
+            "errors": self.errors,
+            "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0
+        }
+
+
+def build_sql_cache_backend():
+    backend = settings.SQL_CACHE_BACKEND
+    if backend == "memory":
+        return LRUCacheBackend(settings.SQL_CACHE_MAX_ENTRIES)
+    elif backend == "redis":
+        return RedisCacheBackend.from_url(settings.SQL_CACHE_REDIS_URL)
+    elif backend == "local-redis":
+        return RedisCacheBackend(LocalRedisClient())
+    else:
+        raise ValueError(f"Unsupported SQL cache backend: {backend}")
+
+
+sql_cache = SQLCache(build_sql_cache_backend(), settings.SQL_CACHE_TTL_SECONDS)
@@ -1,58 +1,117 @@
-from typing import Dict, Any, List
+import asyncio
+import time
+from typing import Dict, Any, List, Optional, Awaitable, AsyncIterator, Tuple
 from dataclasses import dataclass
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select
+from sqlalchemy.orm import selectinload
 
 from app.models.connection import DatabaseConnection, SelectedTable
 from app.models.table_model import TableModel, TableRelationship
+from app.models.query import Query
 from app.services.database_service import DatabaseService
+from app.core.config import settings
+from app.core.exceptions import InsightsGenerationError, SQLGenerationError
 from app.services.openai_service import OpenAIService
+from app.services.schema_cache import schema_cache
+from app.services.sql_cache import sql_cache
+from app.services.result_cache import result_cache
+from app.services.schema_retrieval import schema_retriever, table_document
+from app.services.prompt_builder import FewShotExample, rank_examples
+from app.services.pipeline_context import PipelineContext
+from app.schemas.connection import TableInfo
+from app.utils.columnar import ColumnarResult, format_result
 
 @dataclass
 class SQLResult:
     sql: str
-    data: List[Dict[str, Any]]
+    data: ColumnarResult
     insights: str
     chart_config: Dict[str, Any]
     execution_time_ms: float
     is_successful: bool
     error_message: str = ""
+    result_cached: bool = False
+    result_age_seconds: Optional[float] = None
+    truncated: bool = False
+    total_count: Optional[int] = None
+    next_token: Optional[str] = None
+    prompt_tokens: int = 0
+    completion_tokens: int = 0
+    pipeline: Optional[PipelineContext] = None  # Stage timings, cache flags, token counts
 
 class TextToSQLService:
     def __init__(self):
         self.db_service = DatabaseService()
         self.openai_service = OpenAIService()
     
-    async def generate_sql(self, natural_query: str, connection: DatabaseConnection) -> SQLResult:
+    async def generate_sql(
+        self,
+        natural_query: str,
+        connection: DatabaseConnection,
+        db: Optional[AsyncSession] = None,
+        page_size: Optional[int] = None,
+        user_id: Optional[int] = None
+    ) -> SQLResult:
         """Main method to convert natural language to SQL and execute"""
+        context = PipelineContext.for_query(natural_query)
         
         try:
             # Get table schemas for context
-            table_schemas = await self._build_schema_context(connection)
+            with context.stage("schema"):
+                table_schemas = await self._build_schema_context(connection, db, natural_query, context)
             
-            # Generate SQL using OpenAI
-            sql_query = await self.openai_service.generate_sql(natural_query, table_schemas)
+            # Reuse SQL generated earlier for the same question and schema
+            cache_key = self._sql_cache_key(context, connection, table_schemas)
+            sql_query = await sql_cache.get(cache_key)
+            sql_from_cache = sql_query is not None
+            context.flags["sql_cache_hit"] = sql_from_cache
+            
+            if not sql_from_cache:
+                # Generate SQL using OpenAI
+                system_prompt = await self._build_sql_prompt(context, connection, db, table_schemas)
+                with context.stage("llm_sql"):
+                    sql_query = await self.openai_service.generate_sql(
+                        natural_query,
+                        table_schemas,
+                        system_prompt=system_prompt
+                    )
             
             # Execute SQL
-            execution_result = await self.db_service.execute_sql(connection, sql_query)
+            execution_result = await self._execute(context, connection, sql_query, page_size, user_id)
             
             if not execution_result.get("success", False):
+                if sql_from_cache:
+                    await sql_cache.delete(cache_key)
                 return SQLResult(
                     sql=sql_query,
-                    data=[],
+                    data=ColumnarResult.empty(),
                     insights="",
                     chart_config={},
                     execution_time_ms=0,
                     is_successful=False,
-                    error_message=execution_result.get("error", "Unknown error")
+                    error_message=execution_result.get("error", "Unknown error"),
+                    prompt_tokens=self.openai_service.prompt_tokens,
+                    completion_tokens=self.openai_service.completion_tokens,
+                    pipeline=self._with_usage(context)
                 )
             
+            if not sql_from_cache:
+                await sql_cache.set(cache_key, sql_query)
+            
             data = execution_result["data"]
             execution_time = execution_result["execution_time_ms"]
             
-            # Generate insights and chart config
-            insights = await self.openai_service.generate_insights(natural_query, data)
-            chart_config = await self.openai_service.generate_chart_config(data, natural_query)
+            # Generate insights and chart config concurrently, each with its own timeout
+            insights, chart_config = await asyncio.gather(
+                context.timed("insights", self._generate_insights(context, connection, sql_query, data)),
+                context.timed("chart", self._run_with_timeout(
+                    self.openai_service.generate_chart_config(data, natural_query, context.language),
+                    settings.CHART_TIMEOUT_SECONDS,
+                    default={},
+                    stage="chart_config"
+                ))
+            )
             
             return SQLResult(
                 sql=sql_query,
@@ -60,26 +119,444 @@ class TextToSQLService:
                 insights=insights,
                 chart_config=chart_config,
                 execution_time_ms=execution_time,
-                is_successful=True
+                is_successful=True,
+                result_cached=execution_result.get("cached", False),
+                result_age_seconds=execution_result.get("cache_age_seconds"),
+                truncated=execution_result.get("truncated", False),
+                total_count=execution_result.get("total_count"),
+                next_token=execution_result.get("next_token"),
+                prompt_tokens=self.openai_service.prompt_tokens,
+                completion_tokens=self.openai_service.completion_tokens,
+                pipeline=self._with_usage(context)
             )
             
         except Exception as e:
             return SQLResult(
                 sql="",
-                data=[],
+                data=ColumnarResult.empty(),
                 insights="",
                 chart_config={},
                 execution_time_ms=0,
                 is_successful=False,
-                error_message=str(e)
+                error_message=str(e),
+                prompt_tokens=self.openai_service.prompt_tokens,
+                completion_tokens=self.openai_service.completion_tokens,
+                pipeline=self._with_usage(context)
             )
     
-    async def _build_schema_context(self, connection: DatabaseConnection) -> str:
+    async def stream_sql(
+        self,
+        natural_query: str,
+        connection: DatabaseConnection,
+        db: Optional[AsyncSession] = None,
+        result_format: str = "rows"
+    ) -> AsyncIterator[Tuple[str, Any]]:
+        """Same pipeline as generate_sql, yielding (event, payload) pairs as each stage finishes.
+        
+        Events in order: sql_delta*, sql, rows*, chart, insights, and a final
+        result carrying the SQLResult for persistence.
+        """
+        sql_query = ""
+        pending_tasks = []
+        context = PipelineContext.for_query(natural_query)
+        
+        try:
+            with context.stage("schema"):
+                table_schemas = await self._build_schema_context(connection, db, natural_query, context)
+            
+            cache_key = self._sql_cache_key(context, connection, table_schemas)
+            cached_sql = await sql_cache.get(cache_key)
+            context.flags["sql_cache_hit"] = cached_sql is not None
+            
+            if cached_sql is not None:
+                sql_query = cached_sql
+            else:
+                # Forward SQL tokens as the model produces them
+                sql_parts = []
+                system_prompt = await self._build_sql_prompt(context, connection, db, table_schemas)
+                llm_started = time.perf_counter()
+                async for delta in self.openai_service.stream_sql(
+                    natural_query,
+                    table_schemas,
+                    system_prompt=system_prompt
+                ):
+                    sql_parts.append(delta)
+                    yield "sql_delta", delta
+                # Time spent by the client reading deltas counts too, as it does for the user
+                context.record("llm_sql", (time.perf_counter() - llm_started) * 1000)
+                
+                sql_query = self.openai_service.clean_sql("".join(sql_parts))
+                if not sql_query:
+                    raise SQLGenerationError("Error generating SQL: the model returned no SQL")
+            yield "sql", sql_query
+            
+            execution_result = await self._execute(context, connection, sql_query)
+            
+            if not execution_result.get("success", False):
+                if cached_sql is not None:
+                    await sql_cache.delete(cache_key)
+                yield "result", SQLResult(
+                    sql=sql_query,
+                    data=ColumnarResult.empty(),
+                    insights="",
+                    chart_config={},
+                    execution_time_ms=0,
+                    is_successful=False,
+                    error_message=execution_result.get("error", "Unknown error"),
+                    prompt_tokens=self.openai_service.prompt_tokens,
+                    completion_tokens=self.openai_service.completion_tokens,
+                    pipeline=self._with_usage(context)
+                )
+                return
+            
+            if cached_sql is None:
+                await sql_cache.set(cache_key, sql_query)
+            
+            data = execution_result["data"]
+            execution_time = execution_result["execution_time_ms"]
+            
+            # Start both post-execution branches before sending rows
+            chart_task = asyncio.create_task(context.timed("chart", self._run_with_timeout(
+                self.openai_service.generate_chart_config(data, natural_query, context.language),
+                settings.CHART_TIMEOUT_SECONDS,
+                default={},
+                stage="chart_config"
+            )))
+            insights_task = asyncio.create_task(context.timed(
+                "insights", self._generate_insights(context, connection, sql_query, data)
+            ))
+            pending_tasks = [chart_task, insights_task]
+            
+            batch_size = settings.STREAM_ROW_BATCH_SIZE
+            for start in range(0, len(data), batch_size):
+                yield "rows", format_result(data.slice(start, start + batch_size), result_format)
+            
+            chart_config = await chart_task
+            yield "chart", chart_config
+            
+            insights = await insights_task
+            yield "insights", insights
+            
+            yield "result", SQLResult(
+                sql=sql_query,
+                data=data,
+                insights=insights,
+                chart_config=chart_config,
+                execution_time_ms=execution_time,
+                is_successful=True,
+                result_cached=execution_result.get("cached", False),
+                result_age_seconds=execution_result.get("cache_age_seconds"),
+                truncated=execution_result.get("truncated", False),
+                total_count=execution_result.get("total_count"),
+                next_token=execution_result.get("next_token"),
+                prompt_tokens=self.openai_service.prompt_tokens,
+                completion_tokens=self.openai_service.completion_tokens,
+                pipeline=self._with_usage(context)
+            )
+            
+        except Exception as e:
+            yield "result", SQLResult(
+                sql=sql_query,
+                data=ColumnarResult.empty(),
+                insights="",
+                chart_config={},
+                execution_time_ms=0,
+                is_successful=False,
+                error_message=str(e),
+                prompt_tokens=self.openai_service.prompt_tokens,
+                completion_tokens=self.openai_service.completion_tokens,
+                pipeline=self._with_usage(context)
+            )
+        
+        finally:
+            # Client went away mid-stream - don't leave LLM calls running
+            for task in pending_tasks:
+                if not task.done():
+                    task.cancel()
+    
+    def _with_usage(self, context: PipelineContext) -> PipelineContext:
+        context.prompt_tokens = self.openai_service.prompt_tokens
+        context.completion_tokens = self.openai_service.completion_tokens
+        return context
+    
+    async def _build_sql_prompt(
+        self,
+        context: PipelineContext,
+        connection: DatabaseConnection,
+        db: Optional[AsyncSession],
+        table_schemas: str
+    ) -> str:
+        """Load relationships and examples and assemble the SQL system prompt"""
+        with context.stage("prompt"):
+            relationships, examples = await self._load_prompt_extras(connection, db, context.natural_query)
+            return self.openai_service._build_sql_system_prompt(
+                context.natural_query,
+                table_schemas,
+                relationships,
+                examples,
+                context.language
+            )
+    
+    async def _execute(
+        self,
+        context: PipelineContext,
+        connection: DatabaseConnection,
+        sql_query: str,
+        page_size: Optional[int] = None,
+        user_id: Optional[int] = None
+    ) -> Dict[str, Any]:
+        """execute_sql, splitting warehouse time from row conversion time"""
+        started = time.perf_counter()
+        execution_result = await self.db_service.execute_sql(
+            connection,
+            sql_query,
+            page_size=page_size,
+            user_id=user_id
+        )
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        conversion_ms = execution_result.get("conversion_time_ms") or 0.0
+        context.record("sql_execution", elapsed_ms - conversion_ms)
+        context.record("row_conversion", conversion_ms)
+        context.flags["result_cache_hit"] = execution_result.get("cached", False)
+        return execution_result
+    
+    async def _generate_insights(
+        self,
+        context: PipelineContext,
+        connection: DatabaseConnection,
+        sql_query: str,
+        data: ColumnarResult
+    ) -> str:
+        """Insights for a result, reused when the same cached result answered the same question before"""
+        cached = result_cache.get_insights(connection.id, sql_query, data, context.natural_query, context.language)
+        context.flags["insights_cache_hit"] = cached is not None
+        if cached is not None:
+            return cached
+        
+        failed = False
+        
+        async def attempt() -> str:
+            nonlocal failed
+            try:
+                return await self.openai_service.generate_insights(
+                    context.natural_query, data, detected_lang=context.language
+                )
+            except InsightsGenerationError as e:
+                # Shown to the user, but never cached
+                failed = True
+                return e.message
+        
+        insights = await self._run_with_timeout(
+            attempt(),
+            settings.INSIGHTS_TIMEOUT_SECONDS,
+            default="",
+            stage="insights"
+        )
+        if insights and not failed:
+            result_cache.set_insights(connection.id, sql_query, data, context.natural_query, context.language, insights)
+        return insights
+    
+    def _sql_cache_key(self, context: PipelineContext, connection: DatabaseConnection, table_schemas: str) -> str:
+        return sql_cache.make_key(
+            connection.id,
+            sql_cache.schema_version(table_schemas),
+            context.natural_query,
+            context.language
+        )
+    
+    @staticmethod
+    async def _run_with_timeout(coro: Awaitable, timeout: float, default: Any, stage: str) -> Any:
+        """Await an optional pipeline stage, falling back to a default on timeout or error"""
+        try:
+            return await asyncio.wait_for(coro, timeout=timeout)
+        except asyncio.TimeoutError:
+            print(f"{stage} timed out after {timeout}s")
+            return default
+        except Exception as e:
+            print(f"{stage} failed: {str(e)}")
+            return default
+    
+    async def _build_schema_context(
+        self,
+        connection: DatabaseConnection,
+        db: Optional[AsyncSession] = None,
+        natural_query: Optional[str] = None,
+        context: Optional[PipelineContext] = None
+    ) -> str:
         """Build schema context for OpenAI prompt"""
+        tables: List[TableInfo] = []
+        schema_context = None
+        if settings.SCHEMA_SOURCE == "selected" and db is not None:
+            tables = await self._load_selected_tables(connection, db)
         
-        # Get all available tables (you would get this from your database session)
-        tables = await self.db_service.get_tables(connection)
+        if not tables:
+            # Nothing selected (or live mode) - describe the whole database
+            snapshot = await schema_cache.get(connection, self.db_service, self.render_schema_context)
+            tables, schema_context = snapshot.tables, snapshot.context
         
+        # Wide schemas: only the tables closest to the question go to the prompt
+        if (natural_query and settings.SCHEMA_RETRIEVAL_ENABLED
+                and len(tables) > settings.SCHEMA_RETRIEVAL_MIN_TABLES):
+            try:
+                tables = await self._retrieve_tables(connection, db, natural_query, tables)
+                if context is not None:
+                    context.flags["schema_retrieval"] = True
+                return self.render_schema_context(connection, tables)
+            except Exception as e:
+                print(f"Schema retrieval failed, using the full schema: {str(e)}")
+        
+        return schema_context if schema_context is not None else self.render_schema_context(connection, tables)
+    
+    async def _retrieve_tables(
+        self,
+        connection: DatabaseConnection,
+        db: Optional[AsyncSession],
+        natural_query: str,
+        tables: List[TableInfo]
+    ) -> List[TableInfo]:
+        """Top-k tables by embedding similarity, most similar first"""
+        table_models: Dict[str, TableModel] = {}
+        if db is not None:
+            result = await db.execute(
+                select(TableModel)
+                .where(TableModel.connection_id == connection.id)
+                .options(selectinload(TableModel.calculated_fields))
+            )
+            for model in result.scalars().all():
+                table_models[model.table_name] = model
+        
+        documents = {}
+        by_name = {}
+        for table in tables:
+            full_name = f"{table.schema_name}.{table.table_name}"
+            # Models may be registered with or without the schema prefix
+            model = table_models.get(full_name) or table_models.get(table.table_name)
+            documents[full_name] = table_document(
+                full_name,
+                table.columns,
+                model_name=model.model_name if model else None,
+                description=model.description if model else None,
+                calculated_fields=[
+                    (field.field_name, field.description) for field in model.calculated_fields
+                ] if model else None
+            )
+            by_name[full_name] = table
+        
+        ranked = await schema_retriever.top_tables(
+            connection.id,
+            documents,
+            natural_query,
+            settings.SCHEMA_RETRIEVAL_TOP_K
+        )
+        return [by_name[name] for name, _ in ranked]
+    
+    async def _load_prompt_extras(
+        self,
+        connection: DatabaseConnection,
+        db: Optional[AsyncSession],
+        natural_query: str
+    ) -> Tuple[List[Tuple[str, str, str]], List[FewShotExample]]:
+        """Modelled relationships and similar earlier questions, for the SQL prompt"""
+        if db is None:
+            return [], []
+        
+        result = await db.execute(
+            select(TableModel)
+            .where(TableModel.connection_id == connection.id)
+            .options(selectinload(TableModel.relationships).selectinload(TableRelationship.to_table))
+        )
+        relationships = [
+            (
+                model.table_name,
+                rel.to_table.table_name,
+                f"{model.table_name}.{rel.from_column} -> {rel.to_table.table_name}.{rel.to_column} ({rel.relationship_type})"
+            )
+            for model in result.scalars().all()
+            for rel in model.relationships
+        ]
+        
+        result = await db.execute(
+            select(Query.natural_language_query, Query.generated_sql)
+            .where(
+                Query.connection_id == connection.id,
+                Query.is_successful == True,
+                Query.generated_sql.isnot(None)
+            )
+            .order_by(Query.created_at.desc())
+            .limit(settings.SQL_PROMPT_EXAMPLE_CANDIDATES)
+        )
+        seen = set()
+        candidates = []
+        for question, sql in result.all():
+            if question not in seen:
+                seen.add(question)
+                candidates.append(FewShotExample(question=question, sql=sql))
+        
+        return relationships, rank_examples(natural_query, candidates, settings.SQL_PROMPT_MAX_EXAMPLES)
+    
+    async def _load_selected_tables(self, connection: DatabaseConnection, db: AsyncSession) -> List[TableInfo]:
+        """Build TableInfo from persisted SelectedTable rows.
+
+        Only tables with no saved columns are introspected, unless the catalog
+        version changed since the columns were last read; then every selected
+        table is re-read so DDL changes reach the prompt.
+        """
+        result = await db.execute(
+            select(SelectedTable)
+            .where(
+                SelectedTable.connection_id == connection.id,
+                SelectedTable.is_selected == True
+            )
+            .order_by(SelectedTable.schema_name, SelectedTable.table_name)
+        )
+        selected_tables = result.scalars().all()
+        
+        if not selected_tables:
+            return []
+        
+        version = await schema_cache.current_version(connection, self.db_service)
+        stale = not schema_cache.selected_synced(connection.id, version)
+        to_read = selected_tables if stale else [t for t in selected_tables if not t.columns_info]
+        if to_read:
+            live_tables = await self.db_service.get_tables(
+                connection,
+                table_names=[t.table_name for t in to_read]
+            )
+            # Persisted with the caller's next commit
+            self.apply_live_columns(to_read, live_tables)
+            # get_tables returns [] on failure, try again next time
+            if stale and live_tables:
+                schema_cache.mark_selected_synced(connection.id, version)
+        
+        return [
+            TableInfo(
+                schema_name=t.schema_name,
+                table_name=t.table_name,
+                columns=t.columns_info
+            )
+            for t in selected_tables if t.columns_info
+        ]
+    
+    @staticmethod
+    def apply_live_columns(selected_tables: List[SelectedTable], live_tables: List[TableInfo]) -> int:
+        """Copy introspected columns onto SelectedTable rows, returning how many matched"""
+        updated = 0
+        for selected_table in selected_tables:
+            table_info = next(
+                (t for t in live_tables
+                 if t.table_name == selected_table.table_name
+                 and (selected_table.schema_name is None or t.schema_name == selected_table.schema_name)),
+                None
+            )
+            if table_info:
+                selected_table.schema_name = table_info.schema_name
+                selected_table.columns_info = table_info.columns
+                updated += 1
+        return updated
+    
+    @staticmethod
+    def render_schema_context(connection: DatabaseConnection, tables: List[TableInfo]) -> str:
+        """Render introspected tables into the prompt schema text"""
         schema_context = f"Database: {connection.database_name} ({connection.db_type})\n\n"
         
         for table in tables:
@@ -92,8 +569,7 @@ class TextToSQLService:
             
             schema_context += "\n"
         
-        # Add relationships information if available
-        # This would require querying TableModel and TableRelationship
-        # For now, we'll skip this part but you can add it later
+        # Relationships and few-shot examples are added per question by the
+        # prompt builder, within the SQL prompt token budget
         
         return schema_context
@@ -0,0 +1,187 @@
+import numpy as np
+from datetime import datetime, date, time, timedelta
+from decimal import Decimal
+from typing import Any, Callable, Dict, List, Optional, Sequence, Union
+from uuid import UUID
+from app.utils.helpers import serialize_for_json
+
+Column = Union[np.ndarray, List[Any]]
+
+# PostgreSQL types that map onto a fixed-width NumPy dtype when a column has no NULLs
+_NUMPY_DTYPES = {
+    'int2': np.int64,
+    'int4': np.int64,
+    'int8': np.int64,
+    'oid': np.int64,
+    'float4': np.float64,
+    'float8': np.float64,
+    # Lossy: numeric values beyond float64 precision are rounded, as the JSON output always did
+    'numeric': np.float64,
+    'bool': np.bool_,
+}
+
+_TEXT_TYPES = {'text', 'varchar', 'bpchar', 'char', 'name', 'json', 'jsonb', 'citext'}
+
+
+def _to_json_value(value: Any) -> Any:
+    if value is None:
+        return None
+    if isinstance(value, (datetime, date, time)):
+        return value.isoformat()
+    if isinstance(value, Decimal):
+        return float(value)
+    if isinstance(value, (UUID, timedelta)):
+        return str(value)
+    return serialize_for_json(value)
+
+
+def _converter_for(type_name: str) -> Optional[Callable[[Any], Any]]:
+    """Per-column value converter, chosen once from the column type instead of per value"""
+    if type_name in _TEXT_TYPES or type_name in ('int2', 'int4', 'int8', 'oid', 'float4', 'float8', 'bool'):
+        return None
+    if type_name == 'numeric':
+        return lambda v: None if v is None else float(v)
+    if type_name in ('timestamp', 'timestamptz', 'date', 'time', 'timetz'):
+        return lambda v: None if v is None else v.isoformat()
+    if type_name in ('uuid', 'interval'):
+        return lambda v: None if v is None else str(v)
+    return _to_json_value
+
+
+def _build_column(values: Sequence[Any], type_name: str, convert: bool = True) -> Column:
+    converter = _converter_for(type_name) if convert else None
+    values = list(values) if converter is None else [converter(v) for v in values]
+
+    dtype = _NUMPY_DTYPES.get(type_name)
+    if dtype is not None and values and None not in values:
+        try:
+            return np.asarray(values, dtype=dtype)
+        except (TypeError, ValueError, OverflowError):
+            pass
+    return values
+
+
+def _infer_type_name(values: Sequence[Any]) -> str:
+    """Best-effort PostgreSQL type name for rows that arrived without type information"""
+    for value in values:
+        if value is None:
+            continue
+        if isinstance(value, bool):
+            return 'bool'
+        if isinstance(value, int):
+            return 'int8'
+        if isinstance(value, float):
+            return 'float8'
+        if isinstance(value, Decimal):
+            return 'numeric'
+        if isinstance(value, datetime):
+            return 'timestamp'
+        if isinstance(value, date):
+            return 'date'
+        if isinstance(value, str):
+            return 'text'
+        return 'unknown'
+    return 'unknown'
+
+
+class ColumnarResult:
+    """Query result stored column by column.
+
+    Column names are held once, numeric columns without NULLs are NumPy arrays
+    and every other column is a list of JSON-ready values. Rows are only
+    materialized on demand (to_rows / to_wire).
+    """
+
+    def __init__(self, columns: List[str], types: List[str], arrays: List[Column]):
+        self.columns = columns
+        self.types = types
+        self.arrays = arrays
+        self.row_count = len(arrays[0]) if arrays else 0
+
+    @classmethod
+    def empty(cls) -> "ColumnarResult":
+        return cls([], [], [])
+
+    @classmethod
+    def from_records(cls, records: Sequence[Any], attributes: Sequence[Any]) -> "ColumnarResult":
+        """Build from asyncpg records and the statement's get_attributes()"""
+        columns = [attr.name for attr in attributes]
+        types = [attr.type.name for attr in attributes]
+        if records:
+            raw_columns = list(zip(*records))
+        else:
+            raw_columns = [() for _ in columns]
+        arrays = [_build_column(values, type_name) for values, type_name in zip(raw_columns, types)]
+        return cls(columns, types, arrays)
+
+    @classmethod
+    def from_rows(cls, rows: List[Dict[str, Any]]) -> "ColumnarResult":
+        """Build from the legacy list-of-dicts representation"""
+        if not rows:
+            return cls.empty()
+        columns = list(rows[0].keys())
+        raw_columns = [[row.get(name) for row in rows] for name in columns]
+        types = [_infer_type_name(values) for values in raw_columns]
+        arrays = [_build_column(values, type_name) for values, type_name in zip(raw_columns, types)]
+        return cls(columns, types, arrays)
+
+    @classmethod
+    def from_wire(cls, payload: Dict[str, Any]) -> "ColumnarResult":
+        """Inverse of to_wire"""
+        columns = list(payload.get("columns", []))
+        types = list(payload.get("types") or ['unknown'] * len(columns))
+        data = payload.get("data", [])
+        raw_columns = list(zip(*data)) if data else [() for _ in columns]
+        # Wire values are already JSON-ready, only the NumPy packing is redone
+        arrays = [_build_column(values, type_name, convert=False) for values, type_name in zip(raw_columns, types)]
+        return cls(columns, types, arrays)
+
+    @classmethod
+    def from_stored(cls, stored: Any) -> "ColumnarResult":
+        """Load a Query.execution_result in either the wire or the legacy row format"""
+        if isinstance(stored, dict) and "columns" in stored:
+            return cls.from_wire(stored)
+        return cls.from_rows(stored or [])
+
+    def __len__(self) -> int:
+        return self.row_count
+
+    def column(self, name: str) -> Column:
+        return self.arrays[self.columns.index(name)]
+
+    def slice(self, start: int, stop: int) -> "ColumnarResult":
+        return ColumnarResult(self.columns, self.types, [array[start:stop] for array in self.arrays])
+
+    def _python_columns(self) -> List[List[Any]]:
+        return [array.tolist() if isinstance(array, np.ndarray) else array for array in self.arrays]
+
+    def to_rows(self) -> List[Dict[str, Any]]:
+        """List-of-dicts view, for callers and clients that expect row objects"""
+        columns = self.columns
+        return [dict(zip(columns, values)) for values in zip(*self._python_columns())]
+
+    def to_wire(self) -> Dict[str, Any]:
+        """Compact format: column names once, rows as plain arrays"""
+        return {
+            "columns": self.columns,
+            "types": self.types,
+            "data": [list(values) for values in zip(*self._python_columns())]
+        }
+
+    def estimate_nbytes(self, sample_size: int = 50) -> int:
+        """Approximate memory footprint, NumPy columns exact, others from a sample"""
+        total = 0
+        for array in self.arrays:
+            if isinstance(array, np.ndarray):
+                total += array.nbytes
+            elif array:
+                sample = array[:sample_size]
+                total += int(sum(len(repr(v)) for v in sample) / len(sample) * len(array))
+        return total
+
+
+def format_result(result: ColumnarResult, result_format: str) -> Union[List[Dict[str, Any]], Dict[str, Any]]:
+    """Render a result in the wire format a client asked for (rows or columnar)"""
+    if result_format == "columnar":
+        return result.to_wire()
+    return result.to_rows()
@@ -0,0 +1,25 @@
+import asyncio
+from concurrent.futures import Executor, Future
+from typing import Any, Callable
+
+
+def submit_tracked(executor: Executor, on_done: Callable[[Future], None], func: Callable[..., Any], *args: Any) -> "asyncio.Future":
+    """Submit func to executor and return an awaitable for its result.
+
+    on_done runs on the event loop when the job itself finishes, not when the
+    awaiting task does. A cancelled caller cancels a job still queued, but a
+    running job keeps going; slots and counters released in on_done therefore
+    follow real pool load.
+    """
+    loop = asyncio.get_running_loop()
+    future = executor.submit(func, *args)
+    future.add_done_callback(lambda done: _call_in_loop(loop, on_done, done))
+    return asyncio.wrap_future(future)
+
+
+def _call_in_loop(loop: asyncio.AbstractEventLoop, callback: Callable[[Future], None], future: Future) -> None:
+    try:
+        loop.call_soon_threadsafe(callback, future)
+    except RuntimeError:
+        # Loop already closed at shutdown, nothing left to account for
+        pass
@@ -0,0 +1,53 @@
+import re
+from functools import lru_cache
+from typing import Dict
+
+# One alternation per language, compiled once. Uzbek is listed in both its
+# Latin and Cyrillic spellings.
+_LANGUAGE_WORDS = {
+    'uzbek': [
+        # Latin
+        'nima', 'qanday', 'qachon', 'qayerda', 'kim', 'necha', 'soni', 'raqami', 'hisobot',
+        "ma'lumot", 'jadval', "ro'yxat", "ko'rsatish", 'topish', 'aniqlash', 'hisoblash',
+        'tahlil', 'statistika', 'yil', 'oy', 'kun', 'sana', 'vaqt', 'soat', 'minut',
+        # Cyrillic
+        'нима', 'қандай', 'қачон', 'қаерда', 'ким', 'нечта', 'сони', 'рақами', 'ҳисобот',
+        'маълумот', 'жадвал', 'рўйхат', 'кўрсатиш', 'топиш', 'аниқлаш', 'ҳисоблаш', 'таҳлил',
+        'йил', 'ой', 'кун', 'сана', 'вақт', 'соат', 'жами', 'ўртача', 'энг'
+    ],
+    'russian': [
+        'что', 'какой', 'когда', 'где', 'кто', 'сколько', 'количество', 'число', 'отчет',
+        'данные', 'таблица', 'список', 'показать', 'найти', 'определить', 'посчитать',
+        'анализ', 'статистика', 'год', 'месяц', 'день', 'дата', 'время', 'час', 'минута'
+    ],
+    'english': [
+        'what', 'which', 'when', 'where', 'who', 'how many', 'count', 'number', 'report',
+        'data', 'table', 'list', 'show', 'find', 'determine', 'calculate', 'analysis',
+        'statistics', 'year', 'month', 'day', 'date', 'time', 'hour', 'minute'
+    ]
+}
+
+LANGUAGE_PATTERNS: Dict[str, re.Pattern] = {
+    lang: re.compile(r'\b(?:' + '|'.join(re.escape(word) for word in words) + r')\b')
+    for lang, words in _LANGUAGE_WORDS.items()
+}
+
+# Letters Russian doesn't have - any of them settles Cyrillic text as Uzbek
+_UZBEK_CYRILLIC_LETTERS = re.compile(r'[ўқғҳ]')
+_UZBEK_LETTER_WEIGHT = 2
+
+_APOSTROPHES = str.maketrans({'ʻ': "'", 'ʼ': "'", '‘': "'", '’': "'", '`': "'"})
+
+
+@lru_cache(maxsize=4096)
+def detect_language(text: str) -> str:
+    """'uzbek', 'russian' or 'english' (the default when nothing matches)"""
+    # Uzbek Latin is typed with several apostrophe look-alikes (o‘, oʻ, o`)
+    text_lower = text.lower().translate(_APOSTROPHES)
+
+    scores = {lang: len(pattern.findall(text_lower)) for lang, pattern in LANGUAGE_PATTERNS.items()}
+    scores['uzbek'] += _UZBEK_LETTER_WEIGHT * len(_UZBEK_CYRILLIC_LETTERS.findall(text_lower))
+
+    # Ties go to the first language, as before
+    detected = max(scores.keys(), key=lambda k: scores[k])
+    return detected if scores[detected] > 0 else 'english'
@@ -0,0 +1,50 @@
+#!/usr/bin/env python3
+"""
+Script to rebuild the per-user query stats rollups from query history
+"""
+import asyncio
+import os
+import sys
+
+# Add the parent directory to the Python path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import delete, select, text
+from app.core.database import AsyncSessionLocal
+from app.models.query import Query, QueryStatsBucket
+from app.services.query_stats import GRANULARITIES, apply_query, bucket_start, new_bucket
+
+async def rebuild_query_stats():
+    """Recount every user's hour, day and all-time buckets in one transaction"""
+    async with AsyncSessionLocal() as db:
+        # Queries saved meanwhile wait on the lock and are counted in after the commit,
+        # instead of being added to buckets this rebuild is about to replace
+        await db.execute(text("LOCK TABLE query_stats_buckets IN EXCLUSIVE MODE"))
+        
+        buckets = {}
+        result = await db.stream(
+            select(
+                Query.user_id,
+                Query.is_successful,
+                Query.execution_time_ms,
+                Query.pipeline_metrics,
+                Query.created_at
+            ).execution_options(yield_per=5000)
+        )
+        async for row in result:
+            timings_ms = (row.pipeline_metrics or {}).get("timings_ms")
+            for granularity in GRANULARITIES:
+                key = (row.user_id, granularity, bucket_start(granularity, row.created_at))
+                bucket = buckets.get(key)
+                if bucket is None:
+                    bucket = buckets[key] = new_bucket(*key)
+                apply_query(bucket, row.is_successful, row.execution_time_ms, timings_ms)
+        
+        await db.execute(delete(QueryStatsBucket))
+        db.add_all(buckets.values())
+        await db.commit()
+    
+    print(f"Rebuilt {len(buckets)} query stats buckets")
+
+if __name__ == "__main__":
+    asyncio.run(rebuild_query_stats())
@@ -0,0 +1,46 @@
+from app.services.result_cache import canonicalize_sql
+
+
+def test_whitespace_case_and_trailing_semicolon_are_normalized():
+    assert canonicalize_sql("SELECT  id\n FROM Orders ;") == canonicalize_sql("select id from orders")
+
+
+def test_string_literals_keep_their_case():
+    assert canonicalize_sql("SELECT * FROM t WHERE name = 'Foo'") != canonicalize_sql(
+        "SELECT * FROM t WHERE name = 'foo'"
+    )
+
+
+def test_quoted_identifiers_keep_their_case():
+    assert canonicalize_sql('SELECT "Total" FROM t') != canonicalize_sql('SELECT "total" FROM t')
+
+
+def test_doubled_quotes_stay_inside_the_literal():
+    assert canonicalize_sql("SELECT 'It''s' , 'A'") == "select 'It''s' , 'A'"
+
+
+def test_dollar_quoted_strings_keep_their_case():
+    assert canonicalize_sql("SELECT * FROM t WHERE name = $$Alice$$") != canonicalize_sql(
+        "SELECT * FROM t WHERE name = $$alice$$"
+    )
+
+
+def test_tagged_dollar_quotes_close_only_on_their_tag():
+    sql = "SELECT $q$It's $$ Here$q$ AS Label"
+    assert canonicalize_sql(sql) == "select $q$It's $$ Here$q$ as label"
+
+
+def test_positional_parameters_are_not_dollar_quotes():
+    assert canonicalize_sql("SELECT $1, $2 FROM T") == "select $1, $2 from t"
+
+
+def test_escape_strings_do_not_shift_later_literals():
+    before = "SELECT E'it\\'s' AS X WHERE name = 'Foo'"
+    after = "SELECT E'it\\'s' AS X WHERE name = 'foo'"
+    assert canonicalize_sql(before) != canonicalize_sql(after)
+    assert canonicalize_sql(before) == "select E'it\\'s' as x where name = 'Foo'"
+
+
+def test_quotes_inside_comments_are_ignored():
+    sql = "SELECT Name -- don't care\nFROM T WHERE name = 'Foo'"
+    assert canonicalize_sql(sql) == "select name -- don't care\nfrom t where name = 'Foo'"
@@ -4,7 +4,7 @@ import { useLanguage } from '../../contexts/LanguageContext.jsx';
 import { useTheme } from '../../contexts/ThemeContext.jsx';
 import { formatDate, formatDuration, truncateText } from '../../utils/helpers.js';
 
-const QueryHistory = ({ queries, onSelectQuery, loading }) => {
+const QueryHistory = ({ queries, onSelectQuery, onLoadMore, loading }) => {
   const { t } = useLanguage();
   const { isDark } = useTheme();
 
@@ -76,7 +76,7 @@ const QueryHistory = ({ queries, onSelectQuery, loading }) => {
                   <div className="flex items-center space-x-1">
                     <Database className={`w-3 h-3 ${isDark ? 'text-gray-400' : 'text-gray-500'}`} />
                     <span className={isDark ? 'text-gray-400' : 'text-gray-500'}>
-                      {query.execution_result?.length || 0} rows
+                      {query.row_count ?? 0} rows
                     </span>
                   </div>
                 </div>
@@ -106,6 +106,21 @@ const QueryHistory = ({ queries, onSelectQuery, loading }) => {
           </div>
         ))}
       </div>
+
+      {onLoadMore && (
+        <div className="text-center">
+          <button
+            onClick={onLoadMore}
+            className={`px-4 py-2 text-sm rounded-lg border transition-colors ${
+              isDark
+                ? 'border-gray-700 text-gray-300 hover:bg-gray-800'
+                : 'border-gray-200 text-gray-700 hover:bg-gray-50'
+            }`}
+          >
+            Load more
+          </button>
+        </div>
+      )}
     </div>
   );
 };
@@ -4,6 +4,7 @@ import toast from 'react-hot-toast';
 
 export const useQuery = () => {
   const [queryHistory, setQueryHistory] = useState([]);
+  const [historyCursor, setHistoryCursor] = useState(null);
   const [queryStats, setQueryStats] = useState(null);
   const [loading, setLoading] = useState(false);
   const [error, setError] = useState(null);
@@ -30,7 +31,8 @@ export const useQuery = () => {
     try {
       setLoading(true);
       const data = await queryService.getQueryHistory();
-      setQueryHistory(data);
+      setQueryHistory(data.queries);
+      setHistoryCursor(data.next_cursor);
     } catch (err) {
       setError(err.response?.data?.detail || 'Failed to fetch query history');
     } finally {
@@ -38,6 +40,27 @@ export const useQuery = () => {
     }
   };
 
+  const loadMoreHistory = async () => {
+    if (!historyCursor) return;
+    try {
+      const data = await queryService.getQueryHistory(50, historyCursor);
+      setQueryHistory(prev => [...prev, ...data.queries]);
+      setHistoryCursor(data.next_cursor);
+    } catch (err) {
+      setError(err.response?.data?.detail || 'Failed to fetch query history');
+    }
+  };
+
+  const fetchQueryDetail = async (queryId) => {
+    try {
+      return await queryService.getQuery(queryId);
+    } catch (err) {
+      const errorMsg = err.response?.data?.detail || 'Failed to load query';
+      toast.error(errorMsg);
+      return null;
+    }
+  };
+
   const fetchQueryStats = async () => {
     try {
       const stats = await queryService.getQueryStats();
@@ -54,6 +77,9 @@ export const useQuery = () => {
     error,
     executeQuery,
     fetchQueryHistory,
+    loadMoreHistory,
+    hasMoreHistory: Boolean(historyCursor),
+    fetchQueryDetail,
     fetchQueryStats,
   };
 };
\ No newline at end of file
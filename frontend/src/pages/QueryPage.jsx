@@ -9,7 +9,14 @@ import QueryHistory from '../components/query/QueryHistory.jsx';
 const QueryPage = () => {
   const { t } = useLanguage();
   const { isDark } = useTheme();
-  const { queryHistory, fetchQueryHistory, loading } = useQuery();
+  const {
+    queryHistory,
+    fetchQueryHistory,
+    loadMoreHistory,
+    hasMoreHistory,
+    fetchQueryDetail,
+    loading,
+  } = useQuery();
   const [currentResult, setCurrentResult] = useState(null);
   const [activeTab, setActiveTab] = useState('query');
 
@@ -22,8 +29,11 @@ const QueryPage = () => {
     setActiveTab('results');
   };
 
-  const handleSelectHistoryQuery = (query) => {
-    setCurrentResult(query);
+  const handleSelectHistoryQuery = async (query) => {
+    // History holds summaries only, the result is fetched on selection
+    const detail = await fetchQueryDetail(query.id);
+    if (!detail) return;
+    setCurrentResult(detail);
     setActiveTab('results');
   };
 
@@ -111,6 +121,7 @@ const QueryPage = () => {
             <QueryHistory
               queries={queryHistory}
               onSelectQuery={handleSelectHistoryQuery}
+              onLoadMore={hasMoreHistory ? loadMoreHistory : null}
               loading={loading}
             />
           )}
@@ -10,9 +10,17 @@ export const queryService = {
     return response.data;
   },
 
-  // Get query history
-  async getQueryHistory(limit = 50) {
-    const response = await api.get(`/api/queries/?limit=${limit}`);
+  // Get one page of query history summaries ({ queries, next_cursor })
+  async getQueryHistory(limit = 50, cursor = null) {
+    const params = { limit };
+    if (cursor) params.cursor = cursor;
+    const response = await api.get('/api/queries/', { params });
+    return response.data;
+  },
+
+  // Get a past query with its result, chart and insights
+  async getQuery(queryId) {
+    const response = await api.get(`/api/queries/${queryId}`);
     return response.data;
   },
 